@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.retrieval_benchmark import _latency_summary
+from benchmarks.stub_server import StubServer
+from generation.cohere_evaluator import stop_model_refresher
+from generation.generate_post import agenerate_post
+from generation.resilience import circuit_breaker_stats
+
+
+async def _run_posts(posts: int, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async def _one(index: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            # agenerate_post writes per-run keys into the config it gets.
+            await agenerate_post(f"Benchmark topic {index}", "Educational", "Book discovery calls", dict(config))
+        except Exception as exc:
+            return {"ok": False, "seconds": time.perf_counter() - started, "error": str(exc)}
+        return {"ok": True, "seconds": time.perf_counter() - started}
+
+    return await asyncio.gather(*[_one(index) for index in range(posts)])
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    server = StubServer(
+        {
+            "latency_ms": args.stub_latency_ms,
+            "latency_jitter_ms": args.stub_jitter_ms,
+            "request_queue_size": args.stub_request_queue_size,
+            "seed": args.seed,
+        }
+    ).start()
+    config: Dict[str, Any] = {
+        "api_key": "stub",
+        "cohere_api_key": "stub",
+        "base_url": server.openai_base_url,
+        "cohere_base_url": server.cohere_base_url,
+        "retry_backoff_seconds": 0.2,
+        # Distinct topics never coalesce; keep the upstream count honest anyway.
+        "coalesce_requests": False,
+        "openai_pool_size": args.pool_size,
+        "max_concurrent_requests": args.max_concurrent_requests,
+    }
+    try:
+        started = time.perf_counter()
+        runs = asyncio.run(_run_posts(args.posts, config))
+        wall_seconds = time.perf_counter() - started
+        stats = server.stats()
+    finally:
+        stop_model_refresher()
+        server.shutdown()
+
+    succeeded = [run for run in runs if run["ok"]]
+    errors: Dict[str, int] = {}
+    for run in runs:
+        if not run["ok"]:
+            errors[run["error"]] = errors.get(run["error"], 0) + 1
+    return {
+        "benchmark": "async_generation",
+        "parameters": {
+            "posts": args.posts,
+            "pool_size": args.pool_size,
+            "max_concurrent_requests": args.max_concurrent_requests,
+            "stub_latency_ms": args.stub_latency_ms,
+            "stub_request_queue_size": args.stub_request_queue_size,
+        },
+        "summary": {
+            "succeeded": len(succeeded),
+            "failed": len(runs) - len(succeeded),
+            "wall_seconds": wall_seconds,
+            "posts_per_second": len(succeeded) / wall_seconds if wall_seconds else 0.0,
+            "post_latency": _latency_summary([run["seconds"] for run in succeeded]),
+            "errors": errors,
+        },
+        "backend_stats": {
+            "connections_opened": stats["connections"],
+            "peak_in_flight": stats["peak_in_flight"],
+            "statuses": stats["statuses"],
+        },
+        "circuit_breakers": circuit_breaker_stats(),
+    }
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Drive many concurrent agenerate_post calls from one event loop against the local stub"
+    )
+    parser.add_argument("--posts", type=int, default=300, help="Concurrent posts started at once")
+    parser.add_argument("--pool-size", type=int, default=64, help="openai_pool_size (max connections)")
+    parser.add_argument(
+        "--max-concurrent-requests",
+        type=int,
+        default=None,
+        help="In-flight OpenAI request cap (default: pool size)",
+    )
+    parser.add_argument("--stub-latency-ms", type=float, default=100.0, help="Stub mean chat latency")
+    parser.add_argument("--stub-jitter-ms", type=float, default=20.0, help="Stub latency standard deviation")
+    parser.add_argument("--stub-request-queue-size", type=int, default=1024, help="Stub listen() backlog")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for stub latency")
+    parser.add_argument("--output", default=None, help="Write JSON results to this file (default: stdout)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _build_arg_parser().parse_args(argv)
+    if args.posts < 1:
+        raise ValueError("--posts must be positive")
+
+    report = run_benchmark(args)
+    summary = report["summary"]
+    print(
+        f"{summary['succeeded']}/{args.posts} posts in {summary['wall_seconds']:.1f}s "
+        f"({summary['posts_per_second']:.1f}/s), peak in flight {report['backend_stats']['peak_in_flight']}, "
+        f"connections {report['backend_stats']['connections_opened']}",
+        file=sys.stderr,
+    )
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload + "\n", encoding="utf-8")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
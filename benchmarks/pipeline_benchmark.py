@@ -0,0 +1,283 @@
+import argparse
+import concurrent.futures
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.retrieval_benchmark import _latency_summary
+from benchmarks.stub_server import StubServer
+from generation.cassette import LATENCY_MODES
+from generation.cohere_evaluator import stop_model_refresher
+from generation.generate_post import CANDIDATE_MODES
+from generation.pipeline import run_pipeline
+
+BACKENDS = ("stub", "replay")
+DEFAULT_TOPICS = [
+    "Why AI pilots stall after the demo",
+    "Choosing the first process to automate",
+    "Measuring ROI on an AI assistant",
+    "Data readiness for small teams",
+]
+STAGE_PREFIX = "stage."
+
+
+def _stage_durations(trace: Dict[str, Any]) -> Dict[str, float]:
+    """Top-level pipeline stages (direct children of the root span) in milliseconds."""
+    root_ids = {span["span_id"] for span in trace.get("spans", []) if span["parent_id"] is None}
+    durations: Dict[str, float] = {}
+    for span in trace.get("spans", []):
+        if span["parent_id"] in root_ids and span["name"].startswith(STAGE_PREFIX):
+            name = span["name"][len(STAGE_PREFIX) :]
+            durations[name] = durations.get(name, 0.0) + span["duration_ms"]
+    return durations
+
+
+def _critical_children(trace: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(stage, child span) pairs on the critical path: what each stage was waiting on."""
+    pairs: List[Tuple[str, str]] = []
+    stage: Optional[str] = None
+    for entry in trace.get("critical_path", []):
+        if entry["depth"] == 1:
+            stage = entry["name"][len(STAGE_PREFIX) :] if entry["name"].startswith(STAGE_PREFIX) else entry["name"]
+        elif entry["depth"] == 2 and stage is not None:
+            pairs.append((stage, entry["name"]))
+            stage = None
+    return pairs
+
+
+def _run_once(index: int, topics: List[str], post_type: str, persona: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    topic = topics[index % len(topics)]
+    started = time.perf_counter()
+    try:
+        # run_pipeline writes per-run keys (feedback guidance) into the config it gets.
+        result = run_pipeline(topic, post_type, persona, dict(config))
+    except Exception as exc:
+        return {"ok": False, "seconds": time.perf_counter() - started, "error": str(exc)}
+    metadata = result["metadata"]
+    return {
+        "ok": True,
+        "seconds": time.perf_counter() - started,
+        "ttft_seconds": (metadata.get("streaming") or {}).get("time_to_first_token_seconds"),
+        "trace": metadata.get("trace") or {},
+    }
+
+
+def _summarize(runs: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    succeeded = [run for run in runs if run["ok"]]
+    stage_samples: Dict[str, List[float]] = {}
+    critical_counts: Dict[str, Dict[str, int]] = {}
+    for run in succeeded:
+        for stage, duration_ms in _stage_durations(run["trace"]).items():
+            stage_samples.setdefault(stage, []).append(duration_ms / 1000)
+        for stage, child in _critical_children(run["trace"]):
+            counts = critical_counts.setdefault(stage, {})
+            counts[child] = counts.get(child, 0) + 1
+
+    end_to_end = _latency_summary([run["seconds"] for run in succeeded])
+    stages: Dict[str, Any] = {}
+    for stage, samples in stage_samples.items():
+        summary = _latency_summary(samples)
+        summary["share_of_end_to_end"] = summary["mean_ms"] / end_to_end["mean_ms"] if end_to_end["mean_ms"] else 0.0
+        counts = critical_counts.get(stage, {})
+        if counts:
+            child, hits = max(counts.items(), key=lambda item: item[1])
+            summary["critical_child"] = {"span": child, "share_of_runs": hits / len(succeeded)}
+        stages[stage] = summary
+
+    ttfts = [run["ttft_seconds"] for run in succeeded if run.get("ttft_seconds") is not None]
+    errors: Dict[str, int] = {}
+    for run in runs:
+        if not run["ok"]:
+            errors[run["error"]] = errors.get(run["error"], 0) + 1
+    return {
+        "runs": len(runs),
+        "succeeded": len(succeeded),
+        "failed": len(runs) - len(succeeded),
+        "wall_seconds": wall_seconds,
+        "throughput_runs_per_second": len(succeeded) / wall_seconds if wall_seconds else 0.0,
+        "end_to_end": end_to_end,
+        "time_to_first_token": _latency_summary(ttfts),
+        # Stages run in sequence, so they are all on the critical path; within a stage the
+        # slowest parallel branch (an angle, the image, ...) is what the stage waited on.
+        "stages": stages,
+        "errors": errors,
+    }
+
+
+def format_table(report: Dict[str, Any]) -> str:
+    summary = report["summary"]
+    params = report["parameters"]
+    e2e = summary["end_to_end"]
+    lines = [
+        f"Pipeline benchmark: {summary['runs']} runs, concurrency {params['concurrency']}, backend {params['backend']}",
+        f"throughput {summary['throughput_runs_per_second']:.2f} runs/s, failed {summary['failed']}, "
+        f"wall {summary['wall_seconds']:.1f}s",
+        f"end-to-end p50 {e2e['p50_ms']:.0f} ms, p95 {e2e['p95_ms']:.0f} ms, p99 {e2e['p99_ms']:.0f} ms",
+        "",
+        f"{'stage':<22}{'mean ms':>10}{'p95 ms':>10}{'share':>8}  waits on",
+    ]
+    for stage, stats in summary["stages"].items():
+        critical = stats.get("critical_child")
+        waits_on = f"{critical['span']} ({critical['share_of_runs']:.0%})" if critical else "-"
+        lines.append(
+            f"{stage:<22}{stats['mean_ms']:>10.0f}{stats['p95_ms']:>10.0f}"
+            f"{stats['share_of_end_to_end']:>8.0%}  {waits_on}"
+        )
+    return "\n".join(lines)
+
+
+def _backend_config(args: argparse.Namespace) -> Tuple[Dict[str, Any], Optional[StubServer]]:
+    config: Dict[str, Any] = {
+        "model": args.model,
+        "max_tokens": args.max_tokens,
+        "retries": args.retries,
+        "retry_backoff_seconds": args.retry_backoff_seconds,
+        "candidate_mode": args.candidate_mode,
+    }
+    if args.backend == "replay":
+        config.update(
+            {
+                "cassette_mode": "replay",
+                "cassette_latency": args.cassette_latency,
+                "cassette_match": "loose",
+            }
+        )
+        if args.cassette_path:
+            config["cassette_path"] = args.cassette_path
+        return config, None
+
+    server = StubServer(
+        {
+            "latency_ms": args.stub_latency_ms,
+            "latency_jitter_ms": args.stub_jitter_ms,
+            "image_latency_ms": args.stub_image_latency_ms,
+            "error_rate": args.stub_error_rate,
+            "rate_limit_rate": args.stub_rate_limit_rate,
+            "retry_after_seconds": 0.2,
+            "seed": args.seed,
+        }
+    ).start()
+    config.update(
+        {
+            "api_key": "stub",
+            "cohere_api_key": "stub",
+            "base_url": server.openai_base_url,
+            "cohere_base_url": server.cohere_base_url,
+        }
+    )
+    return config, server
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    topics = [topic.strip() for topic in args.topics.split("|") if topic.strip()] or DEFAULT_TOPICS
+    config, server = _backend_config(args)
+    try:
+        for index in range(args.warmup):
+            # Warm-up loads the knowledge-base index and opens connections; not measured.
+            _run_once(index, topics, args.post_type, args.persona, config)
+        if server is not None:
+            warm_stats = server.stats()
+
+        started = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            futures = [
+                executor.submit(_run_once, index, topics, args.post_type, args.persona, config)
+                for index in range(args.runs)
+            ]
+            runs = [future.result() for future in futures]
+        wall_seconds = time.perf_counter() - started
+        backend_stats: Dict[str, Any] = {}
+        if server is not None:
+            stats = server.stats()
+            backend_stats = {
+                "connections_opened": stats["connections"] - warm_stats["connections"],
+                "peak_in_flight": stats["peak_in_flight"],
+                "statuses": stats["statuses"],
+            }
+    finally:
+        # Probes started by cohere_availability_refresh_seconds must not outlive the stub.
+        stop_model_refresher()
+        if server is not None:
+            server.shutdown()
+
+    return {
+        "benchmark": "pipeline",
+        "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": {
+            "runs": args.runs,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "backend": args.backend,
+            "candidate_mode": args.candidate_mode,
+            "model": args.model,
+            "stub_latency_ms": args.stub_latency_ms if args.backend == "stub" else None,
+            "cassette_latency": args.cassette_latency if args.backend == "replay" else None,
+        },
+        "summary": _summarize(runs, wall_seconds),
+        "backend_stats": backend_stats,
+    }
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the end-to-end generation pipeline against a local stub or a replayed cassette"
+    )
+    parser.add_argument("--runs", type=int, default=20, help="Measured pipeline runs")
+    parser.add_argument("--concurrency", type=int, default=4, help="Pipeline runs in flight at once")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured runs before timing")
+    parser.add_argument("--backend", choices=BACKENDS, default="stub", help="Provider backend")
+    parser.add_argument("--candidate-mode", choices=CANDIDATE_MODES, default="fanout", help="Draft generation mode")
+    parser.add_argument("--model", default="gpt-4o-mini", help="Model name sent to the backend")
+    parser.add_argument("--max-tokens", type=int, default=500, help="Max tokens per completion")
+    parser.add_argument("--retries", type=int, default=3, help="Attempts per LLM call")
+    parser.add_argument("--retry-backoff-seconds", type=float, default=0.2, help="Retry backoff base")
+    parser.add_argument("--post-type", default="Educational", help="Post type for every run")
+    parser.add_argument("--persona", default="SME decision makers", help="Target persona for every run")
+    parser.add_argument("--topics", default="", help="'|'-separated topics, cycled across runs")
+    parser.add_argument("--stub-latency-ms", type=float, default=800.0, help="Stub mean chat latency")
+    parser.add_argument("--stub-jitter-ms", type=float, default=200.0, help="Stub latency standard deviation")
+    parser.add_argument("--stub-image-latency-ms", type=float, default=3000.0, help="Stub image latency")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0, help="Stub fraction of 500 responses")
+    parser.add_argument("--stub-rate-limit-rate", type=float, default=0.0, help="Stub fraction of 429 responses")
+    parser.add_argument("--cassette-path", default=None, help="Cassette for --backend replay")
+    parser.add_argument(
+        "--cassette-latency",
+        choices=LATENCY_MODES,
+        default="recorded",
+        help="Latency injected on replay",
+    )
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for stub latency and faults")
+    parser.add_argument("--output", default=None, help="Write JSON results to this file (default: stdout)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _build_arg_parser().parse_args(argv)
+    if args.runs < 1 or args.concurrency < 1:
+        raise ValueError("--runs and --concurrency must be positive")
+
+    report = run_benchmark(args)
+    print(format_table(report), file=sys.stderr)
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload + "\n", encoding="utf-8")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.document_processor import DocumentProcessor, SEARCH_MODES
+
+DEFAULT_SIZES = [100, 1_000, 10_000]
+FILES_PER_DIRECTORY = 1_000
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def _latency_summary(seconds: List[float]) -> Dict[str, float]:
+    millis = [value * 1000 for value in seconds]
+    return {
+        "count": len(millis),
+        "mean_ms": statistics.fmean(millis) if millis else 0.0,
+        "p50_ms": _percentile(millis, 50),
+        "p95_ms": _percentile(millis, 95),
+        "p99_ms": _percentile(millis, 99),
+        "max_ms": max(millis) if millis else 0.0,
+    }
+
+
+def _build_vocabulary(rng: random.Random, size: int) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return sorted(words)
+
+
+def _zipf_words(rng: random.Random, vocabulary: List[str], weights: List[float], count: int) -> List[str]:
+    return rng.choices(vocabulary, cum_weights=weights, k=count)
+
+
+def generate_corpus(
+    root: Path,
+    num_docs: int,
+    seed: int = 7,
+    vocabulary_size: int = 20_000,
+    primary_share: float = 0.2,
+) -> Dict[str, Any]:
+    """Write num_docs synthetic markdown files under root/primary and root/secondary."""
+    rng = random.Random(seed)
+    vocabulary = _build_vocabulary(rng, vocabulary_size)
+    # Zipf-like term distribution so postings lengths look like natural text
+    cumulative = []
+    total = 0.0
+    for rank in range(1, len(vocabulary) + 1):
+        total += 1.0 / rank
+        cumulative.append(total)
+
+    started = time.perf_counter()
+    total_bytes = 0
+    for doc_number in range(num_docs):
+        kind = "primary" if doc_number < num_docs * primary_share else "secondary"
+        directory = root / kind / f"batch_{doc_number // FILES_PER_DIRECTORY:05d}"
+        directory.mkdir(parents=True, exist_ok=True)
+
+        lines = [f"# {' '.join(_zipf_words(rng, vocabulary, cumulative, 4)).title()}", ""]
+        for section in range(rng.randint(2, 5)):
+            lines.append(f"## {section + 1}. {' '.join(_zipf_words(rng, vocabulary, cumulative, 3)).title()}")
+            lines.append("")
+            for _ in range(rng.randint(1, 3)):
+                lines.append(" ".join(_zipf_words(rng, vocabulary, cumulative, rng.randint(30, 90))) + ".")
+                lines.append("")
+        text = "\n".join(lines)
+        total_bytes += len(text)
+        (directory / f"doc_{doc_number:07d}.md").write_text(text, encoding="utf-8")
+
+    return {
+        "documents": num_docs,
+        "bytes": total_bytes,
+        "generate_seconds": time.perf_counter() - started,
+        "vocabulary": vocabulary,
+        "cumulative_weights": cumulative,
+    }
+
+
+def _new_processor(kb_dir: Path, snapshot_path: str) -> DocumentProcessor:
+    # search_cache_size=0 so every timed query does real work
+    return DocumentProcessor(
+        snapshot_path=snapshot_path,
+        verbose=False,
+        search_cache_size=0,
+        knowledge_base_dir=str(kb_dir),
+    )
+
+
+def benchmark_size(
+    num_docs: int,
+    workdir: Path,
+    modes: List[str],
+    num_queries: int,
+    seed: int,
+    trace_memory: bool,
+    keep_corpus: bool,
+) -> Dict[str, Any]:
+    kb_dir = workdir / f"corpus_{num_docs}"
+    snapshot_path = str(workdir / f"snapshot_{num_docs}.pkl")
+    if kb_dir.exists():
+        shutil.rmtree(kb_dir)
+    if os.path.exists(snapshot_path):
+        os.remove(snapshot_path)
+
+    corpus = generate_corpus(kb_dir, num_docs, seed=seed)
+    result: Dict[str, Any] = {
+        "documents": num_docs,
+        "corpus_bytes": corpus["bytes"],
+        "generate_seconds": corpus["generate_seconds"],
+    }
+
+    # Cold load: parse + chunk + index everything, then write the snapshot
+    processor = _new_processor(kb_dir, snapshot_path)
+    started = time.perf_counter()
+    processor.load_all()
+    result["cold_load_seconds"] = time.perf_counter() - started
+    result["chunks"] = len(processor.index)
+    file_timings = [timing["seconds"] for timing in processor.load_timings]
+    result["per_file_load"] = _latency_summary(file_timings)
+
+    # Warm load: everything unchanged, restored from the snapshot
+    warm_processor = _new_processor(kb_dir, snapshot_path)
+    started = time.perf_counter()
+    warm_processor.load_all()
+    result["warm_load_seconds"] = time.perf_counter() - started
+    result["snapshot_bytes"] = os.path.getsize(snapshot_path) if os.path.exists(snapshot_path) else 0
+    del warm_processor
+
+    if trace_memory:
+        # Separate traced cold load: tracemalloc slows allocation-heavy code down a lot
+        os.remove(snapshot_path)
+        traced = _new_processor(kb_dir, "")
+        tracemalloc.start()
+        traced.load_all()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_load_memory_bytes"] = peak
+        del traced
+
+    rng = random.Random(seed + num_docs)
+    vocabulary = corpus["vocabulary"]
+    weights = corpus["cumulative_weights"]
+    queries = [
+        " ".join(_zipf_words(rng, vocabulary, weights, rng.randint(2, 6)))
+        for _ in range(num_queries)
+    ]
+
+    result["modes"] = {}
+    for mode in modes:
+        mode_result: Dict[str, Any] = {}
+        if mode != "lexical":
+            try:
+                started = time.perf_counter()
+                vector_index = processor.build_vector_index()
+                mode_result["vector_build_seconds"] = time.perf_counter() - started
+                mode_result["vector_index_bytes"] = vector_index.nbytes
+            except ImportError as exc:
+                result["modes"][mode] = {"error": f"unavailable: {exc}"}
+                continue
+
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            processor.search(query, mode=mode)
+            latencies.append(time.perf_counter() - started)
+        mode_result["query_latency"] = _latency_summary(latencies)
+        result["modes"][mode] = mode_result
+
+    if not keep_corpus:
+        shutil.rmtree(kb_dir, ignore_errors=True)
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+    return result
+
+
+def _parse_sizes(value: str) -> List[int]:
+    sizes = [int(part.replace("_", "")) for part in value.split(",") if part.strip()]
+    if not sizes or any(size < 1 for size in sizes):
+        raise argparse.ArgumentTypeError("sizes must be positive integers, e.g. 100,1000,10000")
+    return sizes
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark knowledge-base loading and retrieval on synthetic corpora")
+    parser.add_argument(
+        "--sizes",
+        type=_parse_sizes,
+        default=DEFAULT_SIZES,
+        help="Comma-separated document counts (up to 1000000; large sizes need disk space and time)",
+    )
+    parser.add_argument(
+        "--modes",
+        default=",".join(SEARCH_MODES),
+        help=f"Comma-separated retrieval modes ({', '.join(SEARCH_MODES)})",
+    )
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per mode and size")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for corpus and queries")
+    parser.add_argument("--workdir", default=None, help="Directory for generated corpora (default: temp dir)")
+    parser.add_argument("--keep-corpus", action="store_true", help="Keep generated corpora and snapshots")
+    parser.add_argument("--no-trace-memory", action="store_true", help="Skip the tracemalloc peak-memory pass")
+    parser.add_argument("--output", default=None, help="Write JSON results to this file (default: stdout)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _build_arg_parser().parse_args(argv)
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in SEARCH_MODES]
+    if unknown:
+        raise ValueError(f"Unsupported modes: {', '.join(unknown)}")
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="kb_bench_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    report: Dict[str, Any] = {
+        "benchmark": "retrieval",
+        "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": {"sizes": args.sizes, "modes": modes, "queries": args.queries, "seed": args.seed},
+        "results": [],
+    }
+    try:
+        for size in args.sizes:
+            print(f"Benchmarking {size} documents...", file=sys.stderr)
+            report["results"].append(
+                benchmark_size(
+                    num_docs=size,
+                    workdir=workdir,
+                    modes=modes,
+                    num_queries=args.queries,
+                    seed=args.seed,
+                    trace_memory=not args.no_trace_memory,
+                    keep_corpus=args.keep_corpus,
+                )
+            )
+    finally:
+        if not args.workdir and not args.keep_corpus:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload + "\n", encoding="utf-8")
+    else:
+        print(payload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,487 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# 1x1 transparent PNG
+STUB_IMAGE_B64 = (
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+DEFAULT_STUB_CONFIG: Dict[str, Any] = {
+    "latency_ms": 800.0,
+    "latency_jitter_ms": 200.0,
+    "ttft_fraction": 0.3,
+    "image_latency_ms": 3000.0,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "rpm": 0,
+    "retry_after_seconds": 1.0,
+    "completion_tokens": None,
+    "stream_chunks": 12,
+    "seed": 7,
+    # listen() backlog; the socketserver default of 5 refuses or resets bursts of new connections.
+    "request_queue_size": 1024,
+    # Cohere models answered with 404, to exercise the evaluator's fallback chain.
+    "unknown_models": [],
+}
+
+STUB_POST = (
+    "Most SMEs do not fail at AI because of the model. They fail at ownership.\n\n"
+    "Last quarter a 40-person logistics firm automated invoice matching. The pilot worked; "
+    "the rollout stalled because nobody owned the exceptions queue.\n\n"
+    "Name an owner, define the exception path, then scale.\n\n"
+    "Who owns the exceptions in your AI workflows?"
+)
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _prompt_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages or []:
+        content = message.get("content", "")
+        parts.append(content if isinstance(content, str) else json.dumps(content))
+    return "\n".join(parts)
+
+
+def _chat_reply(prompt: str) -> str:
+    """Plausible content for each prompt the pipeline sends, so downstream parsing succeeds."""
+    if '{"drafts"' in prompt:
+        angles = re.findall(r'^- "([a-z_]+)":', prompt, flags=re.MULTILINE) or ["contrarian"]
+        return json.dumps({"drafts": [{"angle": angle, "text": f"[{angle}] {STUB_POST}"} for angle in angles]})
+    if '"hashtags"' in prompt:
+        return json.dumps({"hashtags": ["#SMEs", "#AIAdoption", "#Operations", "#Automation", "#Leadership"]})
+    if '"tone_alignment"' in prompt:
+        return json.dumps(
+            {
+                "tone_alignment": 17,
+                "sme_relevance": 18,
+                "presence_of_example": 16,
+                "business_clarity": 17,
+                "differentiation": 15,
+                "score": 83,
+                "feedback_summary": "Tighten the opening and name one measurable outcome.",
+            }
+        )
+    if '"pillars"' in prompt:
+        return json.dumps(
+            {
+                "version": "v1",
+                "pillars": [
+                    {
+                        "id": "ai-ownership",
+                        "name": "AI ownership in SMEs",
+                        "description": "Who runs AI once the pilot ends.",
+                        "sme_pain_points": ["unclear ownership"],
+                        "example_angles": ["the exceptions queue"],
+                        "recommended_post_types": ["educational"],
+                        "priority": 1,
+                    }
+                ],
+            }
+        )
+    return STUB_POST
+
+
+class _StubState:
+    def __init__(self, config: Dict[str, Any]) -> None:
+        self.config = dict(DEFAULT_STUB_CONFIG, **config)
+        self.lock = threading.Lock()
+        self.rng = random.Random(self.config["seed"])
+        self.request_times: List[float] = []
+        self.started_at = time.time()
+        self.connections = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests: Dict[str, int] = {}
+        self.statuses: Dict[str, int] = {}
+
+    def latency_seconds(self, mean_ms: float) -> float:
+        with self.lock:
+            sample = self.rng.gauss(mean_ms, float(self.config["latency_jitter_ms"]))
+        return max(0.0, sample) / 1000.0
+
+    def fault(self) -> Optional[int]:
+        """Status code to inject for this request, if any (429 before 500)."""
+        with self.lock:
+            now = time.monotonic()
+            rpm = int(self.config["rpm"] or 0)
+            if rpm:
+                self.request_times = [t for t in self.request_times if now - t < 60.0]
+                if len(self.request_times) >= rpm:
+                    return 429
+                self.request_times.append(now)
+            roll = self.rng.random()
+        if roll < float(self.config["rate_limit_rate"]):
+            return 429
+        if roll < float(self.config["rate_limit_rate"]) + float(self.config["error_rate"]):
+            return 500
+        return None
+
+    def count(self, path: str, status: int) -> None:
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "uptime_seconds": time.time() - self.started_at,
+                "connections": self.connections,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "requests": dict(self.requests),
+                "statuses": dict(self.statuses),
+                "config": dict(self.config),
+            }
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive, so client-side pooling shows up in "connections".
+    protocol_version = "HTTP/1.1"
+    server: "_StubHTTPServer"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.state.count(self.path, status)
+
+    def _send_fault(self, status: int, latency: float) -> None:
+        if status == 429:
+            retry_after = str(self.server.state.config["retry_after_seconds"])
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error", "code": "rate_limit"}},
+                {"Retry-After": retry_after},
+            )
+            return
+        time.sleep(latency)
+        self._send_json(500, {"error": {"message": "Internal error (stub)", "type": "server_error"}})
+
+    def do_GET(self) -> None:
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/stats":
+            self._send_json(200, self.server.state.snapshot())
+        elif path.startswith("/v1/models/"):
+            self._cohere_model(path[len("/v1/models/") :])
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+
+        routes = {
+            "/v1/chat/completions": self._chat_completions,
+            "/v1/images/generations": self._images,
+            "/v2/chat": self._cohere_chat,
+        }
+        route = routes.get(self.path.split("?")[0].rstrip("/"))
+        if route is None:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        state = self.server.state
+        with state.lock:
+            state.in_flight += 1
+            state.peak_in_flight = max(state.peak_in_flight, state.in_flight)
+        try:
+            route(body)
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def _usage(self, prompt: str, reply: str) -> Tuple[int, int]:
+        configured = self.server.state.config["completion_tokens"]
+        completion_tokens = int(configured) if configured else _estimate_tokens(reply)
+        return _estimate_tokens(prompt), completion_tokens
+
+    def _chat_completions(self, body: Dict[str, Any]) -> None:
+        state = self.server.state
+        latency = state.latency_seconds(float(state.config["latency_ms"]))
+        fault = state.fault()
+        if fault:
+            self._send_fault(fault, latency)
+            return
+
+        prompt = _prompt_text(body.get("messages", []))
+        reply = _chat_reply(prompt)
+        prompt_tokens, completion_tokens = self._usage(prompt, reply)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "gpt-4o-mini")
+
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            self._stream_chat(completion_id, model, reply, usage if include_usage else None, latency)
+            return
+
+        time.sleep(latency)
+        self._send_json(
+            200,
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": reply},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            },
+        )
+
+    def _stream_chat(
+        self,
+        completion_id: str,
+        model: str,
+        reply: str,
+        usage: Optional[Dict[str, int]],
+        latency: float,
+    ) -> None:
+        config = self.server.state.config
+        n_chunks = max(1, int(config["stream_chunks"]))
+        size = max(1, -(-len(reply) // n_chunks))
+        pieces = [reply[i : i + size] for i in range(0, len(reply), size)] or [""]
+        ttft = latency * float(config["ttft_fraction"])
+        gap = (latency - ttft) / max(1, len(pieces) - 1)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def _event(payload: Any) -> None:
+            data = f"data: {payload if isinstance(payload, str) else json.dumps(payload)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        base = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        time.sleep(ttft)
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(gap)
+            _event(dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}]))
+        _event(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if usage is not None:
+            _event(dict(base, choices=[], usage=usage))
+        _event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+        self.server.state.count(self.path, 200)
+
+    def _images(self, body: Dict[str, Any]) -> None:
+        state = self.server.state
+        latency = state.latency_seconds(float(state.config["image_latency_ms"]))
+        fault = state.fault()
+        if fault:
+            self._send_fault(fault, latency)
+            return
+        time.sleep(latency)
+        self._send_json(200, {"created": int(time.time()), "data": [{"b64_json": STUB_IMAGE_B64}]})
+
+    def _cohere_model(self, model: str) -> None:
+        if model in self.server.state.config["unknown_models"]:
+            self._send_json(404, {"message": f"model '{model}' not found"})
+            return
+        self._send_json(200, {"name": model, "endpoints": ["chat"]})
+
+    def _cohere_chat(self, body: Dict[str, Any]) -> None:
+        state = self.server.state
+        model = body.get("model", "")
+        if model in state.config["unknown_models"]:
+            self._send_json(404, {"message": f"model '{model}' not found"})
+            return
+        latency = state.latency_seconds(float(state.config["latency_ms"]))
+        fault = state.fault()
+        if fault:
+            self._send_fault(fault, latency)
+            return
+        prompt = _prompt_text(body.get("messages", []))
+        reply = json.dumps({"best_index": 0, "reason": "Most concrete example and clearest SME takeaway (stub)."})
+        input_tokens, output_tokens = self._usage(prompt, reply)
+        time.sleep(latency)
+        self._send_json(
+            200,
+            {
+                "id": f"cohere-stub-{uuid.uuid4().hex[:12]}",
+                "finish_reason": "COMPLETE",
+                "message": {"role": "assistant", "content": [{"type": "text", "text": reply}]},
+                "usage": {
+                    "billed_units": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+                    "tokens": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+                },
+            },
+        )
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], state: _StubState) -> None:
+        # Read by server_activate(), so it must be set before the base class binds and listens.
+        self.request_queue_size = int(state.config["request_queue_size"])
+        super().__init__(address, _StubHandler)
+        self.state = state
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Clients dropping idle keep-alive connections is normal, not worth a traceback.
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubServer:
+    """
+    Local OpenAI- and Cohere-compatible HTTP server with injectable latency and faults.
+
+    Point the pipeline at it with config["base_url"] = server.openai_base_url and
+    config["cohere_base_url"] = server.cohere_base_url (or OPENAI_BASE_URL / COHERE_BASE_URL).
+    GET /stats reports TCP connections opened, peak concurrency and status counts.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.state = _StubState(config or {})
+        self._server = _StubHTTPServer((host, port), self.state)
+        self.host, self.port = self._server.server_address[:2]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def openai_base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    @property
+    def cohere_base_url(self) -> str:
+        return self.url
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.state.snapshot()
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Serve stub OpenAI and Cohere endpoints for local load testing")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=8089, help="Port (0 picks a free one)")
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_STUB_CONFIG["latency_ms"], help="Mean chat latency")
+    parser.add_argument(
+        "--latency-jitter-ms",
+        type=float,
+        default=DEFAULT_STUB_CONFIG["latency_jitter_ms"],
+        help="Standard deviation of the latency",
+    )
+    parser.add_argument(
+        "--image-latency-ms",
+        type=float,
+        default=DEFAULT_STUB_CONFIG["image_latency_ms"],
+        help="Mean image generation latency",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rpm", type=int, default=0, help="Return 429 above this many requests per minute (0: off)")
+    parser.add_argument("--retry-after-seconds", type=float, default=1.0, help="Retry-After sent with 429s")
+    parser.add_argument(
+        "--completion-tokens",
+        type=int,
+        default=None,
+        help="Fixed completion token usage (default: estimated from the reply)",
+    )
+    parser.add_argument("--stream-chunks", type=int, default=12, help="Chunks per streamed reply")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed for latency and fault injection")
+    parser.add_argument(
+        "--request-queue-size",
+        type=int,
+        default=DEFAULT_STUB_CONFIG["request_queue_size"],
+        help="listen() backlog for new connections (capped by net.core.somaxconn)",
+    )
+    parser.add_argument(
+        "--unknown-models",
+        default="",
+        help="Comma-separated Cohere models answered with 404",
+    )
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = _build_arg_parser().parse_args(argv)
+    server = StubServer(
+        {
+            "latency_ms": args.latency_ms,
+            "latency_jitter_ms": args.latency_jitter_ms,
+            "image_latency_ms": args.image_latency_ms,
+            "error_rate": args.error_rate,
+            "rate_limit_rate": args.rate_limit_rate,
+            "rpm": args.rpm,
+            "retry_after_seconds": args.retry_after_seconds,
+            "completion_tokens": args.completion_tokens,
+            "stream_chunks": args.stream_chunks,
+            "seed": args.seed,
+            "request_queue_size": args.request_queue_size,
+            "unknown_models": [model.strip() for model in args.unknown_models.split(",") if model.strip()],
+        },
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Stub server listening on {server.url}", file=sys.stderr)
+    print(f"  export OPENAI_BASE_URL={server.openai_base_url} OPENAI_API_KEY=stub", file=sys.stderr)
+    print(f"  export COHERE_BASE_URL={server.cohere_base_url} COHERE_API_KEY=stub", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
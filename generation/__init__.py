@@ -1,19 +1,54 @@
-from .llm_client import generate_completion
-from .generate_post import generate_post
-from .refiner import refine_post
-from .brand_checker import check_brand_consistency
-from .cohere_evaluator import evaluate_candidates_with_cohere
-from .post_assets import generate_hashtags, generate_post_image
-from .feedback_loop import save_feedback, build_feedback_guidance
-
-__all__ = [
-    "generate_completion",
-    "generate_post",
-    "refine_post",
-    "check_brand_consistency",
-    "evaluate_candidates_with_cohere",
-    "generate_hashtags",
-    "generate_post_image",
-    "save_feedback",
-    "build_feedback_guidance",
-]
+import importlib
+import sys
+import types
+from typing import Any, List
+
+# Exported name -> submodule. Submodules load on first attribute access, so importing a
+# light module such as generation.feedback_loop does not pull in openai and every stage.
+_EXPORTS = {
+    "generate_completion": "llm_client",
+    "agenerate_completion": "llm_client",
+    "stream_completion": "llm_client",
+    "generate_post": "generate_post",
+    "agenerate_post": "generate_post",
+    "refine_post": "refiner",
+    "arefine_post": "refiner",
+    "check_brand_consistency": "brand_checker",
+    "acheck_brand_consistency": "brand_checker",
+    "evaluate_candidates_with_cohere": "cohere_evaluator",
+    "aevaluate_candidates_with_cohere": "cohere_evaluator",
+    "generate_hashtags": "post_assets",
+    "agenerate_hashtags": "post_assets",
+    "generate_post_image": "post_assets",
+    "save_feedback": "feedback_loop",
+    "build_feedback_guidance": "feedback_loop",
+    "run_pipeline": "pipeline",
+    "iter_pipeline_events": "pipeline",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name: str, value: Any) -> None:
+        # The import system binds each loaded submodule onto the package. Keep
+        # generation.generate_post the function it always was, not its module.
+        if isinstance(value, types.ModuleType) and _EXPORTS.get(name) == name:
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
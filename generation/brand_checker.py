@@ -1,14 +1,16 @@
+import asyncio
 import json
 import re
 import sys
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
 
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from generation.llm_client import generate_completion
-from generation.generate_post import doc_processor
+from generation.llm_client import agenerate_completion, generate_completion
+from generation.knowledge_base import doc_processor
+from generation.model_router import route_stage
 
 
 BRAND_CHECK_SYSTEM_PROMPT = """
@@ -66,20 +68,23 @@ def _extract_json_block(text: str) -> Dict[str, Any]:
         return {}
 
 
-def check_brand_consistency(post: str, config: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-    if not (post or "").strip():
-        result = {"score": 0, "feedback_summary": "No post content provided."}
-        metadata = {"error": "Empty post input."}
-        return result, metadata
+def _empty_post_result() -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    result = {"score": 0, "feedback_summary": "No post content provided."}
+    metadata = {"error": "Empty post input."}
+    return result, metadata
 
-    brand_context = doc_processor.search(post)
 
-    messages = [
+def _build_brand_check_messages(post: str, brand_context: str) -> List[Dict[str, str]]:
+    return [
         {"role": "system", "content": BRAND_CHECK_SYSTEM_PROMPT},
         {"role": "user", "content": _build_brand_check_prompt(post, brand_context=brand_context)},
     ]
 
-    llm_result = generate_completion(messages=messages, config=config)
+
+def _build_brand_check_result(
+    llm_result: Dict[str, Any],
+    rag_stats: Dict[str, Any],
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
     parsed = _extract_json_block(llm_result.get("content", ""))
 
     tone_alignment = _safe_int(parsed.get("tone_alignment"), 0, 20)
@@ -113,13 +118,37 @@ def check_brand_consistency(post: str, config: Dict[str, Any]) -> Tuple[Dict[str
             "system": "in-code:BRAND_CHECK_SYSTEM_PROMPT",
             "template": "prompts/brand_check_prompt.txt",
         },
+        "rag": rag_stats,
         "llm": {
             "model": llm_result.get("model"),
             "attempts": llm_result.get("attempts"),
             "usage": llm_result.get("usage", {}),
             "length": llm_result.get("length", {}),
             "estimated_cost_usd": llm_result.get("estimated_cost_usd", 0.0),
+            "cache": llm_result.get("cache", {}),
             "error": llm_result.get("error"),
         },
     }
     return result, metadata
+
+
+def check_brand_consistency(post: str, config: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    if not (post or "").strip():
+        return _empty_post_result()
+
+    config = route_stage("brand_check", config)
+    brand_context, rag_stats = doc_processor.retrieve_context(post, config)
+    messages = _build_brand_check_messages(post, brand_context)
+    llm_result = generate_completion(messages=messages, config=config)
+    return _build_brand_check_result(llm_result, rag_stats)
+
+
+async def acheck_brand_consistency(post: str, config: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    if not (post or "").strip():
+        return _empty_post_result()
+
+    config = route_stage("brand_check", config)
+    brand_context, rag_stats = await asyncio.to_thread(doc_processor.retrieve_context, post, config)
+    messages = _build_brand_check_messages(post, brand_context)
+    llm_result = await agenerate_completion(messages=messages, config=config)
+    return _build_brand_check_result(llm_result, rag_stats)
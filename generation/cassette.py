@@ -0,0 +1,387 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+CASSETTE_MODES = ("record", "replay")
+LATENCY_MODES = ("none", "recorded", "sampled", "synthetic")
+MATCH_MODES = ("exact", "loose")
+
+_CASSETTES: Dict[str, "Cassette"] = {}
+_CASSETTES_LOCK = threading.Lock()
+
+
+class CassetteMissError(LookupError):
+    """Replay found no recorded interaction for a request (not retryable)."""
+
+
+def _project_root() -> Path:
+    return Path(__file__).resolve().parent.parent
+
+
+def _default_cassette_path() -> Path:
+    return _project_root() / "data" / "llm_cassette.jsonl"
+
+
+def _hash(payload: Any) -> str:
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _request_key(kind: str, request: Dict[str, Any]) -> str:
+    return _hash({"kind": kind, "request": request})
+
+
+def _loose_key(kind: str, request: Dict[str, Any]) -> str:
+    # Same provider call shape (model, system prompt, output format) with any user prompt,
+    # so a cassette recorded on one topic can drive load tests on others.
+    messages = request.get("messages") or []
+    system = [m.get("content") for m in messages if isinstance(m, dict) and m.get("role") == "system"][:1]
+    return _hash(
+        {
+            "kind": kind,
+            "model": request.get("model"),
+            "size": request.get("size"),
+            "system": system,
+            "response_format": request.get("response_format"),
+        }
+    )
+
+
+def _dump(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    return obj
+
+
+def _to_namespace(value: Any) -> Any:
+    # Replayed payloads expose attributes like the SDK objects the callers expect.
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+class Cassette:
+    """
+    JSONL file of recorded provider interactions.
+
+    Each line holds kind ("openai.chat", "openai.chat.stream", "openai.images",
+    "cohere.chat"), the request, the response payload and the measured latency; streamed
+    responses keep every chunk with its offset from the request start.
+
+    record mode forwards calls to the real provider and appends what it saw. replay mode
+    serves the recorded response for an identical request (interactions recorded for the
+    same request are replayed in order, cycling), optionally sleeping to reproduce latency:
+        - none: return immediately
+        - recorded: the interaction's own latency
+        - sampled: a seeded draw from all latencies recorded for that kind
+        - synthetic: a seeded log-normal draw with the configured median and p95
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        mode: str = "replay",
+        latency: str = "none",
+        latency_scale: float = 1.0,
+        match: str = "exact",
+        synthetic_median_seconds: float = 1.0,
+        synthetic_p95_seconds: float = 3.0,
+        seed: int = 0,
+    ) -> None:
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected one of {CASSETTE_MODES}")
+        if latency not in LATENCY_MODES:
+            raise ValueError(f"Unknown cassette latency {latency!r}; expected one of {LATENCY_MODES}")
+        if match not in MATCH_MODES:
+            raise ValueError(f"Unknown cassette match {match!r}; expected one of {MATCH_MODES}")
+        self.path = Path(path) if path else _default_cassette_path()
+        self.mode = mode
+        self.latency = latency
+        self.latency_scale = float(latency_scale)
+        self.match = match
+        self.synthetic_median_seconds = float(synthetic_median_seconds)
+        self.synthetic_p95_seconds = float(synthetic_p95_seconds)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._exact: Dict[str, List[Dict[str, Any]]] = {}
+        self._loose: Dict[str, List[Dict[str, Any]]] = {}
+        self._latencies: Dict[str, List[float]] = {}
+        self._cursors: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            if self.mode == "replay":
+                raise FileNotFoundError(f"Cassette not found: {self.path}")
+            return
+        with self.path.open(encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    self._index(json.loads(line))
+
+    def _index(self, entry: Dict[str, Any]) -> None:
+        kind = entry["kind"]
+        self._exact.setdefault(entry["key"], []).append(entry)
+        self._loose.setdefault(_loose_key(kind, entry["request"]), []).append(entry)
+        self._latencies.setdefault(kind, []).append(float(entry.get("latency_seconds", 0.0)))
+
+    def _append(self, kind: str, request: Dict[str, Any], response: Any, latency_seconds: float) -> None:
+        entry = {
+            "kind": kind,
+            "key": _request_key(kind, request),
+            "request": request,
+            "response": response,
+            "latency_seconds": latency_seconds,
+            "recorded_at": time.time(),
+        }
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write(line + "\n")
+            self._index(entry)
+            self.recorded += 1
+
+    def _lookup(self, kind: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        key = _request_key(kind, request)
+        loose_key = _loose_key(kind, request)
+        with self._lock:
+            entries = self._exact.get(key)
+            if not entries and self.match == "loose":
+                entries = self._loose.get(loose_key)
+                key = "loose:" + loose_key
+            if not entries:
+                self.misses += 1
+                raise CassetteMissError(f"No recorded {kind} interaction for this request in {self.path}")
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            self.hits += 1
+            return entries[cursor % len(entries)]
+
+    def _replay_latency(self, entry: Dict[str, Any]) -> float:
+        if self.latency == "none":
+            return 0.0
+        if self.latency == "recorded":
+            delay = float(entry.get("latency_seconds", 0.0))
+        elif self.latency == "sampled":
+            with self._lock:
+                delay = self._rng.choice(self._latencies[entry["kind"]])
+        else:
+            median = max(1e-6, self.synthetic_median_seconds)
+            sigma = max(0.0, math.log(max(self.synthetic_p95_seconds, median) / median) / 1.645)
+            with self._lock:
+                delay = self._rng.lognormvariate(math.log(median), sigma)
+        return max(0.0, delay * self.latency_scale)
+
+    def call(self, kind: str, request: Dict[str, Any], send: Callable[[], Any]) -> Any:
+        """Record send()'s response, or replay the recorded one (as attribute objects)."""
+        if self.mode == "record":
+            started = time.perf_counter()
+            response = send()
+            self._append(kind, request, _dump(response), time.perf_counter() - started)
+            return response
+        entry = self._lookup(kind, request)
+        delay = self._replay_latency(entry)
+        if delay > 0:
+            time.sleep(delay)
+        return self._replay_payload(entry)
+
+    async def acall(self, kind: str, request: Dict[str, Any], send: Callable[[], Any]) -> Any:
+        if self.mode == "record":
+            started = time.perf_counter()
+            response = await send()
+            self._append(kind, request, _dump(response), time.perf_counter() - started)
+            return response
+        entry = self._lookup(kind, request)
+        delay = self._replay_latency(entry)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._replay_payload(entry)
+
+    def stream(self, kind: str, request: Dict[str, Any], send: Callable[[], Any]) -> Iterator[Any]:
+        """Streaming variant of call(); replay keeps the recorded chunk spacing, rescaled to the injected latency."""
+        if self.mode == "record":
+            return self._record_stream(kind, request, send())
+        entry = self._lookup(kind, request)
+        return self._replay_stream(entry, self._replay_latency(entry))
+
+    async def astream(self, kind: str, request: Dict[str, Any], send: Callable[[], Any]) -> AsyncIterator[Any]:
+        """Async variant of stream(); send() returns an awaitable resolving to the SDK's async stream."""
+        if self.mode == "record":
+            return self._arecord_stream(kind, request, await send())
+        entry = self._lookup(kind, request)
+        return self._areplay_stream(entry, self._replay_latency(entry))
+
+    def _record_stream(self, kind: str, request: Dict[str, Any], stream: Any) -> Iterator[Any]:
+        started = time.perf_counter()
+        chunks: List[Dict[str, Any]] = []
+        for chunk in stream:
+            chunks.append({"offset_seconds": time.perf_counter() - started, "chunk": _dump(chunk)})
+            yield chunk
+        self._append(kind, request, {"chunks": chunks}, time.perf_counter() - started)
+
+    def _replay_stream(self, entry: Dict[str, Any], total_delay: float) -> Iterator[Any]:
+        chunks = entry["response"]["chunks"]
+        recorded_total = float(entry.get("latency_seconds", 0.0))
+        ratio = total_delay / recorded_total if recorded_total > 0 else 0.0
+        started = time.perf_counter()
+        for item in chunks:
+            wait = item["offset_seconds"] * ratio - (time.perf_counter() - started)
+            if wait > 0:
+                time.sleep(wait)
+            yield _to_namespace(item["chunk"])
+
+    async def _arecord_stream(self, kind: str, request: Dict[str, Any], stream: Any) -> AsyncIterator[Any]:
+        started = time.perf_counter()
+        chunks: List[Dict[str, Any]] = []
+        async for chunk in stream:
+            chunks.append({"offset_seconds": time.perf_counter() - started, "chunk": _dump(chunk)})
+            yield chunk
+        self._append(kind, request, {"chunks": chunks}, time.perf_counter() - started)
+
+    async def _areplay_stream(self, entry: Dict[str, Any], total_delay: float) -> AsyncIterator[Any]:
+        chunks = entry["response"]["chunks"]
+        recorded_total = float(entry.get("latency_seconds", 0.0))
+        ratio = total_delay / recorded_total if recorded_total > 0 else 0.0
+        started = time.perf_counter()
+        for item in chunks:
+            wait = item["offset_seconds"] * ratio - (time.perf_counter() - started)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield _to_namespace(item["chunk"])
+
+    def _replay_payload(self, entry: Dict[str, Any]) -> Any:
+        payload = entry["response"]
+        # Cohere responses are consumed as plain JSON dicts.
+        return payload if entry["kind"].startswith("cohere.") else _to_namespace(payload)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "mode": self.mode,
+                "latency": self.latency,
+                "interactions": sum(len(entries) for entries in self._exact.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "recorded": self.recorded,
+            }
+
+    def openai_client(self, client: Any = None) -> "_CassetteOpenAI":
+        """OpenAI-shaped client; client is the real SDK client (required to record)."""
+        return _CassetteOpenAI(self, client)
+
+    def async_openai_client(self, client: Any = None) -> "_CassetteAsyncOpenAI":
+        return _CassetteAsyncOpenAI(self, client)
+
+
+def _require(client: Any) -> Any:
+    if client is None:
+        raise ValueError("Recording a cassette needs a real client (OPENAI_API_KEY).")
+    return client
+
+
+class _CassetteOpenAI:
+    def __init__(self, cassette: Cassette, client: Any) -> None:
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+        self.images = SimpleNamespace(generate=self._generate_image)
+        self._cassette = cassette
+        self._client = client
+
+    def _create_completion(self, **kwargs: Any) -> Any:
+        if kwargs.get("stream"):
+            return self._cassette.stream(
+                "openai.chat.stream",
+                kwargs,
+                lambda: _require(self._client).chat.completions.create(**kwargs),
+            )
+        return self._cassette.call(
+            "openai.chat",
+            kwargs,
+            lambda: _require(self._client).chat.completions.create(**kwargs),
+        )
+
+    def _generate_image(self, **kwargs: Any) -> Any:
+        return self._cassette.call("openai.images", kwargs, lambda: _require(self._client).images.generate(**kwargs))
+
+
+class _CassetteAsyncOpenAI:
+    def __init__(self, cassette: Cassette, client: Any) -> None:
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+        self._cassette = cassette
+        self._client = client
+
+    async def _create_completion(self, **kwargs: Any) -> Any:
+        # Same "openai.chat.stream" kind as the sync client, so either can replay the other's recordings.
+        if kwargs.get("stream"):
+            return await self._cassette.astream(
+                "openai.chat.stream",
+                kwargs,
+                lambda: _require(self._client).chat.completions.create(**kwargs),
+            )
+        return await self._cassette.acall(
+            "openai.chat",
+            kwargs,
+            lambda: _require(self._client).chat.completions.create(**kwargs),
+        )
+
+
+def get_cassette(config: Dict[str, Any]) -> Optional[Cassette]:
+    """
+    Return the cassette configured for this call, or None when calls go straight to providers.
+
+    Config keys:
+        - cassette_mode ("record" | "replay", optional)
+        - cassette_path (str, optional): JSONL file (default: data/llm_cassette.jsonl)
+        - cassette_latency ("none" | "recorded" | "sampled" | "synthetic", default: "none")
+        - cassette_latency_scale (float, default: 1.0): multiplier on injected latency
+        - cassette_latency_median_seconds / cassette_latency_p95_seconds (float, default: 1.0 / 3.0):
+          shape of the synthetic distribution
+        - cassette_match ("exact" | "loose", default: "exact"): loose replays any interaction
+          with the same model, system prompt and output format
+        - cassette_seed (int, default: 0)
+    """
+    mode = config.get("cassette_mode")
+    if not mode:
+        return None
+
+    path = str(config.get("cassette_path") or _default_cassette_path())
+    settings = {
+        "mode": mode,
+        "latency": config.get("cassette_latency", "none"),
+        "latency_scale": float(config.get("cassette_latency_scale", 1.0)),
+        "match": config.get("cassette_match", "exact"),
+        "synthetic_median_seconds": float(config.get("cassette_latency_median_seconds", 1.0)),
+        "synthetic_p95_seconds": float(config.get("cassette_latency_p95_seconds", 3.0)),
+        "seed": int(config.get("cassette_seed", 0)),
+    }
+    with _CASSETTES_LOCK:
+        cassette = _CASSETTES.get(path)
+        if cassette is None or cassette.mode != mode:
+            cassette = Cassette(path=path, **settings)
+            _CASSETTES[path] = cassette
+        else:
+            cassette.latency = settings["latency"]
+            cassette.latency_scale = settings["latency_scale"]
+            cassette.match = settings["match"]
+            cassette.synthetic_median_seconds = settings["synthetic_median_seconds"]
+            cassette.synthetic_p95_seconds = settings["synthetic_p95_seconds"]
+    return cassette
+
+
+def cassette_stats() -> Dict[str, Dict[str, Any]]:
+    with _CASSETTES_LOCK:
+        cassettes = list(_CASSETTES.values())
+    return {str(cassette.path): cassette.stats() for cassette in cassettes}
@@ -1,10 +1,24 @@
+import asyncio
 import json
+import logging
 import os
-import urllib.error
-import urllib.request
+import sys
+import threading
+import time
+from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
-COHERE_CHAT_URL = "https://api.cohere.com/v2/chat"
+import httpx
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from generation.cassette import get_cassette
+from generation.metrics import observe_llm_call
+from generation.resilience import CircuitOpenError, acall_with_retries, call_with_retries
+
+COHERE_API_BASE = "https://api.cohere.com"
+COHERE_CHAT_URL = f"{COHERE_API_BASE}/v2/chat"
 DEFAULT_COHERE_MODEL = "command-a-03-2025"
 COHERE_FALLBACK_MODELS = [
     "command-r7b-12-2024",
@@ -12,6 +26,31 @@ COHERE_FALLBACK_MODELS = [
     "command-r-08-2024",
 ]
 
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_KEEPALIVE_SECONDS = 30.0
+DEFAULT_AVAILABILITY_TTL_SECONDS = 600.0
+
+logger = logging.getLogger(__name__)
+
+_HTTP_CLIENTS: Dict[Tuple[int, float, float, float], httpx.Client] = {}
+# Keyed by the loop object itself (not id(), which a later loop can reuse); entries for
+# closed loops are dropped on the next lookup.
+_ASYNC_HTTP_CLIENTS: Dict[asyncio.AbstractEventLoop, Dict[Tuple[int, float, float, float], httpx.AsyncClient]] = {}
+_HTTP_CLIENTS_LOCK = threading.Lock()
+_AVAILABILITY: Dict[str, "ModelAvailability"] = {}
+_REFRESHERS: Dict[str, "ModelAvailabilityRefresher"] = {}
+_AVAILABILITY_LOCK = threading.Lock()
+
+
+def _cohere_base_url(config: Dict[str, Any]) -> str:
+    # config["cohere_base_url"] / COHERE_BASE_URL point the evaluator at a proxy or local stub.
+    return (config.get("cohere_base_url") or os.getenv("COHERE_BASE_URL") or COHERE_API_BASE).rstrip("/")
+
+
+def _cohere_chat_url(config: Dict[str, Any]) -> str:
+    return f"{_cohere_base_url(config)}/v2/chat"
+
 
 def _extract_text(response_json: Dict[str, Any]) -> str:
     message = response_json.get("message", {})
@@ -91,6 +130,359 @@ def _build_evaluator_prompt(
     )
 
 
+def _observe_call(
+    model: str,
+    started: float,
+    response_json: Optional[Dict[str, Any]] = None,
+    error: Optional[BaseException] = None,
+) -> None:
+    if error is not None:
+        result: Dict[str, Any] = {
+            "model": model,
+            "error": str(error),
+            "error_kind": type(error).__name__,
+            "attempts": getattr(error, "attempts", 1),
+        }
+    else:
+        tokens = ((response_json or {}).get("usage") or {}).get("tokens") or {}
+        result = {
+            "model": model,
+            "usage": {
+                "prompt_tokens": int(tokens.get("input_tokens", 0) or 0),
+                "completion_tokens": int(tokens.get("output_tokens", 0) or 0),
+            },
+        }
+    observe_llm_call(result, {"stage": "candidate_evaluation"}, time.perf_counter() - started, provider="cohere")
+
+
+class CohereHTTPError(RuntimeError):
+    """Non-2xx Cohere response; status_code and response feed retry classification."""
+
+    def __init__(self, response: httpx.Response) -> None:
+        super().__init__(f"Cohere HTTP error: {response.status_code}")
+        self.status_code = response.status_code
+        self.response = response
+        self.body = response.text
+
+
+def _pool_settings(config: Dict[str, Any]) -> Tuple[int, float, float, float]:
+    return (
+        int(config.get("cohere_pool_size", DEFAULT_POOL_SIZE)),
+        float(config.get("cohere_timeout", 40)),
+        float(config.get("cohere_connect_timeout", DEFAULT_CONNECT_TIMEOUT)),
+        float(config.get("cohere_keepalive_seconds", DEFAULT_KEEPALIVE_SECONDS)),
+    )
+
+
+def _client_options(settings: Tuple[int, float, float, float]) -> Dict[str, Any]:
+    pool_size, timeout, connect_timeout, keepalive_seconds = settings
+    return {
+        "limits": httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive_seconds,
+        ),
+        "timeout": httpx.Timeout(timeout, connect=connect_timeout),
+    }
+
+
+def _get_http_client(config: Dict[str, Any]) -> httpx.Client:
+    """
+    Process-wide keep-alive client, so evaluations reuse TCP/TLS connections.
+
+    Config keys:
+        - cohere_pool_size (int, default: 10): max pooled connections
+        - cohere_timeout (float, default: 40): read/write/pool timeout seconds
+        - cohere_connect_timeout (float, default: 5)
+        - cohere_keepalive_seconds (float, default: 30): idle connection expiry
+    """
+    settings = _pool_settings(config)
+    with _HTTP_CLIENTS_LOCK:
+        client = _HTTP_CLIENTS.get(settings)
+        if client is None:
+            client = httpx.Client(**_client_options(settings))
+            _HTTP_CLIENTS[settings] = client
+    return client
+
+
+def _get_async_http_client(config: Dict[str, Any]) -> httpx.AsyncClient:
+    # Async connection pools are bound to the event loop that created them.
+    settings = _pool_settings(config)
+    loop = asyncio.get_running_loop()
+    with _HTTP_CLIENTS_LOCK:
+        for closed in [other for other in _ASYNC_HTTP_CLIENTS if other.is_closed()]:
+            del _ASYNC_HTTP_CLIENTS[closed]
+        clients = _ASYNC_HTTP_CLIENTS.setdefault(loop, {})
+        client = clients.get(settings)
+        if client is None:
+            client = httpx.AsyncClient(**_client_options(settings))
+            clients[settings] = client
+    return client
+
+
+def _parse_response(response: httpx.Response) -> Dict[str, Any]:
+    if response.status_code >= 400:
+        raise CohereHTTPError(response)
+    return response.json()
+
+
+class ModelAvailability:
+    """
+    Which Cohere models answered 404 recently and which one last succeeded.
+
+    A 404'd model is skipped for ttl_seconds (or until a background probe finds it
+    again), so a misconfigured default costs one failed round trip per TTL instead of
+    one per evaluation. The caller's configured order is kept whenever its primary
+    model is available; only when the primary is skipped does the fallback that last
+    answered go first. When a mark is cleared the configured order applies again.
+    """
+
+    def __init__(self, ttl_seconds: float = DEFAULT_AVAILABILITY_TTL_SECONDS) -> None:
+        self.ttl_seconds = float(ttl_seconds)
+        self._lock = threading.Lock()
+        self._unavailable: Dict[str, float] = {}
+        self.last_success: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+
+    def mark_unavailable(self, model: str) -> None:
+        with self._lock:
+            self._unavailable[model] = time.monotonic()
+            if self.last_success == model:
+                self.last_success = None
+        logger.info("cohere.model_unavailable model=%s ttl_seconds=%.0f", model, self.ttl_seconds)
+
+    def mark_available(self, model: str) -> None:
+        with self._lock:
+            if self._unavailable.pop(model, None) is not None:
+                # Back to the configured order so the recovered model is preferred again.
+                self.last_success = None
+
+    def mark_success(self, model: str) -> None:
+        with self._lock:
+            self._unavailable.pop(model, None)
+            self.last_success = model
+            self.last_success_at = time.time()
+
+    def unavailable_models(self) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            for model, marked_at in list(self._unavailable.items()):
+                if now - marked_at >= self.ttl_seconds:
+                    del self._unavailable[model]
+                    self.last_success = None
+            return list(self._unavailable)
+
+    def order(self, models: List[str]) -> Tuple[List[str], List[str]]:
+        """(models to try, in order; models skipped as known-unavailable)."""
+        unavailable = set(self.unavailable_models())
+        available = [model for model in models if model not in unavailable]
+        if not available:
+            # Every entry may be stale; walking the full chain beats failing outright.
+            return list(models), []
+        skipped = [model for model in models if model in unavailable]
+        if models[0] not in unavailable:
+            # The caller's own choice is usable; another caller's success must not override it.
+            return available, skipped
+        with self._lock:
+            preferred = self.last_success
+        if preferred in available:
+            available.remove(preferred)
+            available.insert(0, preferred)
+        return available, skipped
+
+    def stats(self) -> Dict[str, Any]:
+        unavailable = self.unavailable_models()
+        with self._lock:
+            return {
+                "unavailable": unavailable,
+                "last_success": self.last_success,
+                "last_success_at": self.last_success_at,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+def _model_availability(config: Dict[str, Any]) -> ModelAvailability:
+    """
+    Process-wide availability cache for the configured Cohere endpoint.
+
+    Config keys:
+        - cohere_availability_ttl_seconds (float, default: 600): how long a 404'd model is skipped
+        - cohere_availability_refresh_seconds (float, default: 0): when > 0, a background
+          thread re-probes skipped models at this interval (see refresh_model_availability)
+    """
+    base_url = _cohere_base_url(config)
+    ttl_seconds = float(config.get("cohere_availability_ttl_seconds", DEFAULT_AVAILABILITY_TTL_SECONDS))
+    with _AVAILABILITY_LOCK:
+        availability = _AVAILABILITY.get(base_url)
+        if availability is None:
+            availability = ModelAvailability(ttl_seconds)
+            _AVAILABILITY[base_url] = availability
+        else:
+            availability.ttl_seconds = ttl_seconds
+    interval = float(config.get("cohere_availability_refresh_seconds", 0) or 0)
+    if interval > 0:
+        _ensure_refresher(base_url, config, interval)
+    return availability
+
+
+def refresh_model_availability(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Probe every model currently marked unavailable with GET /v1/models/{model}.
+
+    200 clears the mark, 404 renews it; other outcomes leave it to expire by TTL.
+    """
+    availability = _model_availability(dict(config, cohere_availability_refresh_seconds=0))
+    base_url = _cohere_base_url(config)
+    for model in availability.unavailable_models():
+        try:
+            response = _get_http_client(config).get(
+                f"{base_url}/v1/models/{model}",
+                headers=_request_headers(config),
+            )
+        except httpx.HTTPError as exc:
+            logger.warning("cohere.model_probe_failed model=%s: %s", model, exc)
+            continue
+        if response.status_code == 200:
+            availability.mark_available(model)
+            logger.info("cohere.model_available_again model=%s", model)
+        elif response.status_code == 404:
+            availability.mark_unavailable(model)
+    return availability.stats()
+
+
+class ModelAvailabilityRefresher(threading.Thread):
+    """Background poller that runs refresh_model_availability() for one Cohere base URL."""
+
+    def __init__(self, config: Dict[str, Any], interval_seconds: float) -> None:
+        super().__init__(name="cohere-model-refresh", daemon=True)
+        self.config = dict(config)
+        self.interval_seconds = float(interval_seconds)
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                refresh_model_availability(self.config)
+            except Exception as exc:
+                logger.warning("cohere.model_refresh_failed: %s", exc)
+
+
+def _ensure_refresher(base_url: str, config: Dict[str, Any], interval_seconds: float) -> None:
+    with _AVAILABILITY_LOCK:
+        refresher = _REFRESHERS.get(base_url)
+        if refresher is not None and refresher.is_alive():
+            return
+        refresher = ModelAvailabilityRefresher(config, interval_seconds)
+        _REFRESHERS[base_url] = refresher
+        refresher.start()
+
+
+def stop_model_refresher(config: Optional[Dict[str, Any]] = None) -> None:
+    """Stop the background probe for config's Cohere base URL, or every probe when config is None."""
+    with _AVAILABILITY_LOCK:
+        if config is None:
+            refreshers = list(_REFRESHERS.values())
+            _REFRESHERS.clear()
+        else:
+            refresher = _REFRESHERS.pop(_cohere_base_url(config), None)
+            refreshers = [refresher] if refresher is not None else []
+    for refresher in refreshers:
+        refresher.stop()
+
+
+def model_availability_stats() -> Dict[str, Dict[str, Any]]:
+    with _AVAILABILITY_LOCK:
+        items = list(_AVAILABILITY.items())
+    return {base_url: availability.stats() for base_url, availability in items}
+
+
+def _precheck(candidates: List[Dict[str, Any]], config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not candidates:
+        return {"error": "No candidates to evaluate."}
+    cohere_api_key = config.get("cohere_api_key") or os.getenv("COHERE_API_KEY")
+    cassette = get_cassette(config)
+    if not cohere_api_key and not (cassette is not None and cassette.mode == "replay"):
+        return {"error": "COHERE_API_KEY is not set. Falling back to first draft."}
+    return None
+
+
+def _candidate_models(config: Dict[str, Any]) -> List[str]:
+    model = config.get("cohere_model", DEFAULT_COHERE_MODEL)
+    return [model] + [m for m in COHERE_FALLBACK_MODELS if m != model]
+
+
+def _request_headers(config: Dict[str, Any]) -> Dict[str, str]:
+    cohere_api_key = config.get("cohere_api_key") or os.getenv("COHERE_API_KEY") or ""
+    return {
+        "Authorization": f"Bearer {cohere_api_key}",
+        "Content-Type": "application/json",
+    }
+
+
+def _build_payload(selected_model: str, prompt: str) -> Dict[str, Any]:
+    return {
+        "model": selected_model,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.1,
+    }
+
+
+def _failure(exc: BaseException, selected_model: str) -> Tuple[bool, Dict[str, Any]]:
+    """(try the next fallback model?, error metadata) for a failed evaluation call."""
+    if isinstance(exc, CircuitOpenError):
+        return False, {"error": f"Cohere unavailable: {exc}", "model": selected_model}
+    if isinstance(exc, CohereHTTPError):
+        error = {
+            "error": f"Cohere HTTP error: {exc.status_code}",
+            "details": exc.body,
+            "model": selected_model,
+        }
+        # Retry with a fallback model if current one is unavailable.
+        return exc.status_code == 404, error
+    return False, {"error": f"Cohere request failed: {exc}", "model": selected_model}
+
+
+def _build_evaluation_result(
+    response_json: Dict[str, Any],
+    candidates: List[Dict[str, Any]],
+    selected_model: str,
+    candidate_models: List[str],
+    skipped_models: List[str],
+) -> Tuple[int, Dict[str, Any]]:
+    evaluator_text = _extract_text(response_json)
+    parsed = _safe_json_loads(evaluator_text)
+
+    best_index = parsed.get("best_index", 0)
+    try:
+        best_index = int(best_index)
+    except Exception:
+        best_index = 0
+
+    if best_index < 0 or best_index >= len(candidates):
+        best_index = 0
+
+    metadata = {
+        "provider": "cohere",
+        "model": selected_model,
+        "raw_text": evaluator_text,
+        "parsed": parsed,
+        "fallback_chain": candidate_models,
+        "skipped_unavailable": skipped_models,
+    }
+    return best_index, metadata
+
+
+def _all_failed(last_error: Optional[Dict[str, Any]], candidate_models: List[str]) -> Tuple[int, Dict[str, Any]]:
+    return 0, {
+        "error": "Cohere evaluator failed for all configured models.",
+        "last_error": last_error,
+        "fallback_chain": candidate_models,
+    }
+
+
 def evaluate_candidates_with_cohere(
     topic: str,
     post_type: str,
@@ -98,82 +490,117 @@ def evaluate_candidates_with_cohere(
     candidates: List[Dict[str, Any]],
     config: Dict[str, Any],
 ) -> Tuple[int, Dict[str, Any]]:
-    if not candidates:
-        return 0, {"error": "No candidates to evaluate."}
+    error = _precheck(candidates, config)
+    if error:
+        return 0, error
 
-    cohere_api_key = config.get("cohere_api_key") or os.getenv("COHERE_API_KEY")
-    if not cohere_api_key:
-        return 0, {"error": "COHERE_API_KEY is not set. Falling back to first draft."}
-
-    model = config.get("cohere_model", DEFAULT_COHERE_MODEL)
-    candidate_models = [model] + [m for m in COHERE_FALLBACK_MODELS if m != model]
+    candidate_models = _candidate_models(config)
     prompt = _build_evaluator_prompt(
         topic=topic,
         post_type=post_type,
         business_objective=business_objective,
         candidates=candidates,
     )
-
+    chat_url = _cohere_chat_url(config)
+    headers = _request_headers(config)
+    cassette = get_cassette(config)
+    availability = _model_availability(config)
+    candidate_models, skipped_models = availability.order(candidate_models)
     last_error: Optional[Dict[str, Any]] = None
 
     for selected_model in candidate_models:
-        payload = {
-            "model": selected_model,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.1,
-        }
+        payload = _build_payload(selected_model, prompt)
 
-        req = urllib.request.Request(
-            COHERE_CHAT_URL,
-            data=json.dumps(payload).encode("utf-8"),
-            headers={
-                "Authorization": f"Bearer {cohere_api_key}",
-                "Content-Type": "application/json",
-            },
-            method="POST",
-        )
+        def _send() -> Dict[str, Any]:
+            return _parse_response(_get_http_client(config).post(chat_url, json=payload, headers=headers))
 
+        def _post(attempt: int) -> Dict[str, Any]:
+            if cassette is not None:
+                return cassette.call("cohere.chat", payload, _send)
+            return _send()
+
+        started = time.perf_counter()
         try:
-            with urllib.request.urlopen(req, timeout=float(config.get("cohere_timeout", 40))) as response:
-                raw = response.read().decode("utf-8")
-                response_json = json.loads(raw)
-        except urllib.error.HTTPError as exc:
-            last_error = {
-                "error": f"Cohere HTTP error: {exc.code}",
-                "details": exc.read().decode("utf-8", errors="ignore"),
-                "model": selected_model,
-            }
-            # Retry with a fallback model if current one is unavailable.
-            if exc.code == 404:
-                continue
-            return 0, last_error
+            # Transient errors (429/5xx/timeouts) are retried; the breaker fails fast during outages.
+            response_json = call_with_retries(
+                _post,
+                chat_url,
+                config,
+                retries=int(config.get("cohere_retries", config.get("retries", 3))),
+                label="cohere.chat",
+                model=selected_model,
+            )
         except Exception as exc:
-            last_error = {"error": f"Cohere request failed: {exc}", "model": selected_model}
+            _observe_call(selected_model, started, error=exc)
+            try_next, last_error = _failure(exc, selected_model)
+            if try_next:
+                availability.mark_unavailable(selected_model)
+                continue
             return 0, last_error
+        _observe_call(selected_model, started, response_json=response_json)
+        availability.mark_success(selected_model)
+        return _build_evaluation_result(response_json, candidates, selected_model, candidate_models, skipped_models)
 
-        evaluator_text = _extract_text(response_json)
-        parsed = _safe_json_loads(evaluator_text)
+    return _all_failed(last_error, candidate_models)
 
-        best_index = parsed.get("best_index", 0)
-        try:
-            best_index = int(best_index)
-        except Exception:
-            best_index = 0
 
-        if best_index < 0 or best_index >= len(candidates):
-            best_index = 0
+async def aevaluate_candidates_with_cohere(
+    topic: str,
+    post_type: str,
+    business_objective: str,
+    candidates: List[Dict[str, Any]],
+    config: Dict[str, Any],
+) -> Tuple[int, Dict[str, Any]]:
+    """Async variant of evaluate_candidates_with_cohere on a pooled httpx.AsyncClient."""
+    error = _precheck(candidates, config)
+    if error:
+        return 0, error
 
-        metadata = {
-            "provider": "cohere",
-            "model": selected_model,
-            "raw_text": evaluator_text,
-            "parsed": parsed,
-            "fallback_chain": candidate_models,
-        }
-        return best_index, metadata
+    candidate_models = _candidate_models(config)
+    prompt = _build_evaluator_prompt(
+        topic=topic,
+        post_type=post_type,
+        business_objective=business_objective,
+        candidates=candidates,
+    )
+    chat_url = _cohere_chat_url(config)
+    headers = _request_headers(config)
+    cassette = get_cassette(config)
+    availability = _model_availability(config)
+    candidate_models, skipped_models = availability.order(candidate_models)
+    last_error: Optional[Dict[str, Any]] = None
 
-    return 0, {
-        "error": "Cohere evaluator failed for all configured models.",
-        "last_error": last_error,
-        "fallback_chain": candidate_models,
-    }
+    for selected_model in candidate_models:
+        payload = _build_payload(selected_model, prompt)
+
+        async def _send() -> Dict[str, Any]:
+            client = _get_async_http_client(config)
+            return _parse_response(await client.post(chat_url, json=payload, headers=headers))
+
+        async def _post(attempt: int) -> Dict[str, Any]:
+            if cassette is not None:
+                return await cassette.acall("cohere.chat", payload, _send)
+            return await _send()
+
+        started = time.perf_counter()
+        try:
+            response_json = await acall_with_retries(
+                _post,
+                chat_url,
+                config,
+                retries=int(config.get("cohere_retries", config.get("retries", 3))),
+                label="cohere.achat",
+                model=selected_model,
+            )
+        except Exception as exc:
+            _observe_call(selected_model, started, error=exc)
+            try_next, last_error = _failure(exc, selected_model)
+            if try_next:
+                availability.mark_unavailable(selected_model)
+                continue
+            return 0, last_error
+        _observe_call(selected_model, started, response_json=response_json)
+        availability.mark_success(selected_model)
+        return _build_evaluation_result(response_json, candidates, selected_model, candidate_models, skipped_models)
+
+    return _all_failed(last_error, candidate_models)
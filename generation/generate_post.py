@@ -1,11 +1,12 @@
 import argparse
+import asyncio
 import concurrent.futures
 import json
 import logging
 import os
 import sys
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -19,14 +20,14 @@ if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 # Now import local modules
-from generation.llm_client import generate_completion
-from generation.cohere_evaluator import evaluate_candidates_with_cohere
-from src.document_processor import DocumentProcessor
-
-# Initialize document processor for RAG
-doc_processor = DocumentProcessor()
-doc_processor.load_all()
-logger.info("📚 RAG knowledge base loaded")
+from generation.llm_client import agenerate_completion, generate_completion
+from generation.cohere_evaluator import aevaluate_candidates_with_cohere, evaluate_candidates_with_cohere
+from generation.knowledge_base import doc_processor
+from generation.metrics import dump_metrics_json
+from generation.model_router import load_routing_policy, route_stage
+from generation.cassette import CASSETTE_MODES, LATENCY_MODES, MATCH_MODES
+from generation.tracing import TRACE_FORMATS, bind_context, span, start_trace
+from src.document_processor import estimate_tokens
 
 OPENAI_MODEL_OPTIONS = [
     "gpt-4o-mini",
@@ -53,6 +54,9 @@ ANGLE_STRATEGIES = [
     ("case_first", "Start with a concrete case/example first, then extract the insight and implication."),
 ]
 
+# "fanout" sends one request per angle; "batched" asks for every angle in one JSON response.
+CANDIDATE_MODES = ("fanout", "batched")
+
 def _project_root() -> Path:
     return Path(__file__).resolve().parent.parent
 
@@ -68,12 +72,10 @@ def _build_user_prompt(
     template_text: str,
     topic: str,
     business_objective: str,
+    brand_context: str,
     angle_instruction: str = "",
     feedback_guidance: str = "",
 ) -> str:
-    # GET RAG CONTEXT FROM KNOWLEDGE BASE
-    context = doc_processor.search(topic)
-    
     print(f"DEBUG: business_objective value = '{business_objective}'")
     print(f"DEBUG: template_text contains: {template_text[:100]}...")
     
@@ -83,7 +85,7 @@ def _build_user_prompt(
             topic=topic,
             audience="SME decision makers",
             business_objective=business_objective,
-            brand_context=context,
+            brand_context=brand_context,
             market_context="N/A",
         )
     except KeyError as e:
@@ -99,51 +101,85 @@ def _build_user_prompt(
     return "\n\n".join(sections)
 
 
+def _build_angle_messages(
+    system_prompt: str,
+    template_text: str,
+    topic: str,
+    business_objective: str,
+    brand_context: str,
+    angle_instruction: str,
+    feedback_guidance: str,
+) -> List[Dict[str, str]]:
+    user_prompt = _build_user_prompt(
+        template_text=template_text,
+        topic=topic,
+        business_objective=business_objective,
+        brand_context=brand_context,
+        angle_instruction=angle_instruction,
+        feedback_guidance=feedback_guidance,
+    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def _build_candidate(post_type: str, angle_name: str, llm_result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "post_type": post_type,
+        "angle": angle_name,
+        "text": (llm_result.get("content") or "").strip(),
+        "llm": {
+            "model": llm_result.get("model"),
+            "attempts": llm_result.get("attempts"),
+            "usage": llm_result.get("usage", {}),
+            "length": llm_result.get("length", {}),
+            "estimated_cost_usd": llm_result.get("estimated_cost_usd", 0.0),
+            "cache": llm_result.get("cache", {}),
+            "error": llm_result.get("error"),
+        },
+    }
+
+
 def _generate_candidate_drafts(
     system_prompt: str,
     template_text: str,
     topic: str,
     post_type: str,
     business_objective: str,
+    brand_context: str,
     config: Dict[str, Any],
     feedback_guidance: str = "",
+    on_delta: Optional[Callable[[str], None]] = None,
+    angles: Optional[List[Tuple[str, str]]] = None,
 ) -> List[Dict[str, Any]]:
+    angles = ANGLE_STRATEGIES if angles is None else angles
     candidates_by_index: Dict[int, Dict[str, Any]] = {}
 
     def _generate_for_angle(index: int, angle_name: str, angle_instruction: str) -> Tuple[int, Dict[str, Any]]:
-        user_prompt = _build_user_prompt(
+        messages = _build_angle_messages(
+            system_prompt=system_prompt,
             template_text=template_text,
             topic=topic,
             business_objective=business_objective,
+            brand_context=brand_context,
             angle_instruction=angle_instruction,
             feedback_guidance=feedback_guidance,
         )
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ]
-        llm_result = generate_completion(messages=messages, config=config)
-        text = (llm_result.get("content") or "").strip()
-        candidate = {
-            "post_type": post_type,
-            "angle": angle_name,
-            "text": text,
-            "llm": {
-                "model": llm_result.get("model"),
-                "attempts": llm_result.get("attempts"),
-                "usage": llm_result.get("usage", {}),
-                "length": llm_result.get("length", {}),
-                "estimated_cost_usd": llm_result.get("estimated_cost_usd", 0.0),
-                "error": llm_result.get("error"),
-            },
-        }
-        return index, candidate
-
-    max_workers = min(len(ANGLE_STRATEGIES), int(config.get("parallel_workers", 3)))
+        # Only the first angle is streamed; it serves as the live preview.
+        with span("draft.angle", angle=angle_name):
+            llm_result = generate_completion(
+                messages=messages,
+                config=config,
+                on_delta=on_delta if index == 0 else None,
+            )
+        return index, _build_candidate(post_type, angle_name, llm_result)
+
+    max_workers = max(1, min(len(angles), int(config.get("parallel_workers", 3))))
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
         futures = [
-            executor.submit(_generate_for_angle, idx, angle_name, angle_instruction)
-            for idx, (angle_name, angle_instruction) in enumerate(ANGLE_STRATEGIES)
+            executor.submit(bind_context(_generate_for_angle), idx, angle_name, angle_instruction)
+            for idx, (angle_name, angle_instruction) in enumerate(angles)
         ]
         for future in concurrent.futures.as_completed(futures):
             try:
@@ -159,38 +195,24 @@ def _generate_candidate_drafts(
     # DEBUG: Check if any candidates were generated
     if not candidates_by_index:
         print("DEBUG: No candidates generated. Testing each angle directly...")
-        for idx, (angle_name, angle_instruction) in enumerate(ANGLE_STRATEGIES):
+        for idx, (angle_name, angle_instruction) in enumerate(angles):
             print(f"DEBUG: Testing angle {idx}: {angle_name}")
-            user_prompt = _build_user_prompt(
+            messages = _build_angle_messages(
+                system_prompt=system_prompt,
                 template_text=template_text,
                 topic=topic,
                 business_objective=business_objective,
+                brand_context=brand_context,
                 angle_instruction=angle_instruction,
                 feedback_guidance=feedback_guidance,
             )
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ]
             try:
                 llm_result = generate_completion(messages=messages, config=config)
                 text = (llm_result.get("content") or "").strip()
                 print(f"DEBUG: Result length: {len(text)}")
                 if text:
                     print(f"DEBUG: Preview: {text[:100]}...")
-                    candidates_by_index[idx] = {
-                        "post_type": post_type,
-                        "angle": angle_name,
-                        "text": text,
-                        "llm": {
-                            "model": llm_result.get("model"),
-                            "attempts": llm_result.get("attempts"),
-                            "usage": llm_result.get("usage", {}),
-                            "length": llm_result.get("length", {}),
-                            "estimated_cost_usd": llm_result.get("estimated_cost_usd", 0.0),
-                            "error": llm_result.get("error"),
-                        },
-                    }
+                    candidates_by_index[idx] = _build_candidate(post_type, angle_name, llm_result)
                 else:
                     print("DEBUG: Empty response")
             except Exception as e:
@@ -200,18 +222,257 @@ def _generate_candidate_drafts(
     return [candidates_by_index[idx] for idx in ordered_indices]
 
 
-def generate_post(
+async def _agenerate_candidate_drafts(
+    system_prompt: str,
+    template_text: str,
     topic: str,
     post_type: str,
     business_objective: str,
+    brand_context: str,
     config: Dict[str, Any],
-) -> Tuple[str, Dict[str, Any]]:
-    """
-    Generate a LinkedIn post via OpenAI using system + template prompt assembly.
+    feedback_guidance: str = "",
+    angles: Optional[List[Tuple[str, str]]] = None,
+) -> List[Dict[str, Any]]:
+    angles = ANGLE_STRATEGIES if angles is None else angles
 
-    Returns:
-        (final_post, metadata)
-    """
+    async def _generate_for_angle(angle_name: str, angle_instruction: str) -> Dict[str, Any]:
+        messages = _build_angle_messages(
+            system_prompt=system_prompt,
+            template_text=template_text,
+            topic=topic,
+            business_objective=business_objective,
+            brand_context=brand_context,
+            angle_instruction=angle_instruction,
+            feedback_guidance=feedback_guidance,
+        )
+        with span("draft.angle", angle=angle_name):
+            llm_result = await agenerate_completion(messages=messages, config=config)
+        return _build_candidate(post_type, angle_name, llm_result)
+
+    results = await asyncio.gather(
+        *(_generate_for_angle(angle_name, angle_instruction) for angle_name, angle_instruction in angles),
+        return_exceptions=True,
+    )
+    candidates: List[Dict[str, Any]] = []
+    for (angle_name, _), result in zip(angles, results):
+        if isinstance(result, BaseException):
+            logger.warning("Draft generation failed for angle %s: %s", angle_name, result)
+            continue
+        if (result.get("text") or "").strip():
+            candidates.append(result)
+    return candidates
+
+
+def _build_batched_request(
+    system_prompt: str,
+    template_text: str,
+    topic: str,
+    business_objective: str,
+    brand_context: str,
+    feedback_guidance: str,
+    config: Dict[str, Any],
+) -> Tuple[List[Dict[str, str]], Dict[str, Any], Dict[str, int]]:
+    base_prompt = _build_user_prompt(
+        template_text=template_text,
+        topic=topic,
+        business_objective=business_objective,
+        brand_context=brand_context,
+        feedback_guidance=feedback_guidance,
+    )
+    angle_lines = "\n".join(f'- "{name}": {instruction}' for name, instruction in ANGLE_STRATEGIES)
+    batched_prompt = (
+        f"{base_prompt}\n\n"
+        f"Write {len(ANGLE_STRATEGIES)} alternative drafts of this post, one per angle below. "
+        "Each draft must be a complete, standalone post.\n"
+        f"Angles:\n{angle_lines}\n\n"
+        "Return strict JSON only with this schema:\n"
+        '{"drafts": [{"angle": "<angle name>", "text": "<full post>"}]}'
+    )
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": batched_prompt},
+    ]
+    batch_config = dict(config)
+    batch_config["response_format"] = {"type": "json_object"}
+    batch_config["max_tokens"] = int(config.get("max_tokens", 500)) * len(ANGLE_STRATEGIES)
+
+    # Both sides use the same chars/4 estimate so the saving compares like with like:
+    # the batched prompt versus the shared prompt once per angle plus each angle line.
+    prompt_estimates = {"batched": estimate_tokens(system_prompt) + estimate_tokens(batched_prompt)}
+    for name, instruction in ANGLE_STRATEGIES:
+        prompt_estimates[name] = estimate_tokens(system_prompt) + estimate_tokens(
+            f"{base_prompt}\n\nAdditional angle instruction:\n- {instruction}"
+        )
+    return messages, batch_config, prompt_estimates
+
+
+def _parse_batched_drafts(content: str) -> Dict[str, str]:
+    text = (content or "").strip()
+    try:
+        payload = json.loads(text)
+    except json.JSONDecodeError:
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            return {}
+        try:
+            payload = json.loads(text[start : end + 1])
+        except json.JSONDecodeError:
+            return {}
+
+    drafts = payload.get("drafts") if isinstance(payload, dict) else None
+    known_angles = {name for name, _ in ANGLE_STRATEGIES}
+    texts: Dict[str, str] = {}
+    for item in drafts if isinstance(drafts, list) else []:
+        if not isinstance(item, dict):
+            continue
+        angle = str(item.get("angle") or "").strip()
+        draft = str(item.get("text") or "").strip()
+        if angle in known_angles and draft and angle not in texts:
+            texts[angle] = draft
+    return texts
+
+
+def _collect_batched_candidates(
+    post_type: str,
+    llm_result: Dict[str, Any],
+) -> Tuple[Dict[str, Dict[str, Any]], List[Tuple[str, str]]]:
+    texts = _parse_batched_drafts(llm_result.get("content", ""))
+    total_chars = sum(len(text) for text in texts.values())
+    usage = llm_result.get("usage", {})
+    candidates: Dict[str, Dict[str, Any]] = {}
+    for angle_name, _ in ANGLE_STRATEGIES:
+        if angle_name in texts:
+            candidate = _build_candidate(post_type, angle_name, dict(llm_result, content=texts[angle_name]))
+            # Charge each draft its share of the one shared request, by how much of the output it is;
+            # the full batch usage and cost are reported once, in the token report.
+            share = len(texts[angle_name]) / total_chars
+            candidate["llm"]["usage"] = {key: int(round(int(value) * share)) for key, value in usage.items()}
+            candidate["llm"]["estimated_cost_usd"] = float(llm_result.get("estimated_cost_usd", 0.0)) * share
+            candidate["llm"]["batched"] = True
+            candidate["llm"]["batch_share"] = round(share, 4)
+            candidates[angle_name] = candidate
+    missing = [(name, instruction) for name, instruction in ANGLE_STRATEGIES if name not in candidates]
+    if missing:
+        logger.warning(
+            "Batched draft response missing angles %s; falling back to per-angle requests",
+            ", ".join(name for name, _ in missing),
+        )
+    return candidates, missing
+
+
+def _order_candidates(
+    batched: Dict[str, Dict[str, Any]],
+    fallback: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    by_angle = dict(batched)
+    by_angle.update({candidate["angle"]: candidate for candidate in fallback})
+    return [by_angle[name] for name, _ in ANGLE_STRATEGIES if name in by_angle]
+
+
+def _token_report(
+    mode: str,
+    candidates: List[Dict[str, Any]],
+    batch_result: Optional[Dict[str, Any]] = None,
+    prompt_estimates: Optional[Dict[str, int]] = None,
+) -> Dict[str, Any]:
+    unbatched = [candidate for candidate in candidates if not candidate["llm"].get("batched")]
+    usages = [candidate["llm"].get("usage", {}) for candidate in unbatched]
+    costs = [float(candidate["llm"].get("estimated_cost_usd") or 0.0) for candidate in unbatched]
+    if batch_result is not None:
+        usages.append(batch_result.get("usage", {}))
+        costs.append(float(batch_result.get("estimated_cost_usd") or 0.0))
+    report: Dict[str, Any] = {
+        "mode": mode,
+        "requests": len(unbatched) + (1 if batch_result is not None else 0),
+        "prompt_tokens": sum(int(usage.get("prompt_tokens", 0)) for usage in usages),
+        "completion_tokens": sum(int(usage.get("completion_tokens", 0)) for usage in usages),
+        "estimated_cost_usd": sum(costs),
+    }
+    if batch_result is not None:
+        report["batch_estimated_cost_usd"] = float(batch_result.get("estimated_cost_usd") or 0.0)
+    if prompt_estimates is not None:
+        fallback_angles = [candidate["angle"] for candidate in unbatched]
+        fanout_estimate = sum(prompt_estimates[name] for name, _ in ANGLE_STRATEGIES)
+        batched_estimate = prompt_estimates["batched"] + sum(prompt_estimates[name] for name in fallback_angles)
+        report["fanout_prompt_tokens_estimate"] = fanout_estimate
+        report["batched_prompt_tokens_estimate"] = batched_estimate
+        report["prompt_tokens_saved_estimate"] = fanout_estimate - batched_estimate
+        report["fallback_angles"] = fallback_angles
+    return report
+
+
+def _generate_batched_candidate_drafts(
+    system_prompt: str,
+    template_text: str,
+    topic: str,
+    post_type: str,
+    business_objective: str,
+    brand_context: str,
+    config: Dict[str, Any],
+    feedback_guidance: str = "",
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    messages, batch_config, prompt_estimates = _build_batched_request(
+        system_prompt, template_text, topic, business_objective, brand_context, feedback_guidance, config
+    )
+    llm_result = generate_completion(messages=messages, config=batch_config)
+    batched, missing = _collect_batched_candidates(post_type, llm_result)
+    fallback: List[Dict[str, Any]] = []
+    if missing:
+        fallback = _generate_candidate_drafts(
+            system_prompt=system_prompt,
+            template_text=template_text,
+            topic=topic,
+            post_type=post_type,
+            business_objective=business_objective,
+            brand_context=brand_context,
+            config=config,
+            feedback_guidance=feedback_guidance,
+            angles=missing,
+        )
+    candidates = _order_candidates(batched, fallback)
+    return candidates, _token_report("batched", candidates, llm_result, prompt_estimates)
+
+
+async def _agenerate_batched_candidate_drafts(
+    system_prompt: str,
+    template_text: str,
+    topic: str,
+    post_type: str,
+    business_objective: str,
+    brand_context: str,
+    config: Dict[str, Any],
+    feedback_guidance: str = "",
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    messages, batch_config, prompt_estimates = _build_batched_request(
+        system_prompt, template_text, topic, business_objective, brand_context, feedback_guidance, config
+    )
+    llm_result = await agenerate_completion(messages=messages, config=batch_config)
+    batched, missing = _collect_batched_candidates(post_type, llm_result)
+    fallback: List[Dict[str, Any]] = []
+    if missing:
+        fallback = await _agenerate_candidate_drafts(
+            system_prompt=system_prompt,
+            template_text=template_text,
+            topic=topic,
+            post_type=post_type,
+            business_objective=business_objective,
+            brand_context=brand_context,
+            config=config,
+            feedback_guidance=feedback_guidance,
+            angles=missing,
+        )
+    candidates = _order_candidates(batched, fallback)
+    return candidates, _token_report("batched", candidates, llm_result, prompt_estimates)
+
+
+def _candidate_mode(config: Dict[str, Any]) -> str:
+    mode = str(config.get("candidate_mode", "fanout")).strip().lower()
+    if mode not in CANDIDATE_MODES:
+        raise ValueError(f"Unsupported candidate_mode '{mode}'. Use one of: {', '.join(CANDIDATE_MODES)}")
+    return mode
+
+
+def _prepare_generation(post_type: str, config: Dict[str, Any]) -> Tuple[str, str, str, str]:
     normalized_type = post_type.strip().lower()
     if normalized_type not in TEMPLATE_MAP:
         raise ValueError(
@@ -222,33 +483,28 @@ def generate_post(
     system_prompt = _load_prompt_file("system_prompt.txt")
     template_text = _load_prompt_file(TEMPLATE_MAP[normalized_type])
     feedback_guidance = str(config.get("feedback_guidance", "") or "")
-    candidates = _generate_candidate_drafts(
-        system_prompt=system_prompt,
-        template_text=template_text,
-        topic=topic,
-        post_type=normalized_type,
-        business_objective=business_objective,
-        config=config,
-        feedback_guidance=feedback_guidance,
-    )
-    if not candidates:
-        raise RuntimeError("Failed to generate candidate drafts.")
+    return normalized_type, system_prompt, template_text, feedback_guidance
 
-    best_index, evaluator_metadata = evaluate_candidates_with_cohere(
-        topic=topic,
-        post_type=normalized_type,
-        business_objective=business_objective,
-        candidates=candidates,
-        config=config,
-    )
-    selected = candidates[best_index]
-    final_post = selected["text"]
 
-    metadata = {
+def _build_generation_metadata(
+    topic: str,
+    normalized_type: str,
+    business_objective: str,
+    config: Dict[str, Any],
+    feedback_guidance: str,
+    candidates: List[Dict[str, Any]],
+    best_index: int,
+    evaluator_metadata: Dict[str, Any],
+    token_report: Dict[str, Any],
+    rag_stats: Dict[str, Any],
+) -> Dict[str, Any]:
+    selected = candidates[best_index]
+    return {
         "topic": topic,
         "post_type": normalized_type,
         "business_objective": business_objective,
         "rag_context_used": True,
+        "rag": rag_stats,
         "prompt_files": {
             "system": "prompts/system_prompt.txt",
             "template": f"prompts/{TEMPLATE_MAP[normalized_type]}",
@@ -260,6 +516,7 @@ def generate_post(
             "selected_angle": selected["angle"],
             "evaluator": evaluator_metadata,
             "feedback_guidance_used": bool(feedback_guidance.strip()),
+            "tokens": token_report,
         },
         "candidates": candidates,
         "llm": {
@@ -268,10 +525,152 @@ def generate_post(
             "usage": selected["llm"].get("usage", {}),
             "length": selected["llm"].get("length", {}),
             "estimated_cost_usd": selected["llm"].get("estimated_cost_usd", 0.0),
+            "cache": selected["llm"].get("cache", {}),
             "error": selected["llm"].get("error"),
+            "batched": selected["llm"].get("batched", False),
         },
     }
-    return final_post, metadata
+
+
+def generate_post(
+    topic: str,
+    post_type: str,
+    business_objective: str,
+    config: Dict[str, Any],
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Generate a LinkedIn post via OpenAI using system + template prompt assembly.
+
+    on_delta, when given, receives the first angle's draft as it streams in
+    (fan-out mode only; a batched JSON response is not previewed).
+
+    config["candidate_mode"] selects "fanout" (default, one request per angle) or
+    "batched" (all angles in one JSON request, per-angle fallback for missing drafts).
+
+    Returns:
+        (final_post, metadata)
+    """
+    config = route_stage("draft", config)
+    normalized_type, system_prompt, template_text, feedback_guidance = _prepare_generation(post_type, config)
+    # One retrieval per post: every angle shares the context and the metadata reuses its stats.
+    brand_context, rag_stats = doc_processor.retrieve_context(topic, config)
+    if _candidate_mode(config) == "batched":
+        candidates, token_report = _generate_batched_candidate_drafts(
+            system_prompt=system_prompt,
+            template_text=template_text,
+            topic=topic,
+            post_type=normalized_type,
+            business_objective=business_objective,
+            brand_context=brand_context,
+            config=config,
+            feedback_guidance=feedback_guidance,
+        )
+    else:
+        candidates = _generate_candidate_drafts(
+            system_prompt=system_prompt,
+            template_text=template_text,
+            topic=topic,
+            post_type=normalized_type,
+            business_objective=business_objective,
+            brand_context=brand_context,
+            config=config,
+            feedback_guidance=feedback_guidance,
+            on_delta=on_delta,
+        )
+        token_report = _token_report("fanout", candidates)
+    if not candidates:
+        raise RuntimeError("Failed to generate candidate drafts.")
+
+    with span("candidate_selection", candidates=len(candidates)) as selection_span:
+        best_index, evaluator_metadata = evaluate_candidates_with_cohere(
+            topic=topic,
+            post_type=normalized_type,
+            business_objective=business_objective,
+            candidates=candidates,
+            config=config,
+        )
+        selection_span.set_attribute("best_index", best_index)
+    metadata = _build_generation_metadata(
+        topic=topic,
+        normalized_type=normalized_type,
+        business_objective=business_objective,
+        config=config,
+        feedback_guidance=feedback_guidance,
+        candidates=candidates,
+        best_index=best_index,
+        evaluator_metadata=evaluator_metadata,
+        token_report=token_report,
+        rag_stats=rag_stats,
+    )
+    return candidates[best_index]["text"], metadata
+
+
+async def agenerate_post(
+    topic: str,
+    post_type: str,
+    business_objective: str,
+    config: Dict[str, Any],
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    Async variant of generate_post: angle drafts run concurrently on the event loop.
+
+    Returns:
+        (final_post, metadata)
+    """
+    config = route_stage("draft", config)
+    normalized_type, system_prompt, template_text, feedback_guidance = _prepare_generation(post_type, config)
+    # One retrieval per post: every angle shares the context and the metadata reuses its stats.
+    # Retrieval is blocking (file I/O, scoring); keep it off the event loop.
+    brand_context, rag_stats = await asyncio.to_thread(doc_processor.retrieve_context, topic, config)
+    if _candidate_mode(config) == "batched":
+        candidates, token_report = await _agenerate_batched_candidate_drafts(
+            system_prompt=system_prompt,
+            template_text=template_text,
+            topic=topic,
+            post_type=normalized_type,
+            business_objective=business_objective,
+            brand_context=brand_context,
+            config=config,
+            feedback_guidance=feedback_guidance,
+        )
+    else:
+        candidates = await _agenerate_candidate_drafts(
+            system_prompt=system_prompt,
+            template_text=template_text,
+            topic=topic,
+            post_type=normalized_type,
+            business_objective=business_objective,
+            brand_context=brand_context,
+            config=config,
+            feedback_guidance=feedback_guidance,
+        )
+        token_report = _token_report("fanout", candidates)
+    if not candidates:
+        raise RuntimeError("Failed to generate candidate drafts.")
+
+    with span("candidate_selection", candidates=len(candidates)) as selection_span:
+        best_index, evaluator_metadata = await aevaluate_candidates_with_cohere(
+            topic=topic,
+            post_type=normalized_type,
+            business_objective=business_objective,
+            candidates=candidates,
+            config=config,
+        )
+        selection_span.set_attribute("best_index", best_index)
+    metadata = _build_generation_metadata(
+        topic=topic,
+        normalized_type=normalized_type,
+        business_objective=business_objective,
+        config=config,
+        feedback_guidance=feedback_guidance,
+        candidates=candidates,
+        best_index=best_index,
+        evaluator_metadata=evaluator_metadata,
+        token_report=token_report,
+        rag_stats=rag_stats,
+    )
+    return candidates[best_index]["text"], metadata
 
 
 def _build_arg_parser() -> argparse.ArgumentParser:
@@ -295,11 +694,85 @@ def _build_arg_parser() -> argparse.ArgumentParser:
     parser.add_argument("--retries", type=int, default=3, help="Retry attempts")
     parser.add_argument("--retry-backoff-seconds", type=float, default=1.0, help="Retry backoff")
     parser.add_argument("--timeout", type=float, default=60.0, help="Request timeout seconds")
+    parser.add_argument(
+        "--rag-mode",
+        default="lexical",
+        choices=["lexical", "dense", "hybrid"],
+        help="Knowledge-base retrieval mode",
+    )
+    parser.add_argument(
+        "--rag-token-budget",
+        type=int,
+        default=None,
+        help="Token budget for knowledge-base context (default: top 3 chunks)",
+    )
+    parser.add_argument(
+        "--response-cache",
+        action="store_true",
+        help="Reuse identical LLM responses from the local SQLite cache",
+    )
+    parser.add_argument(
+        "--cache-bypass",
+        action="store_true",
+        help="Skip cache reads for this run (fresh responses are still stored)",
+    )
+    parser.add_argument(
+        "--candidate-mode",
+        default="fanout",
+        choices=list(CANDIDATE_MODES),
+        help="Draft angles with one request each (fanout) or all in one JSON request (batched)",
+    )
+    parser.add_argument(
+        "--model-routing",
+        nargs="?",
+        const="default",
+        default=None,
+        help="Route stages to models by policy: 'default' or a JSON policy file",
+    )
+    parser.add_argument("--rpm-limit", type=float, default=None, help="Client-side requests/minute budget")
+    parser.add_argument("--tpm-limit", type=float, default=None, help="Client-side tokens/minute budget")
     parser.add_argument(
         "--api-key",
         default=None,
         help="OpenAI API key (falls back to OPENAI_API_KEY env var)",
     )
+    parser.add_argument(
+        "--metrics-json",
+        default=None,
+        help="Write LLM call metrics (counts, latency percentiles, tokens, cost) to this JSON file",
+    )
+    parser.add_argument("--base-url", default=None, help="OpenAI-compatible API base URL (e.g. a local stub)")
+    parser.add_argument("--cohere-base-url", default=None, help="Cohere API base URL (default: api.cohere.com)")
+    parser.add_argument(
+        "--cassette-mode",
+        choices=CASSETTE_MODES,
+        default=None,
+        help="Record provider traffic to a cassette, or replay one offline (no API keys needed)",
+    )
+    parser.add_argument("--cassette-path", default=None, help="Cassette JSONL file (default: data/llm_cassette.jsonl)")
+    parser.add_argument(
+        "--cassette-latency",
+        choices=LATENCY_MODES,
+        default="recorded",
+        help="Latency injected on replay",
+    )
+    parser.add_argument(
+        "--cassette-match",
+        choices=MATCH_MODES,
+        default="exact",
+        help="loose replays any interaction with the same model and system prompt",
+    )
+    parser.add_argument(
+        "--trace-out",
+        default=None,
+        help="Write the run's spans (drafts, Cohere selection, HTTP attempts) to this file",
+    )
+    parser.add_argument(
+        "--trace-format",
+        choices=TRACE_FORMATS,
+        default="json",
+        help="Trace file format: span tree with critical path, or OTLP/JSON",
+    )
     parser.add_argument(
         "--metadata-only",
         action="store_true",
@@ -320,20 +793,50 @@ def main() -> None:
         "retries": args.retries,
         "retry_backoff_seconds": args.retry_backoff_seconds,
         "timeout": args.timeout,
+        "rag_mode": args.rag_mode,
+        "candidate_mode": args.candidate_mode,
     }
+    if args.rag_token_budget:
+        config["rag_token_budget"] = args.rag_token_budget
+    if args.response_cache:
+        config["response_cache"] = True
+        config["cache_bypass"] = args.cache_bypass
+    routing_policy = load_routing_policy(args.model_routing)
+    if routing_policy:
+        config["model_routing"] = routing_policy
+    if args.rpm_limit:
+        config["rate_limit_rpm"] = args.rpm_limit
+    if args.tpm_limit:
+        config["rate_limit_tpm"] = args.tpm_limit
     if args.api_key:
         config["api_key"] = args.api_key
-
-    has_api_key = bool(config.get("api_key") or os.getenv("OPENAI_API_KEY"))
+    if args.base_url:
+        config["base_url"] = args.base_url
+    if args.cohere_base_url:
+        config["cohere_base_url"] = args.cohere_base_url
+    if args.cassette_mode:
+        config["cassette_mode"] = args.cassette_mode
+        config["cassette_latency"] = args.cassette_latency
+        config["cassette_match"] = args.cassette_match
+        if args.cassette_path:
+            config["cassette_path"] = args.cassette_path
+
+    has_api_key = args.cassette_mode == "replay" or bool(config.get("api_key") or os.getenv("OPENAI_API_KEY"))
     if not has_api_key:
         raise ValueError("OPENAI_API_KEY is not set. Provide --api-key or export OPENAI_API_KEY.")
 
-    post, metadata = generate_post(
-        topic=args.topic,
-        post_type=args.post_type,
-        business_objective=args.business_objective,
-        config=config,
-    )
+    with start_trace("generate_post", post_type=args.post_type, topic=args.topic) as trace:
+        post, metadata = generate_post(
+            topic=args.topic,
+            post_type=args.post_type,
+            business_objective=args.business_objective,
+            config=config,
+        )
+    metadata["trace"] = trace.to_dict()
+    if args.trace_out:
+        trace.export(args.trace_out, fmt=args.trace_format)
+    if args.metrics_json:
+        dump_metrics_json(args.metrics_json)
 
     if args.metadata_only:
         print(json.dumps(metadata, indent=2))
@@ -3,10 +3,9 @@ import os
 import re
 import socket
 import sys
-import concurrent.futures
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import gradio as gr
 from dotenv import load_dotenv
@@ -14,12 +13,13 @@ from dotenv import load_dotenv
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from generation.generate_post import OPENAI_MODEL_OPTIONS, generate_post, doc_processor
+from generation.generate_post import OPENAI_MODEL_OPTIONS
+from generation.knowledge_base import doc_processor
+from generation.model_router import load_routing_policy, route_stage
 from generation.llm_client import generate_completion
-from generation.brand_checker import check_brand_consistency
-from generation.refiner import refine_post
-from generation.post_assets import generate_hashtags, generate_post_image
-from generation.feedback_loop import build_feedback_guidance, save_feedback
+from generation.metrics import start_metrics_server
+from generation.pipeline import iter_pipeline_events
+from generation.feedback_loop import save_feedback
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 ASSETS_DIR = PROJECT_ROOT / "assets"
@@ -199,6 +199,30 @@ load_dotenv(PROJECT_ROOT / ".ENV")
 load_dotenv(PROJECT_ROOT / ".env")
 
 
+def _response_cache_enabled() -> bool:
+    return os.getenv("LLM_RESPONSE_CACHE", "").strip().lower() in ("1", "true", "yes")
+
+
+def _cassette_mode() -> str:
+    return os.getenv("LLM_CASSETTE_MODE", "").strip().lower()
+
+
+def _cassette_settings() -> Dict[str, Any]:
+    # LLM_CASSETTE_MODE=record captures provider traffic; =replay runs offline from the cassette.
+    cassette_mode = _cassette_mode()
+    if not cassette_mode:
+        return {}
+    settings: Dict[str, Any] = {
+        "cassette_mode": cassette_mode,
+        "cassette_latency": os.getenv("LLM_CASSETTE_LATENCY", "recorded").strip().lower() or "recorded",
+        "cassette_match": os.getenv("LLM_CASSETTE_MATCH", "exact").strip().lower() or "exact",
+    }
+    cassette_path = os.getenv("LLM_CASSETTE_PATH", "").strip()
+    if cassette_path:
+        settings["cassette_path"] = cassette_path
+    return settings
+
+
 def _build_config(
     model: str,
     custom_model: Optional[str],
@@ -216,7 +240,32 @@ def _build_config(
         "retries": retries,
         "timeout": timeout,
         "cohere_model": cohere_model,
+        # "batched" drafts every angle in one request instead of one request per angle.
+        "candidate_mode": os.getenv("CANDIDATE_MODE", "fanout").strip().lower() or "fanout",
     }
+    if _response_cache_enabled():
+        config["response_cache"] = True
+    # MODEL_ROUTING=default (or a JSON policy path) picks a model per pipeline stage.
+    routing_policy = load_routing_policy(os.getenv("MODEL_ROUTING"))
+    if routing_policy:
+        config["model_routing"] = routing_policy
+    # TRACE_DIR=traces writes one span file per run; TRACE_FORMAT=otlp for OpenTelemetry tooling.
+    trace_dir = os.getenv("TRACE_DIR", "").strip()
+    if trace_dir:
+        config["trace_dir"] = trace_dir
+        config["trace_format"] = os.getenv("TRACE_FORMAT", "json").strip().lower() or "json"
+    config.update(_cassette_settings())
+    # Optional client-side budgets, e.g. OPENAI_RPM_LIMIT=500 OPENAI_TPM_LIMIT=200000
+    # COHERE_MODEL_TTL_SECONDS / COHERE_MODEL_REFRESH_SECONDS tune the Cohere model-availability cache.
+    for env_name, config_key in (
+        ("OPENAI_RPM_LIMIT", "rate_limit_rpm"),
+        ("OPENAI_TPM_LIMIT", "rate_limit_tpm"),
+        ("COHERE_MODEL_TTL_SECONDS", "cohere_availability_ttl_seconds"),
+        ("COHERE_MODEL_REFRESH_SECONDS", "cohere_availability_refresh_seconds"),
+    ):
+        value = os.getenv(env_name, "").strip()
+        if value:
+            config[config_key] = float(value)
     return config
 
 
@@ -227,11 +276,11 @@ def _load_prompt_file(filename: str) -> str:
     return prompt_path.read_text(encoding="utf-8").strip()
 
 
-def _build_pillar_prompt(template: str, target_persona: str) -> str:
+def _build_pillar_prompt(template: str, target_persona: str, config: Optional[Dict[str, Any]] = None) -> str:
     persona = (target_persona or "").strip() or "SME decision-makers adopting AI"
     rag_query = f"Content pillars for {persona}"
     try:
-        brand_context = doc_processor.search(rag_query)
+        brand_context, _ = doc_processor.retrieve_context(rag_query, config or {})
     except Exception:
         brand_context = "No specific context found. Use general knowledge."
 
@@ -407,12 +456,11 @@ def generate_content_pillars(
             topic_update = gr.update(choices=topic_options, value=default_topic)
             return cached_payload, pillar_md, topic_update
 
-    if not os.getenv("OPENAI_API_KEY"):
+    if not os.getenv("OPENAI_API_KEY") and _cassette_mode() != "replay":
         message = "OPENAI_API_KEY not found in environment and no cached pillars available."
         return {"error": message}, message, gr.update()
 
     template = _load_prompt_file("pillar_generation_prompt.txt")
-    user_prompt = _build_pillar_prompt(template, target_persona)
     base_max_tokens = max(1200, int(max_tokens))
     config = {
         "model": (custom_model or model or "").strip(),
@@ -421,7 +469,12 @@ def generate_content_pillars(
         "retries": retries,
         "timeout": timeout,
         "response_format": {"type": "json_object"},
+        "response_cache": _response_cache_enabled(),
+        "model_routing": load_routing_policy(os.getenv("MODEL_ROUTING")),
+        **_cassette_settings(),
     }
+    config = route_stage("pillars", config)
+    user_prompt = _build_pillar_prompt(template, target_persona, config)
 
     try:
         messages = [
@@ -542,157 +595,72 @@ def run_generation(
     max_tokens: int,
     retries: int,
     timeout: float,
-) -> Tuple[str, str, str, Optional[str], Dict[str, Any], Any]:
+) -> Iterator[Tuple[str, str, str, Optional[str], Dict[str, Any], Any]]:
     steps: List[str] = []
     topic = (topic or "").strip()
     target_persona = (target_persona or "").strip()
-    prompt_persona = target_persona or "SME decision makers"
 
     if not topic:
-        return "Validation failed: Topic is required.", "", "", None, {}, gr.update(visible=False)
+        yield "Validation failed: Topic is required.", "", "", None, {}, gr.update(visible=False)
+        return
     if not (custom_model or model):
-        return "Validation failed: Model selection is required.", "", "", None, {}, gr.update(visible=False)
+        yield "Validation failed: Model selection is required.", "", "", None, {}, gr.update(visible=False)
+        return
 
-    has_key = bool(os.getenv("OPENAI_API_KEY"))
+    # A replayed cassette stands in for both providers.
+    replaying = _cassette_mode() == "replay"
+    has_key = replaying or bool(os.getenv("OPENAI_API_KEY"))
     if not has_key:
-        return "Validation failed: OPENAI_API_KEY not found in environment.", "", "", None, {}, gr.update(visible=False)
-    has_cohere_key = bool(os.getenv("COHERE_API_KEY"))
+        yield "Validation failed: OPENAI_API_KEY not found in environment.", "", "", None, {}, gr.update(visible=False)
+        return
+    has_cohere_key = replaying or bool(os.getenv("COHERE_API_KEY"))
     if not has_cohere_key:
-        return "Validation failed: COHERE_API_KEY not found in environment.", "", "", None, {}, gr.update(visible=False)
-
-    try:
-        steps.append("1. Inputs validated - topic, objective, and keys are present.")
-        config = _build_config(
-            model=model,
-            custom_model=custom_model,
-            cohere_model=cohere_model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            retries=retries,
-            timeout=timeout,
-        )
-        feedback_guidance, feedback_meta = build_feedback_guidance(
-            post_type=post_type,
-            target_persona=prompt_persona,
-        )
-        config["feedback_guidance"] = feedback_guidance
-        steps.append(
-            "2. Loaded feedback memory - "
-            f"accepted: {feedback_meta.get('accepted_count', 0)}, "
-            f"rejected: {feedback_meta.get('rejected_count', 0)}."
-        )
-        steps.append("3. Generating candidate drafts - creates multiple angle variations.")
-        draft_post, metadata = generate_post(
-            topic=topic,
-            post_type=post_type,
-            business_objective=prompt_persona,
-            config=config,
-        )
-        selected_angle = (
-            metadata.get("candidate_generation", {}).get("selected_angle")
-            if isinstance(metadata, dict)
-            else None
-        )
-        if selected_angle:
-            steps.append(f"4. Cohere selected best angle - picked: {selected_angle}.")
-        else:
-            steps.append("4. Cohere selected best angle - ranked drafts by quality.")
-
-        steps.append("5. First refinement pass - removes vague language and improves specificity.")
-        refined_post, refinement_metadata = refine_post(
-            draft_post=draft_post,
-            topic=topic,
-            post_type=post_type,
-            business_objective=prompt_persona,
-            config=config,
-        )
-        if not refined_post:
-            refined_post = draft_post
+        yield "Validation failed: COHERE_API_KEY not found in environment.", "", "", None, {}, gr.update(visible=False)
+        return
 
-        steps.append("6. Initial brand check - scores tone, SME relevance, clarity, and differentiation.")
-        initial_brand_result, initial_brand_metadata = check_brand_consistency(
-            post=refined_post,
-            config=config,
-        )
+    steps.append("1. Inputs validated - topic, objective, and keys are present.")
+    yield "\n".join(steps), "", "", None, {}, gr.update(visible=False)
+    config = _build_config(
+        model=model,
+        custom_model=custom_model,
+        cohere_model=cohere_model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        retries=retries,
+        timeout=timeout,
+    )
 
-        steps.append("7. Feedback-driven refinement - applies brand checker suggestions.")
-        feedback_refined_post, feedback_refinement_metadata = refine_post(
-            draft_post=refined_post,
-            topic=topic,
-            post_type=post_type,
-            business_objective=prompt_persona,
-            config=config,
-            brand_feedback_summary=initial_brand_result.get("feedback_summary", ""),
-            brand_score=int(initial_brand_result.get("score", 0)),
-        )
-        final_post = feedback_refined_post or refined_post
-
-        steps.append("8. Final brand check - verifies improvements after feedback.")
-        steps.append("9. Generating hashtags for publishing.")
-        steps.append("10. Generating supporting image.")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            future_brand = executor.submit(check_brand_consistency, post=final_post, config=config)
-            future_hashtags = executor.submit(
-                generate_hashtags,
-                post=final_post,
-                topic=topic,
-                business_objective=prompt_persona,
-                config=config,
-            )
-            future_image = executor.submit(
-                generate_post_image,
-                post=final_post,
-                topic=topic,
-                config=config,
+    # Stream step updates and the draft currently being written into the UI.
+    draft = ""
+    draft_stage: Optional[str] = None
+    for event in iter_pipeline_events(topic, post_type, target_persona, config):
+        event_type = event["type"]
+        if event_type == "step":
+            steps.append(event["text"])
+        elif event_type == "delta":
+            if event["stage"] != draft_stage:
+                draft_stage = event["stage"]
+                draft = ""
+            draft += event["content"]
+        elif event_type == "draft":
+            draft_stage = event["stage"]
+            draft = event["text"]
+        elif event_type == "result":
+            result = event["result"]
+            yield (
+                "\n".join(steps),
+                result["final_post"],
+                result["hashtags"],
+                result["image_path"],
+                result["feedback_payload"],
+                gr.update(visible=True),
             )
-
-            final_brand_result, final_brand_metadata = future_brand.result()
-            hashtags, hashtags_metadata = future_hashtags.result()
-            image_path, image_metadata = future_image.result()
-
-        metadata["refinement"] = {
-            "initial": refinement_metadata,
-            "feedback_driven": feedback_refinement_metadata,
-        }
-        metadata["brand_check"] = {
-            "initial": {
-                "result": initial_brand_result,
-                "metadata": initial_brand_metadata,
-            },
-            "final": {
-                "result": final_brand_result,
-                "metadata": final_brand_metadata,
-            },
-        }
-        final_score = final_brand_result.get("score", 0)
-        steps.append(f"11. Final post ready - final brand score: {final_score}/100.")
-        if not image_path:
-            steps.append("Image generation failed - see logs/metadata.")
-        metadata["post_assets"] = {
-            "hashtags": hashtags_metadata,
-            "image": image_metadata,
-        }
-
-        feedback_payload = {
-            "topic": topic,
-            "post_type": post_type,
-            "target_persona": target_persona,
-            "final_post": final_post,
-            "hashtags": hashtags,
-            "brand_score": int(final_score or 0),
-        }
-
-        return (
-            "\n".join(steps),
-            final_post,
-            hashtags,
-            image_path,
-            feedback_payload,
-            gr.update(visible=True),
-        )
-    except Exception as exc:
-        steps.append(f"Failed: {exc}")
-        return "\n".join(steps), "", "", None, {}, gr.update(visible=False)
+            return
+        else:
+            steps.append(f"Failed: {event['error']}")
+            yield "\n".join(steps), "", "", None, {}, gr.update(visible=False)
+            return
+        yield "\n".join(steps), draft, "", None, {}, gr.update(visible=False)
 
 
 def _persist_feedback(
@@ -973,6 +941,16 @@ def build_interface() -> gr.Blocks:
 
 
 def main() -> None:
+    # Warm the RAG index while the UI starts instead of on the first request.
+    doc_processor.preload()
+    # Pick up knowledge-base edits without a restart (0 disables polling).
+    watch_seconds = float(os.getenv("KNOWLEDGE_BASE_WATCH_SECONDS", "5"))
+    if watch_seconds > 0:
+        doc_processor.start_watcher(interval_seconds=watch_seconds)
+    # Prometheus scrape endpoint for LLM and pipeline-stage metrics (unset or 0 disables it).
+    metrics_port = int(os.getenv("METRICS_PORT", "0") or 0)
+    if metrics_port > 0:
+        start_metrics_server(metrics_port)
     demo = build_interface()
     preferred_port = int(os.getenv("GRADIO_SERVER_PORT", "7860"))
 
@@ -0,0 +1,140 @@
+import logging
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.document_processor import DocumentProcessor, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class KnowledgeBaseProvider:
+    """
+    Lazily loaded, thread-safe access to the shared RAG DocumentProcessor.
+
+    Nothing is read from disk at import time. The knowledge base is loaded on the
+    first search() (or get()) call, or ahead of time via preload().
+    """
+
+    def __init__(self) -> None:
+        self._processor: Optional[DocumentProcessor] = None
+        self._lock = threading.Lock()
+        self._preload_thread: Optional[threading.Thread] = None
+        self._watcher: Optional["KnowledgeBaseWatcher"] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._processor is not None
+
+    def get(self) -> DocumentProcessor:
+        processor = self._processor
+        if processor is not None:
+            return processor
+        with self._lock:
+            if self._processor is None:
+                processor = DocumentProcessor(verbose=False)
+                processor.load_all()
+                logger.info(
+                    "📚 RAG knowledge base loaded: %d primary, %d secondary documents",
+                    len(processor.primary_kb),
+                    len(processor.secondary_kb),
+                )
+                self._processor = processor
+            return self._processor
+
+    def preload(self) -> threading.Thread:
+        """Start loading in a background thread; searches issued meanwhile wait for it."""
+        with self._lock:
+            if self._preload_thread is None:
+                self._preload_thread = threading.Thread(
+                    target=self._preload,
+                    name="knowledge-base-preload",
+                    daemon=True,
+                )
+                self._preload_thread.start()
+            return self._preload_thread
+
+    def _preload(self) -> None:
+        try:
+            self.get()
+        except Exception as exc:
+            logger.warning("Knowledge base preload failed: %s", exc)
+
+    def start_watcher(self, interval_seconds: float = 5.0) -> "KnowledgeBaseWatcher":
+        """Poll the knowledge base for added/changed/deleted markdown files and re-index them live."""
+        with self._lock:
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = KnowledgeBaseWatcher(self, interval_seconds=interval_seconds)
+                self._watcher.start()
+            return self._watcher
+
+    def stop_watcher(self) -> None:
+        watcher = self._watcher
+        if watcher is not None:
+            watcher.stop()
+
+    def search(self, query: str, top_k: int = 3, mode: str = "lexical", hybrid_weight: float = 0.5) -> str:
+        return self.get().search(query, top_k=top_k, mode=mode, hybrid_weight=hybrid_weight)
+
+    def retrieve_context(self, query: str, config: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """
+        RAG context for a prompt, sized from config. Supported keys:
+            - rag_mode (str, default: "lexical"): "lexical" | "dense" | "hybrid"
+            - rag_token_budget (int, optional): pack chunks up to this many tokens
+            - rag_top_k (int, default: 3): chunk count when no token budget is set
+
+        Returns:
+            (context, stats) where stats reports the tokens used.
+        """
+        mode = str(config.get("rag_mode") or "lexical")
+        token_budget = config.get("rag_token_budget")
+        if token_budget:
+            return self.get().build_context(query, token_budget=int(token_budget), mode=mode)
+
+        top_k = int(config.get("rag_top_k", 3))
+        context = self.search(query, top_k=top_k, mode=mode)
+        return context, {"top_k": top_k, "tokens_used": estimate_tokens(context), "mode": mode}
+
+    def search_cache_stats(self) -> Dict[str, int]:
+        if self._processor is None:
+            return {}
+        return self._processor.search_cache.stats()
+
+
+class KnowledgeBaseWatcher(threading.Thread):
+    """Background poller that applies incremental DocumentProcessor.refresh() calls."""
+
+    def __init__(self, provider: KnowledgeBaseProvider, interval_seconds: float = 5.0) -> None:
+        super().__init__(name="knowledge-base-watcher", daemon=True)
+        self.provider = provider
+        self.interval_seconds = max(0.5, float(interval_seconds))
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval_seconds):
+            if not self.provider.loaded:
+                # Nothing to keep fresh until the first load; it reads the current files anyway.
+                continue
+            try:
+                changes = self.provider.get().refresh()
+            except Exception as exc:
+                logger.warning("Knowledge base refresh failed: %s", exc)
+                continue
+            if any(changes.values()):
+                logger.info(
+                    "📚 RAG knowledge base reloaded: %d added, %d changed, %d removed",
+                    len(changes["added"]),
+                    len(changes["changed"]),
+                    len(changes["removed"]),
+                )
+
+
+# Shared provider used by every generation stage.
+doc_processor = KnowledgeBaseProvider()
@@ -1,18 +1,50 @@
+import asyncio
+import copy
+import hashlib
 import logging
 import os
+import threading
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
 
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI
+
+from generation.cassette import get_cassette
+from generation.metrics import llm_coalesced_requests_total, llm_coalescing_in_flight, observe_llm_call
+from generation.model_router import record_outcome
+from generation.rate_limiter import RateLimiter, get_rate_limiter
+from generation.resilience import (
+    CircuitOpenError,
+    acall_with_retries,
+    call_with_retries,
+    get_circuit_breaker,
+    is_retryable,
+    next_retry_delay,
+)
+from generation.response_cache import ResponseCache, build_cache_key, get_response_cache
+from generation.tracing import record_span, span
 
 logger = logging.getLogger(__name__)
 _CLIENT_CACHE: Dict[tuple, OpenAI] = {}
+_ASYNC_CLIENT_CACHE: Dict[tuple, AsyncOpenAI] = {}
+_ASYNC_SLOTS: Dict[tuple, asyncio.Semaphore] = {}
+_IN_FLIGHT: Dict[str, "_InFlightCall"] = {}
+_ASYNC_IN_FLIGHT: Dict[tuple, "_InFlightCall"] = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+_COALESCING_STATS: Dict[str, int] = {"upstream_calls": 0, "coalesced_waiters": 0, "max_waiters": 0}
+
+DEFAULT_ASYNC_POOL_SIZE = 64
+DEFAULT_KEEPALIVE_SECONDS = 30.0
 
 # Optional default pricing (USD per 1M tokens).
 # Override via config["pricing"] for exact models/rates in your environment.
 DEFAULT_PRICING_PER_1M: Dict[str, Dict[str, float]] = {
     "gpt-4o-mini": {"input": 0.15, "output": 0.60},
     "gpt-4o": {"input": 5.00, "output": 15.00},
+    "gpt-4.1": {"input": 2.00, "output": 8.00},
+    "gpt-4.1-mini": {"input": 0.40, "output": 1.60},
+    "gpt-4.1-nano": {"input": 0.10, "output": 0.40},
 }
 
 
@@ -40,6 +72,15 @@ def _compute_estimated_cost(
 
 
 def _get_client(config: Dict[str, Any]) -> OpenAI:
+    cassette = get_cassette(config)
+    if cassette is not None:
+        # Replay needs no key; recording wraps the real client.
+        real_client = _get_provider_client(config) if cassette.mode == "record" else None
+        return cassette.openai_client(real_client)  # type: ignore[return-value]
+    return _get_provider_client(config)
+
+
+def _get_provider_client(config: Dict[str, Any]) -> OpenAI:
     api_key = config.get("api_key") or os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY is not set. Provide config['api_key'] or env var.")
@@ -51,25 +92,457 @@ def _get_client(config: Dict[str, Any]) -> OpenAI:
     if cached is not None:
         return cached
 
+    # Retries are handled by generation.resilience; SDK retries would multiply attempts.
     if base_url and timeout:
-        client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout)
+        client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
     elif base_url:
-        client = OpenAI(api_key=api_key, base_url=base_url)
+        client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
     elif timeout:
-        client = OpenAI(api_key=api_key, timeout=timeout)
+        client = OpenAI(api_key=api_key, timeout=timeout, max_retries=0)
     else:
-        client = OpenAI(api_key=api_key)
+        client = OpenAI(api_key=api_key, max_retries=0)
 
     _CLIENT_CACHE[cache_key] = client
     return client
 
 
-def generate_completion(messages: List[Dict[str, str]], config: Dict[str, Any]) -> Dict[str, Any]:
+def _get_async_client(config: Dict[str, Any]) -> AsyncOpenAI:
+    cassette = get_cassette(config)
+    if cassette is not None:
+        real_client = _get_async_provider_client(config) if cassette.mode == "record" else None
+        return cassette.async_openai_client(real_client)  # type: ignore[return-value]
+    return _get_async_provider_client(config)
+
+
+def _async_pool_size(config: Dict[str, Any]) -> int:
+    return max(1, int(config.get("openai_pool_size", DEFAULT_ASYNC_POOL_SIZE)))
+
+
+def _get_async_provider_client(config: Dict[str, Any]) -> AsyncOpenAI:
+    """
+    AsyncOpenAI client with an explicit connection pool, cached per event loop.
+
+    Config keys:
+        - openai_pool_size (int, default: 64): max open connections; requests beyond it
+          wait for a free connection instead of opening more
+        - openai_keepalive_seconds (float, default: 30): idle connection expiry
+    """
+    api_key = config.get("api_key") or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY is not set. Provide config['api_key'] or env var.")
+
+    base_url = config.get("base_url")
+    timeout = config.get("timeout")
+    pool_size = _async_pool_size(config)
+    keepalive_seconds = float(config.get("openai_keepalive_seconds", DEFAULT_KEEPALIVE_SECONDS))
+    # Async HTTP connection pools are bound to the event loop that created them.
+    cache_key = (api_key, base_url, timeout, pool_size, keepalive_seconds, id(asyncio.get_running_loop()))
+    cached = _ASYNC_CLIENT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=keepalive_seconds,
+        )
+    )
+    client_kwargs: Dict[str, Any] = {"api_key": api_key, "max_retries": 0, "http_client": http_client}
+    if base_url:
+        client_kwargs["base_url"] = base_url
+    if timeout:
+        client_kwargs["timeout"] = timeout
+    client = AsyncOpenAI(**client_kwargs)
+
+    _ASYNC_CLIENT_CACHE[cache_key] = client
+    return client
+
+
+def _request_slots(config: Dict[str, Any]) -> asyncio.Semaphore:
+    """
+    Per-loop cap on in-flight async OpenAI requests.
+
+    Config keys:
+        - max_concurrent_requests (int, default: openai_pool_size): requests beyond the
+          cap queue on the loop; backoff sleeps and rate-limit waits do not hold a slot
+    """
+    limit = max(1, int(config.get("max_concurrent_requests") or _async_pool_size(config)))
+    key = (id(asyncio.get_running_loop()), config.get("base_url"), limit)
+    with _IN_FLIGHT_LOCK:
+        slots = _ASYNC_SLOTS.get(key)
+        if slots is None:
+            slots = asyncio.Semaphore(limit)
+            _ASYNC_SLOTS[key] = slots
+    return slots
+
+
+def _resolve_settings(messages: List[Dict[str, str]], config: Dict[str, Any]) -> Dict[str, Any]:
+    if not isinstance(messages, list) or not messages:
+        raise ValueError("messages must be a non-empty list of role/content dicts")
+
+    retries = int(config.get("retries", 3))
+    prompt_text = "\n".join(str(m.get("content", "")) for m in messages)
+    return {
+        "model": config.get("model", "gpt-4o-mini"),
+        "temperature": float(config.get("temperature", 0.7)),
+        "max_tokens": int(config.get("max_tokens", 500)),
+        "retries": max(1, retries),
+        "endpoint": f"openai:{config.get('base_url') or 'default'}/chat/completions",
+        "pricing": config.get("pricing") or DEFAULT_PRICING_PER_1M,
+        "prompt_text": prompt_text,
+        "prompt_len_chars": len(prompt_text),
+        "prompt_tokens_estimate": _estimate_tokens_from_text(prompt_text),
+        "rate_limit_wait_seconds": 0.0,
+    }
+
+
+def _build_request_kwargs(
+    messages: List[Dict[str, str]],
+    config: Dict[str, Any],
+    settings: Dict[str, Any],
+) -> Dict[str, Any]:
+    request_kwargs: Dict[str, Any] = {
+        "model": settings["model"],
+        "messages": messages,
+        "temperature": settings["temperature"],
+        "max_tokens": settings["max_tokens"],
+    }
+    response_format = config.get("response_format")
+    if response_format:
+        request_kwargs["response_format"] = response_format
+    return request_kwargs
+
+
+def _build_success_result(content: str, usage: Any, settings: Dict[str, Any], attempt: int) -> Dict[str, Any]:
+    model = settings["model"]
+    content = (content or "").strip()
+    completion_len_chars = len(content)
+
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+
+    if prompt_tokens is None:
+        prompt_tokens = _estimate_tokens_from_text(settings["prompt_text"])
+    if completion_tokens is None:
+        completion_tokens = _estimate_tokens_from_text(content)
+
+    estimated_cost_usd = _compute_estimated_cost(
+        model=model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        pricing=settings["pricing"],
+    )
+
+    logger.info(
+        "llm.generate_completion model=%s prompt_chars=%d completion_chars=%d "
+        "prompt_tokens=%d completion_tokens=%d estimated_cost_usd=%.6f",
+        model,
+        settings["prompt_len_chars"],
+        completion_len_chars,
+        prompt_tokens,
+        completion_tokens,
+        estimated_cost_usd,
+    )
+
+    return {
+        "content": content,
+        "model": model,
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        },
+        "length": {
+            "prompt_chars": settings["prompt_len_chars"],
+            "completion_chars": completion_len_chars,
+        },
+        "estimated_cost_usd": estimated_cost_usd,
+        "attempts": attempt,
+        "rate_limit_wait_seconds": settings["rate_limit_wait_seconds"],
+        "cache": settings.get("cache", {"enabled": False, "hit": False, "bypass": False}),
+    }
+
+
+def _lookup_cached_result(
+    request_kwargs: Dict[str, Any],
+    config: Dict[str, Any],
+    settings: Dict[str, Any],
+) -> Tuple[Optional[ResponseCache], Optional[str], Optional[Dict[str, Any]]]:
+    cache = get_response_cache(config)
+    bypass = bool(config.get("cache_bypass"))
+    settings["cache"] = {"enabled": cache is not None, "hit": False, "bypass": bypass}
+    if cache is None:
+        return None, None, None
+
+    cache_key = build_cache_key(request_kwargs, base_url=config.get("base_url"))
+    settings["cache"]["key"] = cache_key[:16]
+    if bypass:
+        # Skip the read but still store the fresh result.
+        return cache, cache_key, None
+
+    cached = cache.get(cache_key)
+    if cached is None:
+        return cache, cache_key, None
+
+    saved_cost = float(cached.get("estimated_cost_usd", 0.0))
+    cached["estimated_cost_usd"] = 0.0
+    cached["attempts"] = 0
+    cached["rate_limit_wait_seconds"] = 0.0
+    cached["cache"] = dict(settings["cache"], hit=True, saved_cost_usd=saved_cost)
+    logger.info(
+        "llm.generate_completion cache hit model=%s key=%s saved_cost_usd=%.6f",
+        settings["model"],
+        settings["cache"]["key"],
+        saved_cost,
+    )
+    return cache, cache_key, cached
+
+
+def _store_cached_result(
+    cache: Optional[ResponseCache],
+    cache_key: Optional[str],
+    result: Dict[str, Any],
+) -> None:
+    if cache is None or cache_key is None:
+        return
+    try:
+        # Per-call bookkeeping is recomputed on every read.
+        cache.put(cache_key, {k: v for k, v in result.items() if k not in ("cache", "streaming")})
+    except Exception as exc:
+        # A broken cache must never fail the request itself.
+        logger.warning("llm.generate_completion cache write failed: %s", exc)
+
+
+class _InFlightCall:
+    """One upstream request that identical concurrent callers wait on instead of repeating."""
+
+    def __init__(self, future: Optional["asyncio.Future[Dict[str, Any]]"] = None) -> None:
+        self.done = threading.Event()
+        self.future = future
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+def _coalescing_fingerprint(
+    request_kwargs: Dict[str, Any],
+    config: Dict[str, Any],
+    cache_key: Optional[str],
+) -> str:
+    # The response cache key leaves credentials out on purpose; coalescing must not, or a
+    # caller could receive a result (or auth error) produced with someone else's key.
+    api_key = config.get("api_key") or os.getenv("OPENAI_API_KEY") or ""
+    credentials = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    request_key = cache_key or build_cache_key(request_kwargs, base_url=config.get("base_url"))
+    return f"{credentials}:{request_key}"
+
+
+def _join_in_flight(registry: Dict[Any, _InFlightCall], key: Any, factory: Callable[[], _InFlightCall]) -> Tuple[_InFlightCall, bool]:
+    with _IN_FLIGHT_LOCK:
+        call = registry.get(key)
+        if call is None:
+            call = factory()
+            registry[key] = call
+            _COALESCING_STATS["upstream_calls"] += 1
+            return call, True
+        call.waiters += 1
+        _COALESCING_STATS["coalesced_waiters"] += 1
+        _COALESCING_STATS["max_waiters"] = max(_COALESCING_STATS["max_waiters"], call.waiters)
+        return call, False
+
+
+def _observe_join(model: str, leader: bool) -> None:
+    role = "leader" if leader else "waiter"
+    llm_coalesced_requests_total.inc(model=model, role=role)
+    llm_coalescing_in_flight.inc(model=model, role=role)
+
+
+def _shared_result(call: _InFlightCall, leader: bool) -> Dict[str, Any]:
+    if call.error is not None:
+        raise call.error
+    assert call.result is not None
+    # Never mutate call.result itself: other waiters may still be copying it.
+    result = dict(call.result) if leader else copy.deepcopy(call.result)
+    result["coalesced"] = {"shared": not leader, "waiters": call.waiters}
+    if not leader:
+        # Only the leader paid for the upstream call.
+        result["estimated_cost_usd"] = 0.0
+    return result
+
+
+def _coalesce(fingerprint: str, call_upstream: Callable[[], Dict[str, Any]], model: str) -> Dict[str, Any]:
+    call, leader = _join_in_flight(_IN_FLIGHT, fingerprint, _InFlightCall)
+    _observe_join(model, leader)
+    if not leader:
+        try:
+            call.done.wait()
+        finally:
+            llm_coalescing_in_flight.dec(model=model, role="waiter")
+        return _shared_result(call, leader=False)
+    try:
+        call.result = call_upstream()
+    except BaseException as exc:
+        call.error = exc
+    finally:
+        with _IN_FLIGHT_LOCK:
+            _IN_FLIGHT.pop(fingerprint, None)
+        call.done.set()
+        llm_coalescing_in_flight.dec(model=model, role="leader")
+    return _shared_result(call, leader=True)
+
+
+def _settle_async_call(key: tuple, call: _InFlightCall, task: "asyncio.Future[Dict[str, Any]]", model: str) -> None:
+    with _IN_FLIGHT_LOCK:
+        if _ASYNC_IN_FLIGHT.get(key) is call:
+            del _ASYNC_IN_FLIGHT[key]
+    if task.cancelled():
+        call.error = asyncio.CancelledError()
+    elif task.exception() is not None:
+        call.error = task.exception()
+    else:
+        call.result = task.result()
+    llm_coalescing_in_flight.dec(model=model, role="leader")
+
+
+async def _acoalesce(
+    fingerprint: str,
+    call_upstream: Callable[[], Awaitable[Dict[str, Any]]],
+    model: str,
+) -> Dict[str, Any]:
+    # Tasks belong to one event loop, so async callers coalesce per loop.
+    loop = asyncio.get_running_loop()
+    key = (id(loop), fingerprint)
+    # The upstream call runs as its own task: cancelling the caller that started it
+    # (or any waiter) leaves the request the others are sharing running.
+    call, leader = _join_in_flight(_ASYNC_IN_FLIGHT, key, lambda: _InFlightCall(loop.create_task(call_upstream())))
+    assert call.future is not None
+    _observe_join(model, leader)
+    if leader:
+        call.future.add_done_callback(lambda task: _settle_async_call(key, call, task, model))
+    try:
+        await asyncio.shield(call.future)
+    except asyncio.CancelledError:
+        # This caller was cancelled; a cancelled shared task is reported by _shared_result.
+        if not call.future.cancelled():
+            raise
+    except Exception:
+        pass  # _settle_async_call stored it; _shared_result re-raises it
+    finally:
+        if not leader:
+            llm_coalescing_in_flight.dec(model=model, role="waiter")
+    return _shared_result(call, leader)
+
+
+def coalescing_stats() -> Dict[str, int]:
+    """
+    Upstream calls vs. callers that piggybacked on an identical in-flight request.
+
+    The same counts are exported as llm_coalesced_requests_total / llm_coalescing_in_flight
+    in generation.metrics.
+    """
+    with _IN_FLIGHT_LOCK:
+        stats = dict(_COALESCING_STATS)
+        stats["in_flight"] = len(_IN_FLIGHT) + len(_ASYNC_IN_FLIGHT)
+        stats["current_waiters"] = sum(
+            call.waiters for call in list(_IN_FLIGHT.values()) + list(_ASYNC_IN_FLIGHT.values())
+        )
+    return stats
+
+
+def _record_outcome(settings: Dict[str, Any], result: Dict[str, Any], started: float) -> None:
+    record_outcome(
+        settings["model"],
+        success=not result.get("error"),
+        latency_seconds=time.perf_counter() - started,
+        cost_usd=float(result.get("estimated_cost_usd", 0.0)),
+    )
+
+
+def _admit(limiter: Optional[RateLimiter], settings: Dict[str, Any]) -> None:
+    if limiter is not None:
+        settings["rate_limit_wait_seconds"] += limiter.acquire(settings["prompt_tokens_estimate"])
+
+
+async def _aadmit(limiter: Optional[RateLimiter], settings: Dict[str, Any]) -> None:
+    if limiter is not None:
+        settings["rate_limit_wait_seconds"] += await limiter.aacquire(settings["prompt_tokens_estimate"])
+
+
+def _settle_usage(limiter: Optional[RateLimiter], settings: Dict[str, Any], result: Dict[str, Any]) -> None:
+    # Admission only knew the prompt estimate; charge the real prompt + completion total.
+    if limiter is not None:
+        usage = result.get("usage", {})
+        actual = int(usage.get("prompt_tokens", 0)) + int(usage.get("completion_tokens", 0))
+        limiter.record_usage(settings["prompt_tokens_estimate"], actual)
+
+
+def _error_kind(exc: Optional[BaseException]) -> str:
+    if isinstance(exc, CircuitOpenError):
+        return "circuit_open"
+    if exc is not None and is_retryable(exc):
+        return "retryable"
+    return "fatal"
+
+
+def _build_failure_result(
+    last_error: Optional[BaseException],
+    settings: Dict[str, Any],
+    attempts: Optional[int] = None,
+) -> Dict[str, Any]:
+    if attempts is None:
+        attempts = getattr(last_error, "attempts", settings["retries"])
+    logger.error("llm.generate_completion failed after %d attempts: %s", attempts, last_error)
+    return {
+        "content": "",
+        "model": settings["model"],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0},
+        "length": {"prompt_chars": settings["prompt_len_chars"], "completion_chars": 0},
+        "estimated_cost_usd": 0.0,
+        "attempts": attempts,
+        "rate_limit_wait_seconds": settings["rate_limit_wait_seconds"],
+        "cache": settings.get("cache", {"enabled": False, "hit": False, "bypass": False}),
+        "error": str(last_error) if last_error else "Unknown error",
+        "error_kind": _error_kind(last_error),
+    }
+
+
+def _span_attributes(config: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "provider": "openai",
+        "stage": config.get("stage", "unknown"),
+        "model": config.get("model", "gpt-4o-mini"),
+    }
+
+
+def _annotate_span(llm_span: Any, result: Dict[str, Any]) -> None:
+    usage = result.get("usage") or {}
+    llm_span.set_attributes(
+        model=result.get("model"),
+        attempts=result.get("attempts"),
+        cache_hit=bool((result.get("cache") or {}).get("hit")),
+        coalesced=bool((result.get("coalesced") or {}).get("shared")),
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+        cost_usd=result.get("estimated_cost_usd"),
+        fallback_from=",".join(result.get("fallback_from") or []) or None,
+    )
+    if result.get("error"):
+        llm_span.record_error(result["error"])
+        llm_span.set_attribute("error_kind", result.get("error_kind"))
+
+
+def generate_completion(
+    messages: List[Dict[str, str]],
+    config: Dict[str, Any],
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
     """
     Generate a chat completion via OpenAI with retries and usage/cost logging.
 
     Args:
         messages: OpenAI chat messages.
+        on_delta: Optional callback; when given the response is streamed and each
+            text delta is passed to it as it arrives (see stream_completion).
         config: Runtime configuration dictionary. Supported keys:
             - api_key (str, optional)
             - model (str, default: "gpt-4o-mini")
@@ -77,111 +550,319 @@ def generate_completion(messages: List[Dict[str, str]], config: Dict[str, Any])
             - max_tokens (int, default: 500)
             - timeout (int | float, optional)
             - base_url (str, optional)
-            - retries (int, default: 3)
-            - retry_backoff_seconds (float, default: 1.0)
+            - retries (int, default: 3): attempts for retryable errors; auth and
+              validation errors fail on the first attempt
+            - retry_backoff_seconds (float, default: 1.0): base of the jittered
+              exponential backoff (Retry-After is honoured when sent)
+            - retry_max_backoff_seconds (float, default: 30.0)
+            - circuit_breaker_threshold / circuit_breaker_reset_seconds /
+              circuit_breaker_count_connection_errors (optional), see
+              generation.resilience.get_circuit_breaker
             - pricing (dict, optional):
               {"model_name": {"input": usd_per_1m, "output": usd_per_1m}}
+            - response_cache (bool, default: False) and related keys, see
+              generation.response_cache.get_response_cache
+            - cache_bypass (bool, default: False): skip the cache read for this call
+            - rate_limit_rpm / rate_limit_tpm / rate_limits (optional): client-side
+              budgets, see generation.rate_limiter.get_rate_limiter
+            - coalesce_requests (bool, default: True): identical concurrent requests
+              share one upstream call (see coalescing_stats)
+            - fallback_models (list[str], optional): models tried in order when the
+              call fails, normally set by generation.model_router.route_stage
+            - cassette_mode ("record" | "replay", optional) and related keys: record
+              provider traffic or replay it offline, see generation.cassette.get_cassette
 
     Returns:
         Dict with completion text and metadata.
     """
-    if not isinstance(messages, list) or not messages:
-        raise ValueError("messages must be a non-empty list of role/content dicts")
+    with span("llm.chat", **_span_attributes(config)) as llm_span:
+        result = _generate_completion(messages, config, on_delta)
+        _annotate_span(llm_span, result)
+    return result
 
-    model = config.get("model", "gpt-4o-mini")
-    temperature = float(config.get("temperature", 0.7))
-    max_tokens = int(config.get("max_tokens", 500))
-    retries = int(config.get("retries", 3))
-    backoff = float(config.get("retry_backoff_seconds", 1.0))
-    pricing = config.get("pricing") or DEFAULT_PRICING_PER_1M
 
-    if retries < 1:
-        retries = 1
+def _generate_completion(
+    messages: List[Dict[str, str]],
+    config: Dict[str, Any],
+    on_delta: Optional[Callable[[str], None]],
+) -> Dict[str, Any]:
+    if on_delta is not None:
+        result: Dict[str, Any] = {}
+        for event in stream_completion(messages, config):
+            if event["type"] == "delta":
+                on_delta(event["content"])
+            else:
+                result = event["result"]
+        return result
 
-    prompt_text = "\n".join(str(m.get("content", "")) for m in messages)
-    prompt_len_chars = len(prompt_text)
+    started = time.perf_counter()
+    settings = _resolve_settings(messages, config)
+    request_kwargs = _build_request_kwargs(messages, config, settings)
+    cache, cache_key, cached = _lookup_cached_result(request_kwargs, config, settings)
+    if cached is not None:
+        observe_llm_call(cached, config, time.perf_counter() - started)
+        return cached
 
-    client = _get_client(config)
-    last_error: Optional[Exception] = None
+    def _call_upstream() -> Dict[str, Any]:
+        client = _get_client(config)
+        limiter = get_rate_limiter(settings["model"], config)
+        started = time.perf_counter()
 
-    for attempt in range(1, retries + 1):
-        try:
-            request_kwargs: Dict[str, Any] = {
-                "model": model,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-            }
-            response_format = config.get("response_format")
-            if response_format:
-                request_kwargs["response_format"] = response_format
+        def _attempt(attempt: int) -> Dict[str, Any]:
+            _admit(limiter, settings)
+            response = client.chat.completions.create(**request_kwargs)
+            return _build_success_result(
+                response.choices[0].message.content,
+                getattr(response, "usage", None),
+                settings,
+                attempt,
+            )
 
-            response = client.chat.completions.create(
-                **request_kwargs,
+        try:
+            result = call_with_retries(
+                _attempt,
+                settings["endpoint"],
+                config,
+                settings["retries"],
+                "llm.generate_completion",
+                model=settings["model"],
             )
+        except Exception as exc:
+            result = _build_failure_result(exc, settings)
+            _record_outcome(settings, result, started)
+            return result
+        _record_outcome(settings, result, started)
+        _settle_usage(limiter, settings, result)
+        _store_cached_result(cache, cache_key, result)
+        return result
 
-            content = (response.choices[0].message.content or "").strip()
-            completion_len_chars = len(content)
+    if not config.get("coalesce_requests", True):
+        result = _call_upstream()
+    else:
+        fingerprint = _coalescing_fingerprint(request_kwargs, config, cache_key)
+        result = _coalesce(fingerprint, _call_upstream, settings["model"])
 
-            usage = getattr(response, "usage", None)
-            prompt_tokens = getattr(usage, "prompt_tokens", None)
-            completion_tokens = getattr(usage, "completion_tokens", None)
+    observe_llm_call(result, config, time.perf_counter() - started)
+    fallback_models = list(config.get("fallback_models") or [])
+    if result.get("error") and fallback_models:
+        logger.warning(
+            "llm.generate_completion model=%s failed; falling back to %s",
+            settings["model"],
+            fallback_models[0],
+        )
+        fallback_config = dict(config, model=fallback_models[0], fallback_models=fallback_models[1:])
+        result = generate_completion(messages=messages, config=fallback_config)
+        result["fallback_from"] = [settings["model"]] + list(result.get("fallback_from", []))
+    return result
 
-            if prompt_tokens is None:
-                prompt_tokens = _estimate_tokens_from_text(prompt_text)
-            if completion_tokens is None:
-                completion_tokens = _estimate_tokens_from_text(content)
 
-            estimated_cost_usd = _compute_estimated_cost(
-                model=model,
-                prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens,
-                pricing=pricing,
+async def agenerate_completion(messages: List[Dict[str, str]], config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Async variant of generate_completion using AsyncOpenAI.
+
+    Accepts the same config keys and returns the same result/metadata dict, but waits on
+    the event loop instead of blocking a thread, so one loop can drive many requests.
+    In-flight requests are capped by max_concurrent_requests and the connection pool by
+    openai_pool_size (see _request_slots and _get_async_provider_client).
+    """
+    with span("llm.chat", **_span_attributes(config)) as llm_span:
+        result = await _agenerate_completion(messages, config)
+        _annotate_span(llm_span, result)
+    return result
+
+
+async def _agenerate_completion(messages: List[Dict[str, str]], config: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    settings = _resolve_settings(messages, config)
+    request_kwargs = _build_request_kwargs(messages, config, settings)
+    # SQLite lookups are local and sub-millisecond, so they run inline on the loop.
+    cache, cache_key, cached = _lookup_cached_result(request_kwargs, config, settings)
+    if cached is not None:
+        observe_llm_call(cached, config, time.perf_counter() - started)
+        return cached
+
+    async def _call_upstream() -> Dict[str, Any]:
+        client = _get_async_client(config)
+        limiter = get_rate_limiter(settings["model"], config)
+        slots = _request_slots(config)
+        started = time.perf_counter()
+
+        async def _attempt(attempt: int) -> Dict[str, Any]:
+            await _aadmit(limiter, settings)
+            async with slots:
+                response = await client.chat.completions.create(**request_kwargs)
+            return _build_success_result(
+                response.choices[0].message.content,
+                getattr(response, "usage", None),
+                settings,
+                attempt,
             )
 
-            logger.info(
-                "llm.generate_completion model=%s prompt_chars=%d completion_chars=%d "
-                "prompt_tokens=%d completion_tokens=%d estimated_cost_usd=%.6f",
-                model,
-                prompt_len_chars,
-                completion_len_chars,
-                prompt_tokens,
-                completion_tokens,
-                estimated_cost_usd,
+        try:
+            result = await acall_with_retries(
+                _attempt,
+                settings["endpoint"],
+                config,
+                settings["retries"],
+                "llm.agenerate_completion",
+                model=settings["model"],
+            )
+        except Exception as exc:
+            result = _build_failure_result(exc, settings)
+            _record_outcome(settings, result, started)
+            return result
+        _record_outcome(settings, result, started)
+        _settle_usage(limiter, settings, result)
+        _store_cached_result(cache, cache_key, result)
+        return result
+
+    if not config.get("coalesce_requests", True):
+        result = await _call_upstream()
+    else:
+        fingerprint = _coalescing_fingerprint(request_kwargs, config, cache_key)
+        result = await _acoalesce(fingerprint, _call_upstream, settings["model"])
+
+    observe_llm_call(result, config, time.perf_counter() - started)
+    fallback_models = list(config.get("fallback_models") or [])
+    if result.get("error") and fallback_models:
+        logger.warning(
+            "llm.agenerate_completion model=%s failed; falling back to %s",
+            settings["model"],
+            fallback_models[0],
+        )
+        fallback_config = dict(config, model=fallback_models[0], fallback_models=fallback_models[1:])
+        result = await agenerate_completion(messages=messages, config=fallback_config)
+        result["fallback_from"] = [settings["model"]] + list(result.get("fallback_from", []))
+    return result
+
+
+def stream_completion(messages: List[Dict[str, str]], config: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of generate_completion.
+
+    Yields {"type": "delta", "content": str} events as tokens arrive, then exactly one
+    {"type": "final", "result": dict} event carrying the same record generate_completion
+    returns plus result["streaming"] with ttft_seconds and duration_seconds.
+    Attempts are only retried, and config["fallback_models"] only tried, while nothing
+    has been yielded yet.
+    """
+    settings = _resolve_settings(messages, config)
+    request_kwargs = _build_request_kwargs(messages, config, settings)
+    started = time.perf_counter()
+    cache, cache_key, cached = _lookup_cached_result(request_kwargs, config, settings)
+    if cached is not None:
+        if cached.get("content"):
+            yield {"type": "delta", "content": cached["content"]}
+        elapsed = time.perf_counter() - started
+        cached["streaming"] = {"ttft_seconds": elapsed, "duration_seconds": elapsed}
+        observe_llm_call(cached, config, elapsed)
+        yield {"type": "final", "result": cached}
+        return
+
+    client = _get_client(config)
+    limiter = get_rate_limiter(settings["model"], config)
+    breaker = get_circuit_breaker(settings["endpoint"], config, settings["model"])
+    last_error: Optional[BaseException] = None
+    attempts = 0
+    yielded = False
+    upstream_started = time.perf_counter()
+
+    for attempt in range(1, settings["retries"] + 1):
+        if not breaker.allow():
+            last_error = breaker.open_error()
+            break
+        attempts = attempt
+        _admit(limiter, settings)
+        attempt_started = time.perf_counter()
+        attempt_started_ns = time.time_ns()
+        first_token_at: Optional[float] = None
+        parts: List[str] = []
+        usage = None
+        try:
+            stream = client.chat.completions.create(
+                **request_kwargs,
+                stream=True,
+                stream_options={"include_usage": True},
             )
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(delta)
+                yielded = True
+                yield {"type": "delta", "content": delta}
 
-            return {
-                "content": content,
-                "model": model,
-                "usage": {
-                    "prompt_tokens": prompt_tokens,
-                    "completion_tokens": completion_tokens,
-                },
-                "length": {
-                    "prompt_chars": prompt_len_chars,
-                    "completion_chars": completion_len_chars,
-                },
-                "estimated_cost_usd": estimated_cost_usd,
-                "attempts": attempt,
+            finished = time.perf_counter()
+            result = _build_success_result("".join(parts), usage, settings, attempt)
+            result["streaming"] = {
+                "ttft_seconds": (first_token_at - attempt_started) if first_token_at is not None else None,
+                "duration_seconds": finished - attempt_started,
             }
+            logger.info(
+                "llm.stream_completion model=%s ttft_seconds=%s duration_seconds=%.3f",
+                settings["model"],
+                "n/a" if first_token_at is None else f"{first_token_at - attempt_started:.3f}",
+                finished - attempt_started,
+            )
+            breaker.record_success()
+            record_span(
+                "llm.stream_completion",
+                attempt_started_ns,
+                endpoint=settings["endpoint"],
+                attempt=attempt,
+                ttft_ms=None if first_token_at is None else round((first_token_at - attempt_started) * 1000, 3),
+            )
+            _record_outcome(settings, result, upstream_started)
+            _settle_usage(limiter, settings, result)
+            _store_cached_result(cache, cache_key, result)
+            observe_llm_call(result, config, finished - started)
+            yield {"type": "final", "result": result}
+            return
         except Exception as exc:
             last_error = exc
+            breaker.record_failure(exc)
+            record_span(
+                "llm.stream_completion",
+                attempt_started_ns,
+                error=str(exc),
+                endpoint=settings["endpoint"],
+                attempt=attempt,
+            )
+            # The caller already rendered any deltas; retrying would duplicate text.
+            delay = None if parts else next_retry_delay(exc, attempt, settings["retries"], config)
             logger.warning(
-                "llm.generate_completion attempt=%d/%d failed: %s",
+                "llm.stream_completion attempt=%d/%d failed (%s): %s",
                 attempt,
-                retries,
+                settings["retries"],
+                "retrying" if delay is not None else "giving up",
                 exc,
             )
-            if attempt < retries:
-                time.sleep(backoff * attempt)
+            if delay is None:
+                break
+            time.sleep(delay)
 
-    logger.error("llm.generate_completion failed after %d attempts", retries)
-    return {
-        "content": "",
-        "model": model,
-        "usage": {"prompt_tokens": 0, "completion_tokens": 0},
-        "length": {"prompt_chars": prompt_len_chars, "completion_chars": 0},
-        "estimated_cost_usd": 0.0,
-        "attempts": retries,
-        "error": str(last_error) if last_error else "Unknown error",
-    }
+    result = _build_failure_result(last_error, settings, attempts)
+    if attempts:
+        _record_outcome(settings, result, upstream_started)
+    observe_llm_call(result, config, time.perf_counter() - started)
+    fallback_models = list(config.get("fallback_models") or [])
+    if not fallback_models or yielded:
+        yield {"type": "final", "result": result}
+        return
+
+    logger.warning(
+        "llm.stream_completion model=%s failed; falling back to %s",
+        settings["model"],
+        fallback_models[0],
+    )
+    fallback_config = dict(config, model=fallback_models[0], fallback_models=fallback_models[1:])
+    for event in stream_completion(messages, fallback_config):
+        if event["type"] == "final":
+            event["result"]["fallback_from"] = [settings["model"]] + list(event["result"].get("fallback_from", []))
+        yield event
@@ -0,0 +1,277 @@
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+RESERVOIR_SIZE = 1024
+
+LabelValues = Tuple[str, ...]
+
+
+def _percentile(ordered: List[float], pct: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value:g}")
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [{"labels": dict(zip(self.label_names, key)), "value": value} for key, value in items]
+
+
+class Gauge(Counter):
+    """Current value that moves both ways, e.g. requests in flight."""
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class _HistogramSeries:
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        # Recent samples for exact percentiles in the JSON dump.
+        self.reservoir: Deque[float] = deque(maxlen=RESERVOIR_SIZE)
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Tuple[str, ...],
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = _HistogramSeries(self.buckets)
+                self._series[key] = series
+            for index, upper in enumerate(self.buckets):
+                if value <= upper:
+                    series.bucket_counts[index] += 1
+            series.count += 1
+            series.total += value
+            series.reservoir.append(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(s.bucket_counts), s.count, s.total) for key, s in self._series.items())
+        for key, bucket_counts, count, total in items:
+            for upper, bucket_count in zip(self.buckets, bucket_counts):
+                labels = _format_labels(self.label_names, key, f'le="{upper:g}"')
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            inf_labels = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf_labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = sorted((key, s.count, s.total, sorted(s.reservoir)) for key, s in self._series.items())
+        return [
+            {
+                "labels": dict(zip(self.label_names, key)),
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else None,
+                "p50": _percentile(samples, 50),
+                "p95": _percentile(samples, 95),
+                "p99": _percentile(samples, 99),
+            }
+            for key, count, total, samples in items
+        ]
+
+
+LLM_LABELS = ("provider", "model", "stage")
+
+llm_requests_total = Counter(
+    "llm_requests_total", "LLM requests by outcome (success, error, cache_hit, coalesced)", LLM_LABELS + ("outcome",)
+)
+llm_request_latency_seconds = Histogram(
+    "llm_request_latency_seconds", "Wall-clock latency of LLM requests, retries included", LLM_LABELS
+)
+llm_tokens_total = Counter("llm_tokens_total", "Tokens sent and received", LLM_LABELS + ("kind",))
+llm_cost_usd_total = Counter("llm_cost_usd_total", "Estimated spend in USD", LLM_LABELS)
+llm_retries_total = Counter("llm_retries_total", "Attempts beyond the first", LLM_LABELS)
+llm_cache_requests_total = Counter(
+    "llm_cache_requests_total", "Response cache lookups by result (hit, miss)", LLM_LABELS + ("result",)
+)
+llm_errors_total = Counter("llm_errors_total", "Failed LLM requests by error kind", LLM_LABELS + ("kind",))
+pipeline_stage_latency_seconds = Histogram(
+    "pipeline_stage_latency_seconds", "Latency of run_generation pipeline stages", ("stage",)
+)
+pipeline_runs_total = Counter("pipeline_runs_total", "Pipeline runs by outcome", ("outcome",))
+llm_coalesced_requests_total = Counter(
+    "llm_coalesced_requests_total",
+    "Identical concurrent requests by role (leader: made the upstream call, waiter: shared its result)",
+    ("model", "role"),
+)
+llm_coalescing_in_flight = Gauge(
+    "llm_coalescing_in_flight", "Coalesced upstream calls (leader) and callers waiting on them (waiter)", ("model", "role")
+)
+
+REGISTRY: List[Any] = [
+    llm_requests_total,
+    llm_request_latency_seconds,
+    llm_tokens_total,
+    llm_cost_usd_total,
+    llm_retries_total,
+    llm_cache_requests_total,
+    llm_errors_total,
+    pipeline_stage_latency_seconds,
+    pipeline_runs_total,
+    llm_coalesced_requests_total,
+    llm_coalescing_in_flight,
+]
+
+
+def observe_llm_call(
+    result: Dict[str, Any],
+    config: Dict[str, Any],
+    latency_seconds: float,
+    provider: str = "openai",
+) -> None:
+    """Record one completion result dict (as returned by generation.llm_client)."""
+    labels = {
+        "provider": provider,
+        "model": result.get("model") or config.get("model", ""),
+        "stage": config.get("stage", "unknown"),
+    }
+    cache = result.get("cache") or {}
+    if cache.get("enabled") and not cache.get("bypass"):
+        llm_cache_requests_total.inc(result="hit" if cache.get("hit") else "miss", **labels)
+    if cache.get("hit"):
+        outcome = "cache_hit"
+    elif (result.get("coalesced") or {}).get("shared"):
+        outcome = "coalesced"
+    elif result.get("error"):
+        outcome = "error"
+    else:
+        outcome = "success"
+    llm_requests_total.inc(outcome=outcome, **labels)
+    llm_request_latency_seconds.observe(latency_seconds, **labels)
+
+    if result.get("error"):
+        llm_errors_total.inc(kind=result.get("error_kind", "unknown"), **labels)
+    attempts = int(result.get("attempts") or 0)
+    if attempts > 1:
+        llm_retries_total.inc(attempts - 1, **labels)
+    if outcome == "success":
+        usage = result.get("usage") or {}
+        llm_tokens_total.inc(int(usage.get("prompt_tokens", 0)), kind="prompt", **labels)
+        llm_tokens_total.inc(int(usage.get("completion_tokens", 0)), kind="completion", **labels)
+    llm_cost_usd_total.inc(float(result.get("estimated_cost_usd", 0.0)), **labels)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        pipeline_stage_latency_seconds.observe(time.perf_counter() - started, stage=stage)
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    return {metric.name: metric.snapshot() for metric in REGISTRY}
+
+
+def dump_metrics_json(path: str) -> None:
+    Path(path).write_text(json.dumps(metrics_snapshot(), indent=2) + "\n", encoding="utf-8")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/metrics":
+            body = render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.rstrip("/") == "/metrics.json":
+            body = json.dumps(metrics_snapshot(), indent=2).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("metrics %s", format % args)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logger.info("metrics.server listening on http://%s:%d/metrics", host, server.server_address[1])
+    return server
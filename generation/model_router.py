@@ -0,0 +1,214 @@
+import json
+import logging
+import math
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("pillars", "draft", "refine", "brand_check", "hashtags")
+LATENCY_WINDOW = 100
+EWMA_ALPHA = 0.2
+
+# "models": None means "the model the user picked" (config["model"]).
+# Expected tokens feed the cost ceiling check before any call is made.
+DEFAULT_ROUTING_POLICY: Dict[str, Any] = {
+    "min_success_rate": 0.8,
+    "min_samples": 5,
+    "probe_after_seconds": 60.0,
+    "stages": {
+        "pillars": {"models": None},
+        "draft": {"models": None},
+        "refine": {"models": None},
+        "brand_check": {
+            "models": ["gpt-4o-mini", "gpt-4.1-nano"],
+            "max_cost_usd": 0.002,
+            "latency_target_seconds": 8.0,
+            "expected_prompt_tokens": 1500,
+        },
+        "hashtags": {
+            "models": ["gpt-4.1-nano", "gpt-4o-mini"],
+            "max_cost_usd": 0.0005,
+            "latency_target_seconds": 4.0,
+            "expected_prompt_tokens": 600,
+        },
+    },
+}
+
+
+class _ModelStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.failures = 0
+        self.success_rate = 1.0
+        self.cost_usd = 0.0
+        self.last_call_at = 0.0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, success: bool, latency_seconds: float, cost_usd: float) -> None:
+        self.calls += 1
+        self.last_call_at = time.monotonic()
+        if not success:
+            self.failures += 1
+        # EWMA reacts to a degrading model within a handful of calls.
+        self.success_rate += EWMA_ALPHA * ((1.0 if success else 0.0) - self.success_rate)
+        self.cost_usd += cost_usd
+        if success:
+            self.latencies.append(latency_seconds)
+
+    def p95_latency(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "success_rate_ewma": self.success_rate,
+            "p95_latency_seconds": self.p95_latency(),
+            "cost_usd": self.cost_usd,
+        }
+
+
+_STATS: Dict[str, _ModelStats] = {}
+_SELECTIONS: Dict[str, Dict[str, int]] = {}
+_LOCK = threading.Lock()
+
+
+def record_outcome(model: str, success: bool, latency_seconds: float, cost_usd: float = 0.0) -> None:
+    """Feed one completed upstream call into the per-model health statistics."""
+    with _LOCK:
+        stats = _STATS.setdefault(model, _ModelStats())
+        stats.record(success, latency_seconds, cost_usd)
+
+
+def model_router_stats() -> Dict[str, Any]:
+    with _LOCK:
+        return {
+            "models": {model: stats.snapshot() for model, stats in _STATS.items()},
+            "selections": {stage: dict(counts) for stage, counts in _SELECTIONS.items()},
+        }
+
+
+def load_routing_policy(value: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Resolve a CLI/env setting: "" -> off, "default" -> DEFAULT_ROUTING_POLICY, otherwise a JSON file path."""
+    value = (value or "").strip()
+    if not value or value.lower() in ("0", "false", "off", "none"):
+        return None
+    if value.lower() in ("1", "true", "on", "default"):
+        return DEFAULT_ROUTING_POLICY
+    return json.loads(Path(value).read_text(encoding="utf-8"))
+
+
+def _estimated_cost(model: str, stage_policy: Dict[str, Any], config: Dict[str, Any]) -> Optional[float]:
+    # Imported lazily: llm_client reports outcomes back into this module.
+    from generation.llm_client import DEFAULT_PRICING_PER_1M, _compute_estimated_cost
+
+    pricing = config.get("pricing") or DEFAULT_PRICING_PER_1M
+    if model not in pricing:
+        return None
+    return _compute_estimated_cost(
+        model=model,
+        prompt_tokens=int(stage_policy.get("expected_prompt_tokens", 1000)),
+        completion_tokens=int(stage_policy.get("expected_completion_tokens", config.get("max_tokens", 500))),
+        pricing=pricing,
+    )
+
+
+def _rejection_reason(
+    model: str,
+    stage_policy: Dict[str, Any],
+    policy: Dict[str, Any],
+    config: Dict[str, Any],
+) -> Optional[str]:
+    max_cost = stage_policy.get("max_cost_usd")
+    if max_cost is not None:
+        cost = _estimated_cost(model, stage_policy, config)
+        if cost is not None and cost > float(max_cost):
+            return f"estimated cost {cost:.5f} > {float(max_cost):.5f}"
+
+    with _LOCK:
+        stats = _STATS.get(model)
+        if stats is None or stats.calls < int(policy.get("min_samples", 5)):
+            return None
+        success_rate = stats.success_rate
+        p95 = stats.p95_latency()
+        idle_seconds = time.monotonic() - stats.last_call_at
+    # A rejected model gets no traffic and so no fresh samples; let one call probe it now and then.
+    if idle_seconds >= float(policy.get("probe_after_seconds", 60.0)):
+        return None
+    min_success = float(policy.get("min_success_rate", 0.8))
+    if success_rate < min_success:
+        return f"success rate {success_rate:.2f} < {min_success:.2f}"
+    target = stage_policy.get("latency_target_seconds")
+    if target is not None and p95 is not None and p95 > float(target):
+        return f"p95 latency {p95:.2f}s > {float(target):.2f}s"
+    return None
+
+
+def select_model(stage: str, config: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Pick the model for a pipeline stage from config["model_routing"].
+
+    Candidates are tried in policy order; a model is skipped when its estimated cost is
+    over max_cost_usd or, once it has min_samples calls, its EWMA success rate is under
+    min_success_rate or its p95 latency is over latency_target_seconds. A model idle for
+    probe_after_seconds is eligible again so it can recover. When every candidate is
+    rejected the healthiest one is used anyway.
+    """
+    default_model = config.get("model", "gpt-4o-mini")
+    policy = config.get("model_routing") or {}
+    stage_policy = (policy.get("stages") or {}).get(stage)
+    if not stage_policy:
+        return default_model, {"stage": stage, "model": default_model, "routed": False}
+
+    models: List[str] = list(stage_policy.get("models") or [default_model])
+
+    rejected: Dict[str, str] = {}
+    eligible: List[str] = []
+    for model in models:
+        reason = _rejection_reason(model, stage_policy, policy, config)
+        if reason:
+            rejected[model] = reason
+        else:
+            eligible.append(model)
+
+    if eligible:
+        selected = eligible[0]
+    else:
+        with _LOCK:
+            selected = max(models, key=lambda m: _STATS[m].success_rate if m in _STATS else 1.0)
+        logger.warning("model_router.all_rejected stage=%s using=%s rejected=%s", stage, selected, rejected)
+
+    with _LOCK:
+        counts = _SELECTIONS.setdefault(stage, {})
+        counts[selected] = counts.get(selected, 0) + 1
+    decision = {
+        "stage": stage,
+        "model": selected,
+        "routed": True,
+        "rejected": rejected,
+        "fallbacks": [model for model in eligible if model != selected],
+    }
+    return selected, decision
+
+
+def route_stage(stage: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copy of config for one pipeline stage: config["stage"] is set and, when a routing
+    policy is configured, config["model"] and config["fallback_models"] come from it.
+    """
+    routed = dict(config)
+    routed["stage"] = stage
+    if not config.get("model_routing"):
+        return routed
+    model, decision = select_model(stage, config)
+    routed["model"] = model
+    routed["fallback_models"] = decision["fallbacks"]
+    routed["routing"] = decision
+    return routed
@@ -0,0 +1,323 @@
+import concurrent.futures
+import logging
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from generation.generate_post import generate_post
+from generation.brand_checker import check_brand_consistency
+from generation.cassette import cassette_stats
+from generation.refiner import refine_post
+from generation.post_assets import generate_hashtags, generate_post_image
+from generation.feedback_loop import build_feedback_guidance
+from generation.metrics import pipeline_runs_total, stage_timer
+from generation.model_router import model_router_stats
+from generation.tracing import Trace, bind_context, span, start_trace
+
+logger = logging.getLogger(__name__)
+
+PipelineEvent = Dict[str, Any]
+
+
+@contextmanager
+def _stage(name: str) -> Iterator[None]:
+    with stage_timer(name), span(f"stage.{name}"):
+        yield
+
+
+def _traced(fn: Callable[..., Any], name: str) -> Callable[..., Any]:
+    """fn wrapped in its own span, bound to the caller's trace for a worker thread."""
+
+    def _run(*args: Any, **kwargs: Any) -> Any:
+        with span(name):
+            return fn(*args, **kwargs)
+
+    return bind_context(_run)
+
+
+class _PipelineRun:
+    """Step log and streaming timings for one run, forwarded to an optional emit callback."""
+
+    def __init__(self, emit: Optional[Callable[[PipelineEvent], None]]) -> None:
+        self._emit = emit or (lambda event: None)
+        self.started = time.perf_counter()
+        self.steps: List[str] = []
+        self.first_token_seconds: Optional[float] = None
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def step(self, text: str) -> None:
+        self.steps.append(text)
+        self._emit({"type": "step", "text": text})
+
+    def draft(self, stage: str, text: str) -> None:
+        self._emit({"type": "draft", "stage": stage, "text": text})
+
+    def stream_to(self, stage: str) -> Callable[[str], None]:
+        stage_started = time.perf_counter()
+        timing = self.stages.setdefault(stage, {})
+
+        def on_delta(content: str) -> None:
+            now = time.perf_counter()
+            if "ttft_seconds" not in timing:
+                timing["ttft_seconds"] = now - stage_started
+            if self.first_token_seconds is None:
+                self.first_token_seconds = now - self.started
+                self.step(f"   First token after {self.first_token_seconds:.2f}s.")
+            self._emit({"type": "delta", "stage": stage, "content": content})
+
+        return on_delta
+
+    def streaming_metadata(self) -> Dict[str, Any]:
+        return {
+            "time_to_first_token_seconds": self.first_token_seconds,
+            "total_seconds": time.perf_counter() - self.started,
+            "stages": self.stages,
+        }
+
+
+def run_pipeline(
+    topic: str,
+    post_type: str,
+    target_persona: str,
+    config: Dict[str, Any],
+    emit: Optional[Callable[[PipelineEvent], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Run draft -> refine -> brand check -> refine -> final check/hashtags/image headlessly.
+
+    emit (optional) receives events as they happen:
+        {"type": "step", "text": str}
+        {"type": "delta", "stage": str, "content": str}  streamed tokens of the current draft
+        {"type": "draft", "stage": str, "text": str}     a complete draft replacing the preview
+
+    Stage latencies are recorded in generation.metrics (pipeline_stage_latency_seconds).
+    Each run is traced (generation.tracing): metadata["trace"] holds its spans and
+    critical path, and config["trace_dir"] (optional) receives one file per run in
+    config["trace_format"] ("json", the default, or "otlp").
+
+    Returns:
+        Dict with steps, final_post, hashtags, image_path, metadata and feedback_payload.
+    """
+    run = _PipelineRun(emit)
+    try:
+        with stage_timer("total"), start_trace("pipeline.run", post_type=post_type, topic=topic) as trace:
+            result = _run_stages(run, topic, post_type, target_persona, config)
+    except Exception:
+        pipeline_runs_total.inc(outcome="error")
+        raise
+    pipeline_runs_total.inc(outcome="success")
+    trace_summary = trace.to_dict()
+    result["metadata"]["trace"] = trace_summary
+    run.step(_critical_path_step(trace_summary))
+    _export_trace(trace, config)
+    return result
+
+
+def _critical_path_step(trace_summary: Dict[str, Any]) -> str:
+    stages = [
+        f"{entry['name'].replace('stage.', '')} {entry['duration_ms'] / 1000:.1f}s"
+        for entry in trace_summary.get("critical_path", [])
+        if entry["depth"] == 1
+    ]
+    total_ms = trace_summary.get("duration_ms") or 0.0
+    return f"Critical path ({total_ms / 1000:.1f}s): " + " -> ".join(stages)
+
+
+def _export_trace(trace: Trace, config: Dict[str, Any]) -> None:
+    trace_dir = config.get("trace_dir")
+    if not trace_dir:
+        return
+    fmt = config.get("trace_format", "json")
+    suffix = ".otlp.json" if fmt == "otlp" else ".json"
+    try:
+        path = trace.export(str(Path(trace_dir) / f"{trace.trace_id}{suffix}"), fmt=fmt)
+    except (OSError, ValueError) as exc:
+        logger.warning("pipeline.trace_export_failed dir=%s: %s", trace_dir, exc)
+        return
+    logger.info("pipeline.trace_exported path=%s", path)
+
+
+def _run_stages(
+    run: _PipelineRun,
+    topic: str,
+    post_type: str,
+    target_persona: str,
+    config: Dict[str, Any],
+) -> Dict[str, Any]:
+    prompt_persona = target_persona or "SME decision makers"
+
+    with _stage("feedback_memory"):
+        feedback_guidance, feedback_meta = build_feedback_guidance(
+            post_type=post_type,
+            target_persona=prompt_persona,
+        )
+    config["feedback_guidance"] = feedback_guidance
+    run.step(
+        "2. Loaded feedback memory - "
+        f"accepted: {feedback_meta.get('accepted_count', 0)}, "
+        f"rejected: {feedback_meta.get('rejected_count', 0)}."
+    )
+    run.step("3. Generating candidate drafts - creates multiple angle variations.")
+    with _stage("draft"):
+        draft_post, metadata = generate_post(
+            topic=topic,
+            post_type=post_type,
+            business_objective=prompt_persona,
+            config=config,
+            on_delta=run.stream_to("draft"),
+        )
+    selected_angle = (
+        metadata.get("candidate_generation", {}).get("selected_angle")
+        if isinstance(metadata, dict)
+        else None
+    )
+    if selected_angle:
+        run.step(f"4. Cohere selected best angle - picked: {selected_angle}.")
+    else:
+        run.step("4. Cohere selected best angle - ranked drafts by quality.")
+    run.draft("selected", draft_post)
+
+    run.step("5. First refinement pass - removes vague language and improves specificity.")
+    with _stage("refine_initial"):
+        refined_post, refinement_metadata = refine_post(
+            draft_post=draft_post,
+            topic=topic,
+            post_type=post_type,
+            business_objective=prompt_persona,
+            config=config,
+            on_delta=run.stream_to("refine_initial"),
+        )
+    if not refined_post:
+        refined_post = draft_post
+        run.draft("refine_initial", refined_post)
+
+    run.step("6. Initial brand check - scores tone, SME relevance, clarity, and differentiation.")
+    with _stage("brand_check_initial"):
+        initial_brand_result, initial_brand_metadata = check_brand_consistency(
+            post=refined_post,
+            config=config,
+        )
+
+    run.step("7. Feedback-driven refinement - applies brand checker suggestions.")
+    with _stage("refine_feedback"):
+        feedback_refined_post, feedback_refinement_metadata = refine_post(
+            draft_post=refined_post,
+            topic=topic,
+            post_type=post_type,
+            business_objective=prompt_persona,
+            config=config,
+            brand_feedback_summary=initial_brand_result.get("feedback_summary", ""),
+            brand_score=int(initial_brand_result.get("score", 0)),
+            on_delta=run.stream_to("refine_feedback"),
+        )
+    final_post = feedback_refined_post or refined_post
+    run.draft("final", final_post)
+
+    run.step("8. Final brand check - verifies improvements after feedback.")
+    run.step("9. Generating hashtags for publishing.")
+    run.step("10. Generating supporting image.")
+    with _stage("finalize"), concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+        future_brand = executor.submit(
+            _traced(check_brand_consistency, "stage.brand_check_final"),
+            post=final_post,
+            config=config,
+        )
+        future_hashtags = executor.submit(
+            _traced(generate_hashtags, "stage.hashtags"),
+            post=final_post,
+            topic=topic,
+            business_objective=prompt_persona,
+            config=config,
+        )
+        future_image = executor.submit(
+            _traced(generate_post_image, "stage.image"),
+            post=final_post,
+            topic=topic,
+            config=config,
+        )
+
+        final_brand_result, final_brand_metadata = future_brand.result()
+        hashtags, hashtags_metadata = future_hashtags.result()
+        image_path, image_metadata = future_image.result()
+
+    metadata["refinement"] = {
+        "initial": refinement_metadata,
+        "feedback_driven": feedback_refinement_metadata,
+    }
+    metadata["brand_check"] = {
+        "initial": {
+            "result": initial_brand_result,
+            "metadata": initial_brand_metadata,
+        },
+        "final": {
+            "result": final_brand_result,
+            "metadata": final_brand_metadata,
+        },
+    }
+    final_score = final_brand_result.get("score", 0)
+    run.step(f"11. Final post ready - final brand score: {final_score}/100.")
+    if not image_path:
+        run.step("Image generation failed - see logs/metadata.")
+    metadata["post_assets"] = {
+        "hashtags": hashtags_metadata,
+        "image": image_metadata,
+    }
+    metadata["streaming"] = run.streaming_metadata()
+    metadata["model_routing"] = model_router_stats()
+    if config.get("cassette_mode"):
+        metadata["cassette"] = cassette_stats()
+
+    feedback_payload = {
+        "topic": topic,
+        "post_type": post_type,
+        "target_persona": target_persona,
+        "final_post": final_post,
+        "hashtags": hashtags,
+        "brand_score": int(final_score or 0),
+    }
+    return {
+        "steps": run.steps,
+        "final_post": final_post,
+        "hashtags": hashtags,
+        "image_path": image_path,
+        "metadata": metadata,
+        "feedback_payload": feedback_payload,
+    }
+
+
+def iter_pipeline_events(
+    topic: str,
+    post_type: str,
+    target_persona: str,
+    config: Dict[str, Any],
+) -> Iterator[PipelineEvent]:
+    """
+    Run the pipeline in a worker thread and yield its events as they arrive.
+
+    The last event is {"type": "result", "result": dict} on success or
+    {"type": "error", "error": str} on failure.
+    """
+    events: "queue.Queue[PipelineEvent]" = queue.Queue()
+
+    def _worker() -> None:
+        try:
+            result = run_pipeline(topic, post_type, target_persona, config, emit=events.put)
+            events.put({"type": "result", "result": result})
+        except Exception as exc:
+            events.put({"type": "error", "error": str(exc)})
+
+    worker = threading.Thread(target=_worker, name="generation-pipeline", daemon=True)
+    worker.start()
+    while True:
+        event = events.get()
+        yield event
+        if event["type"] in ("result", "error"):
+            break
+    worker.join()
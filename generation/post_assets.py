@@ -2,11 +2,17 @@ import base64
 import json
 import os
 import tempfile
-from typing import Any, Dict, Optional, Tuple
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 from openai import OpenAI
 
-from generation.llm_client import generate_completion
+from generation.cassette import get_cassette
+from generation.llm_client import agenerate_completion, generate_completion
+from generation.metrics import observe_llm_call
+from generation.model_router import route_stage
+from generation.rate_limiter import get_rate_limiter
+from generation.tracing import span
 
 
 def _build_hashtag_prompt(post: str, topic: str, business_objective: str) -> str:
@@ -53,8 +59,8 @@ def _parse_hashtags(raw_text: str) -> str:
     return " ".join(cleaned[:10])
 
 
-def generate_hashtags(post: str, topic: str, business_objective: str, config: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
-    messages = [
+def _build_hashtag_messages(post: str, topic: str, business_objective: str) -> List[Dict[str, str]]:
+    return [
         {
             "role": "system",
             "content": "You create specific, SME-relevant LinkedIn hashtags. Return JSON only.",
@@ -64,7 +70,9 @@ def generate_hashtags(post: str, topic: str, business_objective: str, config: Di
             "content": _build_hashtag_prompt(post=post, topic=topic, business_objective=business_objective),
         },
     ]
-    llm_result = generate_completion(messages=messages, config=config)
+
+
+def _build_hashtags_result(llm_result: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
     hashtags = _parse_hashtags(llm_result.get("content", ""))
     metadata = {
         "llm": {
@@ -73,20 +81,50 @@ def generate_hashtags(post: str, topic: str, business_objective: str, config: Di
             "usage": llm_result.get("usage", {}),
             "length": llm_result.get("length", {}),
             "estimated_cost_usd": llm_result.get("estimated_cost_usd", 0.0),
+            "cache": llm_result.get("cache", {}),
             "error": llm_result.get("error"),
         }
     }
     return hashtags, metadata
 
 
+def generate_hashtags(post: str, topic: str, business_objective: str, config: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    config = route_stage("hashtags", config)
+    messages = _build_hashtag_messages(post=post, topic=topic, business_objective=business_objective)
+    llm_result = generate_completion(messages=messages, config=config)
+    return _build_hashtags_result(llm_result)
+
+
+async def agenerate_hashtags(
+    post: str,
+    topic: str,
+    business_objective: str,
+    config: Dict[str, Any],
+) -> Tuple[str, Dict[str, Any]]:
+    config = route_stage("hashtags", config)
+    messages = _build_hashtag_messages(post=post, topic=topic, business_objective=business_objective)
+    llm_result = await agenerate_completion(messages=messages, config=config)
+    return _build_hashtags_result(llm_result)
+
+
 def generate_post_image(post: str, topic: str, config: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any]]:
     api_key = config.get("api_key") or os.getenv("OPENAI_API_KEY")
-    if not api_key:
+    cassette = get_cassette(config)
+    replaying = cassette is not None and cassette.mode == "replay"
+    if not api_key and not replaying:
         return None, {"error": "OPENAI_API_KEY not set"}
 
     image_model = config.get("image_model", "gpt-image-1")
     image_size = config.get("image_size", "1024x1024")
-    client = OpenAI(api_key=api_key, timeout=float(config.get("timeout", 60)))
+    client: Any = None
+    if not replaying:
+        client = OpenAI(
+            api_key=api_key,
+            base_url=config.get("base_url"),
+            timeout=float(config.get("timeout", 60)),
+        )
+    if cassette is not None:
+        client = cassette.openai_client(client)
 
     prompt = (
         "Create a premium, professional LinkedIn cover-style image of a professional woman named Sofie, AI consultant, for a business audience.\n"
@@ -106,16 +144,32 @@ def generate_post_image(post: str, topic: str, config: Dict[str, Any]) -> Tuple[
         f"Post context: {post}\n"
     )
 
+    metrics_config = {"stage": "image"}
+    started = time.perf_counter()
+    observed = False
     try:
-        response = client.images.generate(
-            model=image_model,
-            prompt=prompt,
-            size=image_size,
-        )
-        data = response.data[0]
+        limiter = get_rate_limiter(image_model, config)
+        if limiter is not None:
+            limiter.acquire(0)
+        with span("openai.images.generate", provider="openai", stage="image", model=image_model, size=image_size):
+            response = client.images.generate(
+                model=image_model,
+                prompt=prompt,
+                size=image_size,
+            )
+        latency = time.perf_counter() - started
+        data = response.data[0] if response.data else None
         b64_data = getattr(data, "b64_json", None)
+        observed = True
         if not b64_data:
+            # A response without image bytes is a failed call, not a success.
+            observe_llm_call(
+                {"model": image_model, "error": "Image response missing b64_json", "error_kind": "MissingImageData"},
+                metrics_config,
+                latency,
+            )
             return None, {"error": "Image response missing b64_json", "model": image_model}
+        observe_llm_call({"model": image_model}, metrics_config, latency)
 
         image_bytes = base64.b64decode(b64_data)
         with tempfile.NamedTemporaryFile(prefix="pbcg_", suffix=".png", delete=False) as temp_file:
@@ -124,4 +178,10 @@ def generate_post_image(post: str, topic: str, config: Dict[str, Any]) -> Tuple[
 
         return image_path, {"model": image_model, "size": image_size, "path": image_path}
     except Exception as exc:
+        if not observed:
+            observe_llm_call(
+                {"model": image_model, "error": str(exc), "error_kind": type(exc).__name__},
+                metrics_config,
+                time.perf_counter() - started,
+            )
         return None, {"error": str(exc), "model": image_model, "size": image_size}
\ No newline at end of file
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_LIMITERS: Dict[str, "RateLimiter"] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Continuous-refill token bucket that hands out reservations instead of polling.
+
+    reserve() debits the bucket immediately, letting it go negative, and returns how
+    long the caller must wait. Later callers queue behind the debt, so admission is
+    first-come first-served across threads and event loops.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float) -> None:
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self.updated_at = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # A single request larger than the bucket would otherwise never be admitted.
+        self.tokens -= min(float(amount), self.capacity)
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.refill_per_second
+
+    def debit(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= float(amount)
+
+    def resize(self, capacity: float, refill_per_second: float, now: float) -> None:
+        """Change the budget in place; tokens already spent (or owed) stay spent."""
+        self._refill(now)
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = min(self.tokens, self.capacity)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget for one model."""
+
+    def __init__(self, model: str, rpm: Optional[float] = None, tpm: Optional[float] = None) -> None:
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(rpm, rpm / 60.0) if rpm else None
+        self._tokens = TokenBucket(tpm, tpm / 60.0) if tpm else None
+        self.total_wait_seconds = 0.0
+        self.admitted = 0
+        self.delayed = 0
+
+    @staticmethod
+    def _resized(bucket: Optional[TokenBucket], per_minute: Optional[float], now: float) -> Optional[TokenBucket]:
+        if not per_minute:
+            return None
+        if bucket is None:
+            return TokenBucket(per_minute, per_minute / 60.0)
+        bucket.resize(per_minute, per_minute / 60.0, now)
+        return bucket
+
+    def update_limits(self, rpm: Optional[float], tpm: Optional[float]) -> None:
+        """Apply new budgets without forgetting what recent requests have already used."""
+        with self._lock:
+            now = time.monotonic()
+            self._requests = self._resized(self._requests, rpm, now)
+            self._tokens = self._resized(self._tokens, tpm, now)
+            self.rpm = rpm
+            self.tpm = tpm
+
+    def reserve(self, tokens: int) -> float:
+        """Claim one request slot plus tokens and return the seconds to wait before sending."""
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self._requests is not None:
+                wait = max(wait, self._requests.reserve(1, now))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.reserve(tokens, now))
+            self.admitted += 1
+            if wait > 0:
+                self.delayed += 1
+                self.total_wait_seconds += wait
+        if wait > 0:
+            logger.info("rate_limiter.wait model=%s tokens=%d wait_seconds=%.3f", self.model, tokens, wait)
+        return wait
+
+    def acquire(self, tokens: int) -> float:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int) -> float:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def record_usage(self, reserved_tokens: int, actual_tokens: int) -> None:
+        """Charge (or refund) the difference between the admission estimate and real usage."""
+        if self._tokens is None:
+            return
+        with self._lock:
+            self._tokens.debit(actual_tokens - reserved_tokens, time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self.model,
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "admitted": self.admitted,
+                "delayed": self.delayed,
+                "total_wait_seconds": self.total_wait_seconds,
+            }
+
+
+def _resolve_limits(model: str, config: Dict[str, Any]) -> Tuple[Optional[float], Optional[float]]:
+    per_model = (config.get("rate_limits") or {}).get(model) or {}
+    is_chat_model = model == config.get("model", "gpt-4o-mini")
+    rpm = per_model.get("rpm", config.get("rate_limit_rpm") if is_chat_model else None)
+    tpm = per_model.get("tpm", config.get("rate_limit_tpm") if is_chat_model else None)
+    rpm = float(rpm) if rpm else None
+    tpm = float(tpm) if tpm else None
+    return rpm, tpm
+
+
+def get_rate_limiter(model: str, config: Dict[str, Any]) -> Optional[RateLimiter]:
+    """
+    Return the process-wide limiter for model, or None when no budget is configured.
+
+    Config keys:
+        - rate_limit_rpm / rate_limit_tpm (float, optional): budget for config["model"]
+        - rate_limits (dict, optional): {"model_name": {"rpm": float, "tpm": float}},
+          takes precedence per model (use this for image models too)
+    """
+    rpm, tpm = _resolve_limits(model, config)
+    if not rpm and not tpm:
+        return None
+
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(model)
+        if limiter is None:
+            limiter = RateLimiter(model, rpm=rpm, tpm=tpm)
+            _LIMITERS[model] = limiter
+        elif limiter.rpm != rpm or limiter.tpm != tpm:
+            # The budget belongs to the model's account, so keep the bucket state and resize it.
+            limiter.update_limits(rpm, tpm)
+    return limiter
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _LIMITERS_LOCK:
+        limiters = list(_LIMITERS.values())
+    return {limiter.model: limiter.stats() for limiter in limiters}
@@ -1,12 +1,14 @@
+import asyncio
 import sys
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from generation.llm_client import generate_completion
-from generation.generate_post import doc_processor
+from generation.llm_client import agenerate_completion, generate_completion
+from generation.knowledge_base import doc_processor
+from generation.model_router import route_stage
 
 
 def _project_root() -> Path:
@@ -20,21 +22,19 @@ def _load_prompt_file(filename: str) -> str:
     return prompt_path.read_text(encoding="utf-8").strip()
 
 
-def refine_post(
+def _refinement_rag_query(topic: str, post_type: str, business_objective: str) -> str:
+    return f"{topic}. Draft refinement for post type {post_type}. Objective: {business_objective}."
+
+
+def _build_refinement_messages(
     draft_post: str,
     topic: str,
     post_type: str,
     business_objective: str,
-    config: Dict[str, Any],
-    brand_feedback_summary: str = "",
-    brand_score: int = -1,
-) -> Tuple[str, Dict[str, Any]]:
-    if not (draft_post or "").strip():
-        return "", {"error": "Draft post is empty."}
-
-    rag_query = f"{topic}. Draft refinement for post type {post_type}. Objective: {business_objective}."
-    brand_context = doc_processor.search(rag_query)
-
+    brand_context: str,
+    brand_feedback_summary: str,
+    brand_score: int,
+) -> List[Dict[str, str]]:
     system_prompt_template = _load_prompt_file("system_prompt.txt")
     system_prompt = (
         system_prompt_template.replace("{brand_context}", brand_context)
@@ -58,11 +58,17 @@ def refine_post(
             "- Prioritize these fixes while preserving the strongest parts of the draft."
         )
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": refinement_prompt},
     ]
-    llm_result = generate_completion(messages=messages, config=config)
+
+
+def _build_refinement_result(
+    llm_result: Dict[str, Any],
+    brand_feedback_summary: str,
+    rag_stats: Dict[str, Any],
+) -> Tuple[str, Dict[str, Any]]:
     refined_post = (llm_result.get("content") or "").strip()
 
     metadata = {
@@ -71,14 +77,61 @@ def refine_post(
             "template": "prompts/refinement_prompt.txt",
         },
         "feedback_driven": bool((brand_feedback_summary or "").strip()),
+        "rag": rag_stats,
         "llm": {
             "model": llm_result.get("model"),
             "attempts": llm_result.get("attempts"),
             "usage": llm_result.get("usage", {}),
             "length": llm_result.get("length", {}),
             "estimated_cost_usd": llm_result.get("estimated_cost_usd", 0.0),
+            "cache": llm_result.get("cache", {}),
             "error": llm_result.get("error"),
         },
     }
 
     return refined_post, metadata
+
+
+def refine_post(
+    draft_post: str,
+    topic: str,
+    post_type: str,
+    business_objective: str,
+    config: Dict[str, Any],
+    brand_feedback_summary: str = "",
+    brand_score: int = -1,
+    on_delta: Optional[Callable[[str], None]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    if not (draft_post or "").strip():
+        return "", {"error": "Draft post is empty."}
+
+    config = route_stage("refine", config)
+    rag_query = _refinement_rag_query(topic, post_type, business_objective)
+    brand_context, rag_stats = doc_processor.retrieve_context(rag_query, config)
+    messages = _build_refinement_messages(
+        draft_post, topic, post_type, business_objective, brand_context, brand_feedback_summary, brand_score
+    )
+    llm_result = generate_completion(messages=messages, config=config, on_delta=on_delta)
+    return _build_refinement_result(llm_result, brand_feedback_summary, rag_stats)
+
+
+async def arefine_post(
+    draft_post: str,
+    topic: str,
+    post_type: str,
+    business_objective: str,
+    config: Dict[str, Any],
+    brand_feedback_summary: str = "",
+    brand_score: int = -1,
+) -> Tuple[str, Dict[str, Any]]:
+    if not (draft_post or "").strip():
+        return "", {"error": "Draft post is empty."}
+
+    config = route_stage("refine", config)
+    rag_query = _refinement_rag_query(topic, post_type, business_objective)
+    brand_context, rag_stats = await asyncio.to_thread(doc_processor.retrieve_context, rag_query, config)
+    messages = _build_refinement_messages(
+        draft_post, topic, post_type, business_objective, brand_context, brand_feedback_summary, brand_score
+    )
+    llm_result = await agenerate_completion(messages=messages, config=config)
+    return _build_refinement_result(llm_result, brand_feedback_summary, rag_stats)
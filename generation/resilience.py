@@ -0,0 +1,342 @@
+import asyncio
+import email.utils
+import logging
+import random
+import socket
+import threading
+import time
+import urllib.error
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from generation.tracing import span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+DEFAULT_MAX_BACKOFF_SECONDS = 30.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET_SECONDS = 30.0
+
+_BREAKERS: Dict[Tuple[str, Optional[str]], "CircuitBreaker"] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    # openai.APIStatusError exposes status_code, urllib.error.HTTPError exposes code.
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def _headers(exc: BaseException) -> Any:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        headers = getattr(exc, "headers", None)
+    return headers
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Transient provider/network failures are retryable; auth, validation and local bugs are not."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    try:
+        import openai
+
+        if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+    except ImportError:
+        pass
+    try:
+        import httpx
+
+        # Connect/read timeouts and dropped connections from pooled httpx clients.
+        if isinstance(exc, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(exc, (urllib.error.URLError, socket.timeout, TimeoutError, ConnectionError))
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """
+    The connection was refused, reset or dropped before a response arrived.
+
+    During a local burst these come from our own side (full listen backlogs, exhausted
+    ephemeral ports), so they are retried but are not evidence that the provider is
+    degraded. Timeouts and HTTP status errors are not connection errors.
+    """
+    current: Optional[BaseException] = exc
+    seen = set()
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, (TimeoutError, socket.timeout)) or _status_code(current) is not None:
+            return False
+        name = type(current).__name__
+        if "Timeout" in name:
+            # openai.APITimeoutError, httpx.ConnectTimeout/ReadTimeout (httpx or the SDK's httpx2).
+            return False
+        if isinstance(current, ConnectionError) or name == "ConnectError":
+            return True
+        current = current.__cause__ or current.__context__
+    return False
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Server-requested delay from retry-after-ms / Retry-After (seconds or HTTP date), if any."""
+    headers = _headers(exc)
+    if headers is None:
+        return None
+    try:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            return max(0.0, float(retry_after_ms) / 1000.0)
+        retry_after = headers.get("retry-after")
+    except Exception:
+        return None
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def backoff_delay(
+    attempt: int,
+    base_seconds: float,
+    max_seconds: float = DEFAULT_MAX_BACKOFF_SECONDS,
+    retry_after: Optional[float] = None,
+) -> float:
+    """Full-jitter exponential backoff; a Retry-After hint is honoured as a lower bound."""
+    ceiling = min(max_seconds, base_seconds * (2 ** (attempt - 1)))
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, max_seconds))
+    return delay
+
+
+def next_retry_delay(exc: BaseException, attempt: int, retries: int, config: Dict[str, Any]) -> Optional[float]:
+    """Seconds to sleep before the next attempt, or None when the error is fatal or attempts are spent."""
+    if attempt >= retries or not is_retryable(exc):
+        return None
+    return backoff_delay(
+        attempt,
+        base_seconds=float(config.get("retry_backoff_seconds", 1.0)),
+        max_seconds=float(config.get("retry_max_backoff_seconds", DEFAULT_MAX_BACKOFF_SECONDS)),
+        retry_after=retry_after_seconds(exc),
+    )
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint/model breaker: closed -> open after threshold consecutive retryable
+    failures, open -> half-open after reset_seconds, letting a single probe through.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        threshold: int = DEFAULT_BREAKER_THRESHOLD,
+        reset_seconds: float = DEFAULT_BREAKER_RESET_SECONDS,
+        count_connection_errors: bool = False,
+    ) -> None:
+        self.name = name
+        self.threshold = max(1, int(threshold))
+        self.reset_seconds = float(reset_seconds)
+        self.count_connection_errors = count_connection_errors
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info("circuit_breaker.closed endpoint=%s", self.name)
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, exc: BaseException) -> None:
+        # Fatal errors (bad request, auth) say nothing about provider health, and
+        # connection errors are usually our own burst rather than a provider incident.
+        neutral = not is_retryable(exc) or (not self.count_connection_errors and is_connection_error(exc))
+        if neutral:
+            with self._lock:
+                self._probe_in_flight = False
+            return
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.threshold:
+                if self.state != "open":
+                    logger.warning(
+                        "circuit_breaker.open endpoint=%s failures=%d",
+                        self.name,
+                        self.consecutive_failures,
+                    )
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def open_error(self) -> CircuitOpenError:
+        remaining = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+        return CircuitOpenError(f"Circuit open for {self.name}; retry in {remaining:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "rejected": self.rejected,
+            }
+
+
+def get_circuit_breaker(endpoint: str, config: Dict[str, Any], model: Optional[str] = None) -> CircuitBreaker:
+    """
+    Process-wide breaker for (endpoint, model).
+
+    Keying by model keeps one degraded model from failing fast every other model (and
+    the fallback chain) served by the same endpoint.
+
+    Config keys:
+        - circuit_breaker_threshold (int, default: 5)
+        - circuit_breaker_reset_seconds (float, default: 30)
+        - circuit_breaker_count_connection_errors (bool, default: False): let refused/reset
+          connections open the breaker (see is_connection_error)
+    """
+    key = (endpoint, model)
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                f"{endpoint} [{model}]" if model else endpoint,
+                threshold=int(config.get("circuit_breaker_threshold", DEFAULT_BREAKER_THRESHOLD)),
+                reset_seconds=float(config.get("circuit_breaker_reset_seconds", DEFAULT_BREAKER_RESET_SECONDS)),
+                count_connection_errors=bool(config.get("circuit_breaker_count_connection_errors", False)),
+            )
+            _BREAKERS[key] = breaker
+    return breaker
+
+
+def circuit_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    with _BREAKERS_LOCK:
+        breakers = list(_BREAKERS.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+def call_with_retries(
+    fn: Callable[[int], T],
+    endpoint: str,
+    config: Dict[str, Any],
+    retries: int,
+    label: str,
+    model: Optional[str] = None,
+) -> T:
+    """
+    Call fn(attempt) until it succeeds, the error is fatal, or retries are spent.
+
+    Every attempt is gated by the (endpoint, model) circuit breaker and traced as a span
+    named label. The last error is re-raised; its ``attempts`` attribute records how many calls
+    were made.
+    """
+    breaker = get_circuit_breaker(endpoint, config, model)
+    retries = max(1, int(retries))
+    for attempt in range(1, retries + 1):
+        if not breaker.allow():
+            exc: BaseException = breaker.open_error()
+            exc.attempts = attempt - 1  # type: ignore[attr-defined]
+            raise exc
+        try:
+            with span(label, endpoint=endpoint, attempt=attempt):
+                result = fn(attempt)
+        except Exception as exc:
+            breaker.record_failure(exc)
+            delay = next_retry_delay(exc, attempt, retries, config)
+            logger.warning(
+                "%s attempt=%d/%d failed (%s): %s",
+                label,
+                attempt,
+                retries,
+                "retrying" if delay is not None else "giving up",
+                exc,
+            )
+            if delay is None:
+                exc.attempts = attempt  # type: ignore[attr-defined]
+                raise
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+    raise AssertionError("unreachable")
+
+
+async def acall_with_retries(
+    fn: Callable[[int], Awaitable[T]],
+    endpoint: str,
+    config: Dict[str, Any],
+    retries: int,
+    label: str,
+    model: Optional[str] = None,
+) -> T:
+    """Async variant of call_with_retries; backoff waits on the event loop."""
+    breaker = get_circuit_breaker(endpoint, config, model)
+    retries = max(1, int(retries))
+    for attempt in range(1, retries + 1):
+        if not breaker.allow():
+            exc: BaseException = breaker.open_error()
+            exc.attempts = attempt - 1  # type: ignore[attr-defined]
+            raise exc
+        try:
+            with span(label, endpoint=endpoint, attempt=attempt):
+                result = await fn(attempt)
+        except Exception as exc:
+            breaker.record_failure(exc)
+            delay = next_retry_delay(exc, attempt, retries, config)
+            logger.warning(
+                "%s attempt=%d/%d failed (%s): %s",
+                label,
+                attempt,
+                retries,
+                "retrying" if delay is not None else "giving up",
+                exc,
+            )
+            if delay is None:
+                exc.attempts = attempt  # type: ignore[attr-defined]
+                raise
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+    raise AssertionError("unreachable")
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+
+_CACHE_INSTANCES: Dict[str, "ResponseCache"] = {}
+_INSTANCES_LOCK = threading.Lock()
+
+
+def _project_root() -> Path:
+    return Path(__file__).resolve().parent.parent
+
+
+def _default_cache_path() -> Path:
+    return _project_root() / "data" / "llm_response_cache.sqlite3"
+
+
+def build_cache_key(request_kwargs: Dict[str, Any], base_url: Optional[str] = None) -> str:
+    """Stable hash of everything that shapes the completion (never the API key)."""
+    payload = json.dumps(
+        {"base_url": base_url or "", "request": request_kwargs},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed store of successful completion results.
+
+    Entries expire after ttl_seconds; once the table grows past max_entries the
+    least recently read rows are evicted.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ) -> None:
+        self.path = Path(path) if path else _default_cache_path()
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # One connection shared across threads; every access goes through _lock.
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, "
+            "payload TEXT NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        try:
+            return json.loads(payload)
+        except json.JSONDecodeError:
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        now = time.time()
+        payload = json.dumps(result, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, payload, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return count
+
+
+def get_response_cache(config: Dict[str, Any]) -> Optional[ResponseCache]:
+    """
+    Return the cache configured for this call, or None when caching is off.
+
+    Config keys:
+        - response_cache (bool, default: False): opt in to caching
+        - response_cache_path (str, optional): SQLite file (default: data/llm_response_cache.sqlite3)
+        - response_cache_ttl_seconds (float, default: 86400)
+        - response_cache_max_entries (int, default: 1000)
+    """
+    if not config.get("response_cache"):
+        return None
+
+    path = str(config.get("response_cache_path") or _default_cache_path())
+    ttl_seconds = float(config.get("response_cache_ttl_seconds", DEFAULT_TTL_SECONDS))
+    max_entries = int(config.get("response_cache_max_entries", DEFAULT_MAX_ENTRIES))
+    with _INSTANCES_LOCK:
+        cache = _CACHE_INSTANCES.get(path)
+        if cache is None:
+            cache = ResponseCache(path=path, ttl_seconds=ttl_seconds, max_entries=max_entries)
+            _CACHE_INSTANCES[path] = cache
+        else:
+            cache.ttl_seconds = ttl_seconds
+            cache.max_entries = max(1, max_entries)
+    return cache
@@ -0,0 +1,284 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "linkedin-post-generator"
+TRACE_FORMATS = ("json", "otlp")
+
+_CURRENT_SPAN: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("current_span", default=None)
+
+
+def _new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+
+class Span:
+    def __init__(
+        self,
+        name: str,
+        trace: "Trace",
+        parent_id: Optional[str],
+        attributes: Optional[Dict[str, Any]] = None,
+        start_ns: Optional[int] = None,
+    ) -> None:
+        self.name = name
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: Any) -> None:
+        self.status = "error"
+        self.error = str(error)
+
+    def finish(self, end_ns: Optional[int] = None) -> None:
+        if self.end_ns is None:
+            self.end_ns = end_ns if end_ns is not None else time.time_ns()
+            self.trace.add(self)
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_dict(self, origin_ns: int) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_offset_ms": round((self.start_ns - origin_ns) / 1e6, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class _NoopSpan:
+    """Returned by span() outside a trace so call sites never need to check."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+    def record_error(self, error: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Finished spans of one request; threads and asyncio tasks add to it concurrently."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.trace_id = _new_id(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def _snapshot(self) -> List[Span]:
+        with self._lock:
+            return sorted(self.spans, key=lambda s: s.start_ns)
+
+    def critical_path(self) -> List[Dict[str, Any]]:
+        """
+        Spans that determined the end-to-end latency, outermost first.
+
+        Walking back from a span's end, the child that finished last is on the path;
+        the cursor then jumps to that child's start and repeats, so siblings running
+        in parallel with a slower one are skipped.
+        """
+        spans = self._snapshot()
+        roots = [s for s in spans if s.parent_id is None]
+        if not roots:
+            return []
+        children: Dict[str, List[Span]] = {}
+        for s in spans:
+            if s.parent_id is not None:
+                children.setdefault(s.parent_id, []).append(s)
+        origin = roots[0].start_ns
+
+        path: List[Dict[str, Any]] = []
+
+        def _walk(current: Span, depth: int) -> None:
+            path.append(
+                {
+                    "name": current.name,
+                    "span_id": current.span_id,
+                    "depth": depth,
+                    "start_offset_ms": round((current.start_ns - origin) / 1e6, 3),
+                    "duration_ms": round(current.duration_ms, 3),
+                }
+            )
+            cursor = current.end_ns or 0
+            chosen: List[Span] = []
+            for child in sorted(children.get(current.span_id, []), key=lambda s: s.end_ns or 0, reverse=True):
+                if (child.end_ns or 0) <= cursor:
+                    chosen.append(child)
+                    cursor = child.start_ns
+            for child in reversed(chosen):
+                _walk(child, depth + 1)
+
+        _walk(roots[0], 0)
+        return path
+
+    def to_dict(self) -> Dict[str, Any]:
+        spans = self._snapshot()
+        origin = spans[0].start_ns if spans else 0
+        root = next((s for s in spans if s.parent_id is None), None)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "duration_ms": round(root.duration_ms, 3) if root else None,
+            "span_count": len(spans),
+            "critical_path": self.critical_path(),
+            "spans": [s.to_dict(origin) for s in spans],
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON (ExportTraceServiceRequest) body, loadable by OpenTelemetry collectors and Jaeger."""
+        otlp_spans = []
+        for s in self._snapshot():
+            otlp_span: Dict[str, Any] = {
+                "traceId": self.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                # 3 = CLIENT for outbound provider calls, 1 = INTERNAL otherwise.
+                "kind": 3 if "provider" in s.attributes or "endpoint" in s.attributes else 1,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                "attributes": [_otlp_attribute(key, value) for key, value in s.attributes.items()],
+                "status": {"code": 2, "message": s.error or ""} if s.status == "error" else {"code": 1},
+            }
+            if s.parent_id:
+                otlp_span["parentSpanId"] = s.parent_id
+            otlp_spans.append(otlp_span)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": otlp_spans}],
+                }
+            ]
+        }
+
+    def export(self, path: str, fmt: str = "json") -> Path:
+        if fmt not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format {fmt!r}; expected one of {TRACE_FORMATS}")
+        body = self.to_otlp() if fmt == "otlp" else self.to_dict()
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(json.dumps(body, indent=2, default=str) + "\n", encoding="utf-8")
+        return target
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    elif isinstance(value, str):
+        typed = {"stringValue": value}
+    else:
+        typed = {"stringValue": json.dumps(value, default=str)}
+    return {"key": key, "value": typed}
+
+
+def current_span() -> Optional[Span]:
+    return _CURRENT_SPAN.get()
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Trace]:
+    """Open a new trace whose root span lasts for the with block."""
+    trace = Trace(name)
+    root = Span(name, trace, None, attributes)
+    token = _CURRENT_SPAN.set(root)
+    try:
+        yield trace
+    except BaseException as exc:
+        root.record_error(exc)
+        raise
+    finally:
+        _CURRENT_SPAN.reset(token)
+        root.finish()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Child of the current span; a no-op outside a trace."""
+    parent = _CURRENT_SPAN.get()
+    if parent is None:
+        yield _NOOP_SPAN
+        return
+    child = Span(name, parent.trace, parent.span_id, attributes)
+    token = _CURRENT_SPAN.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.record_error(exc)
+        raise
+    finally:
+        _CURRENT_SPAN.reset(token)
+        child.finish()
+
+
+def record_span(name: str, start_ns: int, error: Optional[str] = None, **attributes: Any) -> None:
+    """
+    Add an already-finished child of the current span.
+
+    Generators (stream_completion) use this: a span kept open across yields would leak
+    into the caller's context.
+    """
+    parent = _CURRENT_SPAN.get()
+    if parent is None:
+        return
+    finished = Span(name, parent.trace, parent.span_id, attributes, start_ns=start_ns)
+    if error:
+        finished.record_error(error)
+    finished.finish()
+
+
+def bind_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Carry the current span into a worker thread (ThreadPoolExecutor does not copy contextvars).
+
+    Wrap once per submitted task: a copied context cannot be entered by two threads at once.
+    """
+    context = contextvars.copy_context()
+
+    def _run(*args: Any, **kwargs: Any) -> Any:
+        return context.run(fn, *args, **kwargs)
+
+    return _run
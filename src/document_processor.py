@@ -1,87 +1,874 @@
+import bisect
+import concurrent.futures
+import hashlib
+import heapq
+import itertools
+import math
 import os
+import pickle
 import re
-from typing import List, Dict
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Iterator, List, Dict, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+RULE_PATTERN = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+MAX_CHUNK_CHARS = 800
+NO_CONTEXT_MESSAGE = "No specific context found. Use general knowledge."
+CONTEXT_HEADER = "## RELEVANT INFORMATION FROM KNOWLEDGE BASES:\n\n"
+# When packing, a chunk is a duplicate if more than this share of its word shingles
+# (runs of SHINGLE_SIZE words) already appear in a packed chunk
+DUPLICATE_OVERLAP = 0.5
+SHINGLE_SIZE = 5
+SEARCH_MODES = ("lexical", "dense", "hybrid")
+SNAPSHOT_VERSION = 4
+# Rebuild from scratch instead of patching once this share of indexed chunks are tombstones
+MAX_TOMBSTONE_RATIO = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used for both indexing and querying"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), matching the LLM client's estimate"""
+    return max(1, len(text) // 4)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Overlapping word n-grams; shared shingles mean shared passages, not just shared vocabulary"""
+    words = tokenize(text)
+    if len(words) <= size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def clean_markdown(text: str) -> str:
+    """Simple markdown to text conversion"""
+    return re.sub(r'[#*_`\[\]]+', '', text).strip()
+
+
+def _split_long_block(block: str, max_chars: int) -> List[str]:
+    if len(block) <= max_chars:
+        return [block]
+    pieces: List[str] = []
+    remaining = block
+    while len(remaining) > max_chars:
+        cut = remaining.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(remaining[:cut].strip())
+        remaining = remaining[cut:].strip()
+    if remaining:
+        pieces.append(remaining)
+    return pieces
+
+
+def chunk_markdown(content: str, max_chars: int = MAX_CHUNK_CHARS) -> List[Dict]:
+    """Split markdown into section-aware chunks on headings and paragraph boundaries.
+
+    Paragraphs under the same heading are packed together up to max_chars, so every
+    chunk stays inside one section and carries its heading trail as metadata.
+    """
+    chunks: List[Dict] = []
+    heading_trail: List[Tuple[int, str]] = []
+    paragraphs: List[str] = []
+    current_lines: List[str] = []
+
+    def _section() -> str:
+        return " > ".join(title for _, title in heading_trail)
+
+    def _end_paragraph() -> None:
+        text = clean_markdown("\n".join(current_lines))
+        current_lines.clear()
+        if text:
+            paragraphs.extend(_split_long_block(text, max_chars))
+
+    def _flush_section() -> None:
+        _end_paragraph()
+        section = _section()
+        buffer = ""
+        for paragraph in paragraphs:
+            if buffer and len(buffer) + len(paragraph) + 2 > max_chars:
+                chunks.append({'content': buffer, 'section': section})
+                buffer = ""
+            buffer = f"{buffer}\n\n{paragraph}" if buffer else paragraph
+        if buffer:
+            chunks.append({'content': buffer, 'section': section})
+        paragraphs.clear()
+
+    for line in content.splitlines():
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            _flush_section()
+            level = len(heading.group(1))
+            while heading_trail and heading_trail[-1][0] >= level:
+                heading_trail.pop()
+            title = clean_markdown(heading.group(2))
+            if title:
+                heading_trail.append((level, title))
+        elif not line.strip() or RULE_PATTERN.match(line):
+            _end_paragraph()
+        else:
+            current_lines.append(line)
+    _flush_section()
+
+    for position, chunk in enumerate(chunks):
+        chunk['chunk_index'] = position
+    return chunks
+
+
+class BM25Index:
+    """Inverted index (token -> postings of (doc_id, term frequency)) ranked with Okapi BM25"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        # token -> (max tf, min doc length) over its postings, for per-term score upper bounds.
+        # Filled on first query; add() drops the entry, removals keep it (looser, never wrong).
+        self.term_stats: Dict[str, Tuple[int, int]] = {}
+        self.doc_lengths: List[int] = []
+        self.total_length = 0
+        # Removed doc ids keep their slot so other ids stay stable
+        self.deleted_ids: set = set()
+        # Tokens whose postings list this instance may mutate in place (see copy())
+        self._owned_tokens: Optional[set] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths) - len(self.deleted_ids)
+
+    def copy(self) -> "BM25Index":
+        """Copy-on-write clone: postings lists are shared until one side modifies them"""
+        clone = BM25Index(k1=self.k1, b=self.b)
+        clone.postings = dict(self.postings)
+        clone.term_stats = dict(self.term_stats)
+        clone.doc_lengths = list(self.doc_lengths)
+        clone.total_length = self.total_length
+        clone.deleted_ids = set(self.deleted_ids)
+        clone._owned_tokens = set()
+        self._owned_tokens = set()
+        return clone
+
+    def _writable_postings(self, token: str) -> List[Tuple[int, int]]:
+        postings = self.postings.get(token)
+        if postings is None:
+            postings = self.postings[token] = []
+        elif self._owned_tokens is not None and token not in self._owned_tokens:
+            postings = self.postings[token] = list(postings)
+        if self._owned_tokens is not None:
+            self._owned_tokens.add(token)
+        return postings
+
+    def add(self, text: str) -> int:
+        """Index a document and return its doc id"""
+        doc_id = len(self.doc_lengths)
+        tokens = tokenize(text)
+        for token, tf in Counter(tokens).items():
+            self._writable_postings(token).append((doc_id, tf))
+            self.term_stats.pop(token, None)
+        self.doc_lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        return doc_id
+
+    def remove(self, doc_id: int, text: str) -> None:
+        """Remove a document previously added with the same text"""
+        if doc_id in self.deleted_ids:
+            return
+        for token in set(tokenize(text)):
+            postings = self.postings.get(token)
+            if postings is None:
+                continue
+            remaining = [posting for posting in postings if posting[0] != doc_id]
+            if remaining:
+                self.postings[token] = remaining
+                if self._owned_tokens is not None:
+                    self._owned_tokens.add(token)
+            else:
+                del self.postings[token]
+                self.term_stats.pop(token, None)
+        self.total_length -= self.doc_lengths[doc_id]
+        self.doc_lengths[doc_id] = 0
+        self.deleted_ids.add(doc_id)
+
+    def to_state(self) -> Dict:
+        """Plain-data form of the index for the on-disk snapshot"""
+        return {
+            'k1': self.k1,
+            'b': self.b,
+            'postings': self.postings,
+            'doc_lengths': self.doc_lengths,
+            'total_length': self.total_length,
+            'deleted_ids': self.deleted_ids,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "BM25Index":
+        index = cls(k1=state['k1'], b=state['b'])
+        index.postings = state['postings']
+        index.doc_lengths = state['doc_lengths']
+        index.total_length = state['total_length']
+        index.deleted_ids = state['deleted_ids']
+        return index
+
+    def _query_terms(self, query_tokens: List[str]) -> Tuple[List[Tuple[float, float, List[Tuple[int, int]]]], float]:
+        """(score upper bound, idf, postings) per query token present in the index, and the average length"""
+        doc_count = len(self)
+        if not doc_count:
+            return [], 1.0
+        avg_length = self.total_length / doc_count or 1.0
+        terms = []
+        for token in set(query_tokens):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            # The BM25 term weight grows with tf and shrinks with length, so this bounds every posting.
+            stats = self.term_stats.get(token)
+            if stats is None:
+                stats = self.term_stats[token] = (
+                    max(tf for _, tf in postings),
+                    min(self.doc_lengths[doc_id] for doc_id, _ in postings),
+                )
+            max_tf, min_length = stats
+            norm = self.k1 * (1 - self.b + self.b * min_length / avg_length)
+            terms.append((idf * max_tf * (self.k1 + 1) / (max_tf + norm), idf, postings))
+        return terms, avg_length
+
+    def _accumulate(
+        self,
+        scores: Dict[int, float],
+        postings: List[Tuple[int, int]],
+        idf: float,
+        avg_length: float,
+        candidates_only: bool = False,
+    ) -> None:
+        k1, b, doc_lengths = self.k1, self.b, self.doc_lengths
+        if not candidates_only:
+            for doc_id, tf in postings:
+                norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+            return
+        if len(scores) * max(1, len(postings).bit_length()) < len(postings):
+            # Few candidates, long list: look each one up (postings are sorted by doc id)
+            matches = []
+            for doc_id in scores:
+                position = bisect.bisect_left(postings, (doc_id,))
+                if position < len(postings) and postings[position][0] == doc_id:
+                    matches.append(postings[position])
+        else:
+            matches = [posting for posting in postings if posting[0] in scores]
+        for doc_id, tf in matches:
+            norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_length)
+            scores[doc_id] += idf * tf * (k1 + 1) / (tf + norm)
+
+    def score(self, query_tokens: List[str]) -> Dict[int, float]:
+        """BM25 scores for every document containing at least one query token"""
+        terms, avg_length = self._query_terms(query_tokens)
+        scores: Dict[int, float] = {}
+        for _, idf, postings in terms:
+            self._accumulate(scores, postings, idf, avg_length)
+        return scores
+
+    def top_k(self, query_tokens: List[str], k: int) -> List[Tuple[int, float]]:
+        """The k best (doc_id, score) pairs of score(), without scoring every posting.
+
+        MaxScore pruning: terms are visited by descending score upper bound. Once the k-th
+        best score so far is above what the unvisited terms could add up to, no unseen
+        document can reach the top k, so the rest (typically the frequent, low-idf terms with
+        the longest postings) only update documents still in contention, by binary search.
+        """
+        terms, avg_length = self._query_terms(query_tokens)
+        if k <= 0 or not terms:
+            return []
+        terms.sort(key=lambda term: term[0], reverse=True)
+        remaining = sum(bound for bound, _, _ in terms)
+        scores: Dict[int, float] = {}
+        threshold = 0.0
+        for bound, idf, postings in terms:
+            # The epsilon keeps float rounding in the bound sums from pruning a real match.
+            if len(scores) >= k and threshold > remaining + 1e-9:
+                scores = {doc_id: score for doc_id, score in scores.items() if score + remaining + 1e-9 >= threshold}
+                self._accumulate(scores, postings, idf, avg_length, candidates_only=True)
+            else:
+                self._accumulate(scores, postings, idf, avg_length)
+            remaining -= bound
+            if len(scores) >= k:
+                threshold = heapq.nlargest(k, scores.values())[-1]
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+class SearchCache:
+    """Bounded, thread-safe LRU cache of formatted search results with hit/miss counters"""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Tuple, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    """Unpickler for index snapshots: plain data only, no class or function lookups"""
+
+    def find_class(self, module: str, name: str) -> Any:
+        raise pickle.UnpicklingError(f"Knowledge base snapshots may not reference {module}.{name}")
+
+
+def _valid_snapshot(snapshot: Any) -> bool:
+    """Shape check before a snapshot replaces the live index"""
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        return False
+    expected = {
+        'knowledge_base_dir': str,
+        'files': dict,
+        'index': dict,
+        'indexed_chunks': list,
+        'chunk_ids_by_path': dict,
+    }
+    if any(not isinstance(snapshot.get(key), kind) for key, kind in expected.items()):
+        return False
+    index = snapshot['index']
+    if not all(key in index for key in ('k1', 'b', 'postings', 'doc_lengths', 'total_length', 'deleted_ids')):
+        return False
+    if len(index['doc_lengths']) != len(snapshot['indexed_chunks']):
+        return False
+    return all(
+        isinstance(entry, dict) and {'mtime_ns', 'size', 'sha256', 'document'} <= entry.keys()
+        for entry in snapshot['files'].values()
+    )
+
+
+class IndexView:
+    """Everything a search reads, swapped as one reference so searches see a consistent index"""
+
+    _generations = itertools.count(1)
+
+    def __init__(
+        self,
+        index: Optional[BM25Index] = None,
+        chunks: Optional[List[Optional[Dict]]] = None,
+        chunk_ids_by_path: Optional[Dict[str, List[int]]] = None,
+    ):
+        self.index = index if index is not None else BM25Index()
+        # Removed chunks are left as None so chunk ids stay aligned with the index
+        self.chunks: List[Optional[Dict]] = chunks if chunks is not None else []
+        self.chunk_ids_by_path: Dict[str, List[int]] = chunk_ids_by_path if chunk_ids_by_path is not None else {}
+        self.generation = next(self._generations)
+        # Dense vectors for "dense"/"hybrid" search, built on first use
+        self.vector_index = None
+        self.vector_lock = threading.Lock()
+
+    def derive(self) -> "IndexView":
+        """Copy-on-write clone to patch while searches keep using this view"""
+        return IndexView(
+            index=self.index.copy(),
+            chunks=list(self.chunks),
+            chunk_ids_by_path={path: list(ids) for path, ids in self.chunk_ids_by_path.items()},
+        )
+
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(
+        self,
+        snapshot_path: Optional[str] = None,
+        verbose: bool = True,
+        max_workers: Optional[int] = None,
+        search_cache_size: int = 256,
+        knowledge_base_dir: Optional[str] = None,
+    ):
+        self.verbose = verbose
+        self.max_workers = max_workers or min(16, (os.cpu_count() or 1) + 4)
+        # Per-file load timings from the last load: {'filename', 'type', 'seconds'}
+        self.load_timings: List[Dict] = []
         self.primary_kb = []
         self.secondary_kb = []
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    def load_markdown_files(self, directory_path: str) -> List[Dict]:
-        """Load all markdown files from a directory"""
-        documents = []
-        
+        # Holds the primary/ and secondary/ subdirectories
+        self.knowledge_base_dir = knowledge_base_dir or os.path.join(self.base_dir, "knowledge_base")
+        self._view = IndexView()
+        # Serializes load_all/refresh; searches never take it
+        self._write_lock = threading.RLock()
+        # Parsed/indexed knowledge base persisted between processes, one file per knowledge
+        # base directory so processors over different corpora never overwrite each other.
+        # Pass snapshot_path="" to disable persistence.
+        if snapshot_path is None:
+            kb_key = hashlib.sha256(os.path.abspath(self.knowledge_base_dir).encode('utf-8')).hexdigest()[:12]
+            snapshot_path = os.path.join(
+                os.path.dirname(self.base_dir), "data", f"knowledge_base_index-{kb_key}.pkl"
+            )
+        self.snapshot_path = snapshot_path
+        # file path -> {'mtime_ns', 'size', 'sha256', 'document'}
+        self._file_cache: Dict[str, Dict] = {}
+        self._cache_dirty = False
+        # Query results, keyed by index generation and cleared whenever the index changes
+        self.search_cache = SearchCache(maxsize=search_cache_size)
+
+    @property
+    def index(self) -> BM25Index:
+        return self._view.index
+
+    @property
+    def indexed_chunks(self) -> List[Optional[Dict]]:
+        return self._view.chunks
+
+    def _swap_view(self, view: IndexView) -> None:
+        self._view = view
+        self.search_cache.clear()
+
+    def _log(self, message: str) -> None:
+        """Progress output; errors are always printed"""
+        if self.verbose:
+            print(message)
+
+    def _parse_file(self, file_path: str, directory_path: str, filename: str) -> Dict:
+        """Return the parsed document for a file, reusing the cached parse when unchanged"""
+        stat = os.stat(file_path)
+        cached = self._file_cache.get(file_path)
+        if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+            return cached['document']
+
+        with open(file_path, 'rb') as file:
+            raw = file.read()
+        sha256 = hashlib.sha256(raw).hexdigest()
+        if cached and cached['sha256'] == sha256:
+            # Touched but not edited: keep the parse, remember the new mtime
+            cached['mtime_ns'] = stat.st_mtime_ns
+            self._cache_dirty = True
+            return cached['document']
+
+        content = raw.decode('utf-8')
+        document = {
+            'content': clean_markdown(content),
+            'filename': filename,
+            'path': file_path,
+            'type': 'primary' if 'primary' in directory_path else 'secondary',
+            'chunks': chunk_markdown(content),
+        }
+        self._file_cache[file_path] = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha256': sha256,
+            'document': document,
+        }
+        self._cache_dirty = True
+        return document
+
+    def _timed_parse(self, file_path: str, directory_path: str, filename: str) -> Tuple[Dict, float]:
+        started = time.perf_counter()
+        document = self._parse_file(file_path, directory_path, filename)
+        return document, time.perf_counter() - started
+
+    @staticmethod
+    def _markdown_paths(directory_path: str) -> Iterator[Tuple[str, str]]:
+        """(absolute path, path relative to directory_path) for every markdown file, recursively"""
+        for root, dirs, files in os.walk(directory_path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith('.md'):
+                    file_path = os.path.join(root, name)
+                    yield file_path, os.path.relpath(file_path, directory_path)
+
+    def _kb_directories(self) -> List[Tuple[str, str]]:
+        return [
+            (label, os.path.join(self.knowledge_base_dir, label.lower()))
+            for label in ("Primary", "Secondary")
+        ]
+
+    def iter_markdown_files(self, directory_path: str) -> Iterator[Dict]:
+        """Yield documents for every markdown file under a directory (recursively) as they finish.
+
+        Files are read and normalized on a thread pool. At most a few batches of files are in
+        flight at once, so huge directories are streamed rather than materialized up front.
+        """
         if not os.path.exists(directory_path):
             print(f"Directory not found: {directory_path}")
-            return documents
-            
-        for filename in os.listdir(directory_path):
-            if filename.endswith('.md'):
-                file_path = os.path.join(directory_path, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as file:
-                        content = file.read()
-                        
-                        # Simple markdown to text conversion
-                        text = re.sub(r'[#*_`\[\]]+', '', content)
-                        
-                        documents.append({
-                            'content': text,
-                            'filename': filename,
-                            'type': 'primary' if 'primary' in directory_path else 'secondary'
-                        })
-                    print(f"  Loaded: {filename}")
-                except Exception as e:
-                    print(f"  Error loading {filename}: {e}")
-        
-        return documents
-    
+            return
+
+        max_in_flight = self.max_workers * 4
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending: Dict[concurrent.futures.Future, str] = {}
+            paths = self._markdown_paths(directory_path)
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_in_flight:
+                    try:
+                        file_path, filename = next(paths)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    future = executor.submit(self._timed_parse, file_path, directory_path, filename)
+                    pending[future] = filename
+                if not pending:
+                    break
+
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    filename = pending.pop(future)
+                    try:
+                        document, seconds = future.result()
+                    except Exception as e:
+                        print(f"  Error loading {filename}: {e}")
+                        continue
+                    self.load_timings.append({'filename': filename, 'type': document['type'], 'seconds': seconds})
+                    self._log(f"  Loaded: {filename} ({seconds * 1000:.1f} ms)")
+                    yield document
+
+    def load_markdown_files(self, directory_path: str) -> List[Dict]:
+        """Load all markdown files under a directory, including subdirectories"""
+        return list(self.iter_markdown_files(directory_path))
+
+    def _load_snapshot(self) -> Optional[Dict]:
+        """Read the snapshot written by _save_snapshot, or None if missing, stale or malformed.
+
+        The file is a pickle, but it only ever holds builtin containers and scalars, so it is
+        read with _SnapshotUnpickler, which refuses to import any class or function: a
+        tampered file can fail to load but cannot run code.
+        """
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path, 'rb') as file:
+                snapshot = _SnapshotUnpickler(file).load()
+        except Exception as e:
+            print(f"Ignoring unreadable knowledge base snapshot: {e}")
+            return None
+        if not _valid_snapshot(snapshot):
+            return None
+        if snapshot['knowledge_base_dir'] != os.path.abspath(self.knowledge_base_dir):
+            return None
+        return snapshot
+
+    def _save_snapshot(self) -> None:
+        if not self.snapshot_path:
+            return
+        view = self._view
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'knowledge_base_dir': os.path.abspath(self.knowledge_base_dir),
+            'files': self._file_cache,
+            'index': view.index.to_state(),
+            'indexed_chunks': view.chunks,
+            'chunk_ids_by_path': view.chunk_ids_by_path,
+        }
+        snapshot_dir = os.path.dirname(self.snapshot_path)
+        try:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            # Write-then-rename so concurrent processes never read a partial snapshot
+            fd, tmp_path = tempfile.mkstemp(dir=snapshot_dir, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            print(f"Could not save knowledge base snapshot: {e}")
+
     def load_all(self):
-        """Load both primary and secondary knowledge bases"""
-        print("Loading Primary Knowledge Base...")
-        self.primary_kb = self.load_markdown_files(
-            os.path.join(self.base_dir, "knowledge_base", "primary")
-        )
-        
-        print("Loading Secondary Knowledge Base...")
-        self.secondary_kb = self.load_markdown_files(
-            os.path.join(self.base_dir, "knowledge_base", "secondary")
+        """Load both primary and secondary knowledge bases.
+
+        With a snapshot, its index is reused as is and only the files added, edited or
+        deleted since it was written are re-indexed (see refresh), so start-up cost tracks
+        the size of the change rather than the corpus. Without one, documents are parsed on
+        a thread pool and streamed into a fresh index.
+
+        A warm start is not free: the whole snapshot is unpickled up front (postings and
+        chunks for every file) and every markdown file is still stat'ed to find changes.
+        Nothing is re-tokenized for unchanged files, though.
+        """
+        with self._write_lock:
+            snapshot = self._load_snapshot()
+            self._cache_dirty = False
+            self.load_timings = []
+            if snapshot is not None:
+                self._file_cache = snapshot['files']
+                self._swap_view(IndexView(
+                    index=BM25Index.from_state(snapshot['index']),
+                    chunks=snapshot['indexed_chunks'],
+                    chunk_ids_by_path=snapshot['chunk_ids_by_path'],
+                ))
+                self.refresh()
+                self._log(f"Loaded {len(self.primary_kb)} primary and {len(self.secondary_kb)} secondary documents")
+                return self.primary_kb, self.secondary_kb
+
+            self._file_cache = {}
+            view = IndexView()
+            self.primary_kb = []
+            self.secondary_kb = []
+            for (label, directory_path), kb in zip(self._kb_directories(), (self.primary_kb, self.secondary_kb)):
+                self._log(f"Loading {label} Knowledge Base...")
+                for doc in self.iter_markdown_files(directory_path):
+                    kb.append(doc)
+                    self._index_document(doc, view)
+
+            self._log(f"Loaded {len(self.primary_kb)} primary and {len(self.secondary_kb)} secondary documents")
+            self._swap_view(view)
+            self._save_snapshot()
+            self._cache_dirty = False
+            return self.primary_kb, self.secondary_kb
+
+    def refresh(self) -> Dict[str, List[str]]:
+        """Re-index only the markdown files added, changed or deleted since the last load.
+
+        Unchanged files are only stat'ed. The patched index is built on a copy-on-write clone
+        and swapped in as one reference, so in-flight searches keep a consistent view.
+        Returns the affected file paths by kind.
+        """
+        with self._write_lock:
+            previous = {path: entry['document'] for path, entry in self._file_cache.items()}
+            current: Dict[str, Dict] = {}
+            kbs: Tuple[List[Dict], List[Dict]] = ([], [])
+            for (_, directory_path), kb in zip(self._kb_directories(), kbs):
+                if not os.path.exists(directory_path):
+                    continue
+                for file_path, filename in self._markdown_paths(directory_path):
+                    try:
+                        doc = self._parse_file(file_path, directory_path, filename)
+                    except Exception as e:
+                        print(f"  Error loading {filename}: {e}")
+                        doc = previous.get(file_path)
+                        if doc is None:
+                            continue
+                    current[file_path] = doc
+                    kb.append(doc)
+
+            changes = {
+                'added': [path for path in current if path not in previous],
+                'changed': [path for path in current if path in previous and current[path] is not previous[path]],
+                'removed': [path for path in previous if path not in current],
+            }
+            for path in changes['removed']:
+                self._file_cache.pop(path, None)
+            self.primary_kb, self.secondary_kb = kbs
+
+            if not any(changes.values()):
+                if self._cache_dirty:
+                    self._save_snapshot()
+                    self._cache_dirty = False
+                return changes
+
+            view = self._view.derive()
+            for path in changes['changed'] + changes['removed']:
+                for chunk_id in view.chunk_ids_by_path.pop(path, []):
+                    view.index.remove(chunk_id, self._chunk_text(view.chunks[chunk_id]))
+                    view.chunks[chunk_id] = None
+            for path in changes['added'] + changes['changed']:
+                self._index_document(current[path], view)
+
+            if len(view.index.deleted_ids) > MAX_TOMBSTONE_RATIO * len(view.chunks):
+                self.build_index()
+            else:
+                self._swap_view(view)
+            self._save_snapshot()
+            self._cache_dirty = False
+            self._log(
+                f"Knowledge base refreshed: {len(changes['added'])} added, "
+                f"{len(changes['changed'])} changed, {len(changes['removed'])} removed"
+            )
+            return changes
+
+    def build_index(self) -> None:
+        """Build the BM25 inverted index over the chunks of the loaded documents"""
+        view = IndexView()
+        for doc in self.primary_kb + self.secondary_kb:
+            self._index_document(doc, view)
+        self._swap_view(view)
+
+    @staticmethod
+    def _chunk_text(chunk: Dict) -> str:
+        # Index the heading trail too so section titles count towards relevance
+        return f"{chunk['section']}\n{chunk['content']}"
+
+    def _get_vector_index(self, view: IndexView):
+        vector_index = view.vector_index
+        if vector_index is not None:
+            return vector_index
+        with view.vector_lock:
+            if view.vector_index is None:
+                # Imported lazily so lexical search does not require numpy
+                try:
+                    from vector_index import VectorIndex
+                except ImportError:
+                    from src.vector_index import VectorIndex
+                view.vector_index = VectorIndex().build(
+                    [tokenize(self._chunk_text(chunk)) if chunk else [] for chunk in view.chunks]
+                )
+            return view.vector_index
+
+    def build_vector_index(self):
+        """Build (or return) the dense vectors for the current index ahead of the first dense query"""
+        return self._get_vector_index(self._view)
+
+    def _index_document(self, doc: Dict, view: IndexView) -> None:
+        chunk_ids = view.chunk_ids_by_path.setdefault(doc.get('path', doc['filename']), [])
+        for chunk in doc['chunks']:
+            chunk_ids.append(view.index.add(self._chunk_text(chunk)))
+            view.chunks.append({
+                **chunk,
+                'filename': doc['filename'],
+                'type': doc['type'],
+            })
+
+    def rank(
+        self,
+        query_words: List[str],
+        top_k: int,
+        mode: str = "lexical",
+        hybrid_weight: float = 0.5,
+        view: Optional[IndexView] = None,
+    ) -> List[Tuple[int, float]]:
+        """Top (chunk_id, score) pairs for the query.
+
+        lexical: BM25 over the inverted index.
+        dense: cosine similarity of hashed TF-IDF/SVD vectors (one matrix-vector product).
+        hybrid: hybrid_weight * dense + (1 - hybrid_weight) * max-normalized BM25.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode '{mode}'. Use one of: {', '.join(SEARCH_MODES)}")
+
+        view = view or self._view
+        if mode == "lexical":
+            return view.index.top_k(query_words, top_k)
+
+        lexical = view.index.score(query_words) if mode == "hybrid" else None
+        return self._get_vector_index(view).rank(
+            query_words,
+            top_k,
+            lexical_scores=lexical,
+            dense_weight=hybrid_weight if mode == "hybrid" else 1.0,
         )
-        
-        print(f"Loaded {len(self.primary_kb)} primary and {len(self.secondary_kb)} secondary documents")
-        return self.primary_kb, self.secondary_kb
-    
-    def search(self, query: str, top_k: int = 3) -> str:
-        """Simple keyword search - returns formatted context for prompts"""
-        query_words = set(query.lower().split())
-        results = []
-        
-        # Search through all documents
-        all_docs = self.primary_kb + self.secondary_kb
-        
-        for doc in all_docs:
-            # Calculate simple relevance score
-            content_lower = doc['content'].lower()
-            score = 0
-            for word in query_words:
-                if len(word) > 3:  # Ignore short words
-                    score += content_lower.count(word)
-            
-            if score > 0:
-                results.append((score, doc))
-        
-        # Sort by relevance only (avoid comparing dict payloads on score ties)
-        results.sort(key=lambda item: item[0], reverse=True)
-        
+
+    def search(self, query: str, top_k: int = 3, mode: str = "lexical", hybrid_weight: float = 0.5) -> str:
+        """Search over section chunks - returns formatted context for prompts.
+
+        mode selects the ranking: "lexical" (BM25), "dense" (local vectors) or "hybrid".
+        """
+        query_words = [word for word in tokenize(query) if len(word) > 3]  # Ignore short words
+        view = self._view
+        # Word order and repeats do not change the ranking, so they share a cache entry
+        cache_key = (view.generation, tuple(sorted(set(query_words))), top_k, mode, hybrid_weight)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        results = self.rank(query_words, top_k, mode=mode, hybrid_weight=hybrid_weight, view=view)
+        context = self._format_context(results, view)
+        self.search_cache.put(cache_key, context)
+        return context
+
+    def _format_chunk(self, chunk: Dict) -> str:
+        source = "🏢 COMPANY" if chunk['type'] == 'primary' else "📊 INDUSTRY"
+        section = f" ({chunk['section']})" if chunk['section'] else ""
+        return f"{source} - {chunk['filename']}{section}:\n{chunk['content']}\n\n"
+
+    def _format_context(self, results: List[Tuple[int, float]], view: IndexView) -> str:
         # Format context for prompt
         if not results:
-            return "No specific context found. Use general knowledge."
-        
-        context = "## RELEVANT INFORMATION FROM KNOWLEDGE BASES:\n\n"
-        for score, doc in results[:top_k]:
-            source = "🏢 COMPANY" if doc['type'] == 'primary' else "📊 INDUSTRY"
-            context += f"{source} - {doc['filename']}:\n"
-            context += f"{doc['content'][:300]}...\n\n"
-        
+            return NO_CONTEXT_MESSAGE
+
+        context = CONTEXT_HEADER
+        for chunk_id, score in results:
+            context += self._format_chunk(view.chunks[chunk_id])
+
         return context
+
+    def build_context(
+        self,
+        query: str,
+        token_budget: int,
+        mode: str = "lexical",
+        hybrid_weight: float = 0.5,
+        max_candidates: int = 30,
+    ) -> Tuple[str, Dict]:
+        """Pack the most relevant chunks into a prompt context of at most token_budget tokens.
+
+        Candidates are taken greedily by relevance per token, chunks whose text largely
+        overlaps an already packed chunk (copied or re-chunked passages) are skipped, and
+        the packed chunks are emitted in relevance order. stats["tokens_used"] never
+        exceeds token_budget; when nothing fits the context is NO_CONTEXT_MESSAGE if that
+        fits, else empty. Returns (context, stats).
+        """
+        query_words = [word for word in tokenize(query) if len(word) > 3]  # Ignore short words
+        view = self._view
+        cache_key = (
+            view.generation, "packed", tuple(sorted(set(query_words))), token_budget, mode, hybrid_weight, max_candidates
+        )
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            context, stats = cached
+            return context, dict(stats)
+
+        results = self.rank(query_words, max_candidates, mode=mode, hybrid_weight=hybrid_weight, view=view)
+        tokens_used = estimate_tokens(CONTEXT_HEADER)
+        candidates = []
+        for chunk_id, score in results:
+            block = self._format_chunk(view.chunks[chunk_id])
+            block_tokens = estimate_tokens(block)
+            candidates.append((score / block_tokens, score, chunk_id, block, block_tokens))
+        candidates.sort(key=lambda item: item[0], reverse=True)
+
+        selected: List[Tuple[float, int, str]] = []
+        packed_shingles: set = set()
+        duplicates_skipped = 0
+        for _, score, chunk_id, block, block_tokens in candidates:
+            if tokens_used + block_tokens > token_budget:
+                continue
+            chunk_shingles = shingles(view.chunks[chunk_id]['content'])
+            if chunk_shingles and len(chunk_shingles & packed_shingles) / len(chunk_shingles) > DUPLICATE_OVERLAP:
+                duplicates_skipped += 1
+                continue
+            packed_shingles |= chunk_shingles
+            selected.append((score, chunk_id, block))
+            tokens_used += block_tokens
+
+        if selected:
+            selected.sort(key=lambda item: item[0], reverse=True)
+            context = CONTEXT_HEADER + "".join(block for _, _, block in selected)
+        elif estimate_tokens(NO_CONTEXT_MESSAGE) <= token_budget:
+            context = NO_CONTEXT_MESSAGE
+            tokens_used = estimate_tokens(context)
+        else:
+            context = ""
+            tokens_used = 0
+
+        stats = {
+            'token_budget': token_budget,
+            'tokens_used': tokens_used,
+            'chunks_considered': len(results),
+            'chunks_used': len(selected),
+            'duplicates_skipped': duplicates_skipped,
+            'mode': mode,
+        }
+        self.search_cache.put(cache_key, (context, stats))
+        return context, dict(stats)
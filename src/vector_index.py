@@ -0,0 +1,132 @@
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_N_FEATURES = 2 ** 13
+DEFAULT_SVD_COMPONENTS = 128
+SVD_SAMPLE_SIZE = 4096
+ENCODE_BATCH_SIZE = 1024
+
+
+def _feature_ids(tokens: List[str], n_features: int) -> List[int]:
+    """Stable hashed feature ids for tokens plus their 5-char prefixes (cheap stemming)"""
+    ids = []
+    for token in tokens:
+        ids.append(zlib.crc32(token.encode('utf-8')) % n_features)
+        if len(token) > 5:
+            ids.append(zlib.crc32(b'~' + token[:5].encode('utf-8')) % n_features)
+    return ids
+
+
+def _randomized_svd(matrix: np.ndarray, n_components: int, n_iter: int = 4, seed: int = 0) -> np.ndarray:
+    """Top right-singular vectors of matrix (Halko et al. randomized range finder)"""
+    rng = np.random.default_rng(seed)
+    n_oversample = min(matrix.shape[1], n_components + 10)
+    basis = matrix @ rng.standard_normal((matrix.shape[1], n_oversample), dtype=np.float32)
+    for _ in range(n_iter):
+        basis, _ = np.linalg.qr(basis)
+        basis, _ = np.linalg.qr(matrix.T @ basis)
+        basis = matrix @ basis
+    basis, _ = np.linalg.qr(basis)
+    _, _, vt = np.linalg.svd(basis.T @ matrix, full_matrices=False)
+    return vt[:n_components].T.astype(np.float32)
+
+
+class VectorIndex:
+    """
+    Offline dense retrieval over hashed TF-IDF vectors, optionally reduced with SVD (LSA).
+
+    Rows are L2-normalized, so a query is scored against every chunk with a single
+    matrix-vector product that yields cosine similarities.
+    """
+
+    def __init__(self, n_features: int = DEFAULT_N_FEATURES, n_components: Optional[int] = DEFAULT_SVD_COMPONENTS):
+        self.n_features = n_features
+        self.n_components = n_components
+        self.idf = np.ones(n_features, dtype=np.float32)
+        self.projection: Optional[np.ndarray] = None
+        self.matrix = np.zeros((0, n_features), dtype=np.float32)
+
+    def _term_frequencies(self, tokens: List[str]) -> np.ndarray:
+        vector = np.zeros(self.n_features, dtype=np.float32)
+        ids = _feature_ids(tokens, self.n_features)
+        if ids:
+            np.add.at(vector, ids, 1.0)
+            np.log1p(vector, out=vector)  # Sublinear tf so long chunks do not dominate
+        return vector
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _weighted_rows(self, tokenized_texts: List[List[str]]) -> np.ndarray:
+        rows = np.zeros((len(tokenized_texts), self.n_features), dtype=np.float32)
+        for row, tokens in enumerate(tokenized_texts):
+            rows[row] = self._term_frequencies(tokens)
+        return self._normalize(rows * self.idf)
+
+    def build(self, tokenized_texts: List[List[str]]) -> "VectorIndex":
+        """Fit idf (and the SVD projection) and encode every text, in bounded-memory batches"""
+        doc_freq = np.zeros(self.n_features, dtype=np.float32)
+        for tokens in tokenized_texts:
+            doc_freq[np.unique(np.asarray(_feature_ids(tokens, self.n_features), dtype=np.int64))] += 1
+        self.idf = (np.log((1 + len(tokenized_texts)) / (1 + doc_freq)) + 1.0).astype(np.float32)
+
+        self.projection = None
+        if self.n_components and 0 < self.n_components < min(len(tokenized_texts), self.n_features):
+            # Fit the projection on a sample; the full hashed matrix would not fit in memory at scale
+            rng = np.random.default_rng(0)
+            sample_size = min(len(tokenized_texts), SVD_SAMPLE_SIZE)
+            sample_rows = rng.choice(len(tokenized_texts), size=sample_size, replace=False)
+            sample = self._weighted_rows([tokenized_texts[row] for row in sample_rows])
+            self.projection = _randomized_svd(sample, self.n_components)
+
+        width = self.projection.shape[1] if self.projection is not None else self.n_features
+        self.matrix = np.zeros((len(tokenized_texts), width), dtype=np.float32)
+        for start in range(0, len(tokenized_texts), ENCODE_BATCH_SIZE):
+            batch = self._weighted_rows(tokenized_texts[start:start + ENCODE_BATCH_SIZE])
+            if self.projection is not None:
+                batch = self._normalize(batch @ self.projection)
+            self.matrix[start:start + len(batch)] = batch
+        return self
+
+    def encode_query(self, tokens: List[str]) -> np.ndarray:
+        vector = self._normalize(self._term_frequencies(tokens) * self.idf)
+        if self.projection is not None:
+            vector = self._normalize(vector @ self.projection)
+        return vector
+
+    def score(self, tokens: List[str]) -> np.ndarray:
+        """Cosine similarity of the query against every row"""
+        if not len(self.matrix):
+            return np.zeros(0, dtype=np.float32)
+        return self.matrix @ self.encode_query(tokens)
+
+    def rank(
+        self,
+        tokens: List[str],
+        top_k: int,
+        lexical_scores: Optional[Dict[int, float]] = None,
+        dense_weight: float = 1.0,
+    ) -> List[Tuple[int, float]]:
+        """Top (row, score) pairs, optionally fused with max-normalized lexical scores"""
+        scores = self.score(tokens) * dense_weight
+        if lexical_scores:
+            rows = np.fromiter(lexical_scores.keys(), dtype=np.int64, count=len(lexical_scores))
+            values = np.fromiter(lexical_scores.values(), dtype=np.float32, count=len(lexical_scores))
+            scores[rows] += (1 - dense_weight) * values / values.max()
+
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return []
+        candidates = np.argpartition(scores, -top_k)[-top_k:]
+        candidates = candidates[np.argsort(scores[candidates])[::-1]]
+        return [(int(row), float(scores[row])) for row in candidates if scores[row] > 0]
+
+    @property
+    def nbytes(self) -> int:
+        projection_bytes = self.projection.nbytes if self.projection is not None else 0
+        return self.matrix.nbytes + self.idf.nbytes + projection_bytes
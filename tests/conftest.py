@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Tests import the packages the same way the scripts do: from the project root.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.stub_server import StubServer  # noqa: E402
+
+
+@pytest.fixture
+def stub_server():
+    """Local OpenAI/Cohere stand-in with near-zero latency; see benchmarks/stub_server.py."""
+    server = StubServer({"latency_ms": 2, "latency_jitter_ms": 0, "image_latency_ms": 2}).start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+
+
+@pytest.fixture
+def stub_config(stub_server):
+    return {
+        "api_key": "stub",
+        "cohere_api_key": "stub",
+        "base_url": stub_server.openai_base_url,
+        "cohere_base_url": stub_server.cohere_base_url,
+        "retry_backoff_seconds": 0.01,
+    }
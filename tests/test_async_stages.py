@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import pytest
+
+from generation.brand_checker import acheck_brand_consistency
+from generation.generate_post import agenerate_post
+from generation.knowledge_base import doc_processor
+from generation.refiner import arefine_post
+
+RETRIEVAL_SECONDS = 0.2
+DRAFT = "Most SMEs buy warehouse robots before they map their picking routes."
+
+
+@pytest.fixture
+def slow_retrieval(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    threads: List[str] = []
+
+    def fake_retrieve_context(query: str, config: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        threads.append(threading.current_thread().name)
+        time.sleep(RETRIEVAL_SECONDS)
+        return "Stub context.", {"tokens_used": 3, "mode": "lexical"}
+
+    monkeypatch.setattr(doc_processor, "retrieve_context", fake_retrieve_context)
+    return threads
+
+
+def _ticks_while(stage: Callable[[], Awaitable[Any]]) -> Tuple[Any, int]:
+    async def run() -> Tuple[Any, int]:
+        ticks = 0
+        done = False
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while not done:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.create_task(ticker())
+        try:
+            return await stage(), ticks
+        finally:
+            done = True
+            await ticking
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize(
+    "stage",
+    [
+        lambda config: agenerate_post("Warehouse automation", "Educational", "Book discovery calls", config),
+        lambda config: arefine_post(DRAFT, "Warehouse automation", "Educational", "Book discovery calls", config),
+        lambda config: acheck_brand_consistency(DRAFT, config),
+    ],
+    ids=["agenerate_post", "arefine_post", "acheck_brand_consistency"],
+)
+def test_async_stages_retrieve_off_the_event_loop(
+    stub_config: Dict[str, Any], slow_retrieval: List[str], stage: Callable[[Dict[str, Any]], Awaitable[Any]]
+) -> None:
+    (_, metadata), ticks = _ticks_while(lambda: stage(dict(stub_config)))
+
+    assert metadata["rag"]["tokens_used"] == 3
+    assert slow_retrieval and threading.main_thread().name not in slow_retrieval
+    # A blocking retrieval would freeze the ticker for the whole sleep.
+    assert ticks >= RETRIEVAL_SECONDS / 0.01 / 2
@@ -0,0 +1,95 @@
+import heapq
+import random
+from typing import List
+
+import pytest
+
+from src.document_processor import BM25Index
+
+VOCABULARY = [f"term{index}" for index in range(120)]
+WEIGHTS = [1.0 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+def _random_text(rng: random.Random) -> str:
+    return " ".join(rng.choices(VOCABULARY, WEIGHTS, k=rng.randint(1, 50)))
+
+
+def _exhaustive_top_k(index: BM25Index, query: List[str], k: int) -> List[float]:
+    return [round(score, 9) for _, score in heapq.nlargest(k, index.score(query).items(), key=lambda item: item[1])]
+
+
+def test_ranks_by_term_frequency_and_rarity() -> None:
+    index = BM25Index()
+    index.add("forklift safety training for warehouse teams")
+    index.add("forklift forklift forklift fleet maintenance")
+    index.add("warehouse layout warehouse picking warehouse slotting")
+    index.add("robotics pilots in a warehouse")
+
+    assert [doc_id for doc_id, _ in index.top_k(["forklift"], 2)] == [1, 0]
+    # "robotics" is rare, so it outweighs the common "warehouse".
+    assert index.top_k(["robotics", "warehouse"], 1)[0][0] == 3
+    assert index.top_k(["unknown"], 3) == []
+    assert index.top_k(["forklift"], 0) == []
+
+
+def test_removed_documents_are_never_returned() -> None:
+    index = BM25Index()
+    texts = ["forklift fleet", "forklift training", "warehouse robots"]
+    for text in texts:
+        index.add(text)
+    index.remove(0, texts[0])
+    index.remove(0, texts[0])  # removing twice is a no-op
+
+    assert len(index) == 2
+    assert 0 in index.deleted_ids
+    assert [doc_id for doc_id, _ in index.top_k(["forklift", "fleet"], 5)] == [1]
+    assert "fleet" not in index.postings
+
+
+def test_pruned_top_k_matches_exhaustive_scoring_with_tombstones() -> None:
+    rng = random.Random(11)
+    for _ in range(10):
+        index = BM25Index()
+        texts = []
+        for _ in range(rng.randint(20, 300)):
+            texts.append(_random_text(rng))
+            index.add(texts[-1])
+        for doc_id in rng.sample(range(len(texts)), len(texts) // 4):
+            index.remove(doc_id, texts[doc_id])
+        # Documents added after the first queries must refresh the cached term bounds.
+        for round_number in range(2):
+            for _ in range(25):
+                query = rng.choices(VOCABULARY, WEIGHTS, k=rng.randint(1, 6))
+                k = rng.randint(1, 10)
+                pruned = index.top_k(query, k)
+                assert [round(score, 9) for _, score in pruned] == _exhaustive_top_k(index, query, k)
+                assert all(doc_id not in index.deleted_ids for doc_id, _ in pruned)
+            heavy = " ".join(["term60"] * 40)
+            texts.append(heavy)
+            index.add(heavy)
+
+
+def test_copy_on_write_clone_leaves_the_original_untouched() -> None:
+    index = BM25Index()
+    index.add("forklift fleet maintenance")
+    before = index.score(["forklift", "fleet"])
+
+    clone = index.copy()
+    clone.add("forklift forklift forklift")
+    clone.remove(0, "forklift fleet maintenance")
+
+    assert index.score(["forklift", "fleet"]) == before
+    assert len(index) == 1
+    assert [doc_id for doc_id, _ in clone.top_k(["forklift"], 5)] == [1]
+
+
+def test_state_round_trip_keeps_scores() -> None:
+    index = BM25Index(k1=1.2, b=0.6)
+    for text in ("forklift fleet", "warehouse forklift", "robot arms"):
+        index.add(text)
+    index.remove(2, "robot arms")
+
+    restored = BM25Index.from_state(index.to_state())
+    assert restored.k1 == 1.2 and restored.b == 0.6
+    assert restored.score(["forklift", "robot"]) == pytest.approx(index.score(["forklift", "robot"]))
+    assert len(restored) == 2
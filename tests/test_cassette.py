@@ -0,0 +1,143 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from openai import AsyncOpenAI, OpenAI
+
+from generation.cassette import Cassette, CassetteMissError, get_cassette
+from generation.llm_client import generate_completion
+
+CHAT_PATH = "/v1/chat/completions"
+
+
+def _messages(topic: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": "You write one-line LinkedIn hooks."},
+        {"role": "user", "content": f"Hook about {topic}."},
+    ]
+
+
+def _request(topic: str, **extra: Any) -> Dict[str, Any]:
+    return dict(model="gpt-4o-mini", messages=_messages(topic), **extra)
+
+
+def _write_cassette(path: Path, entries: List[Dict[str, Any]]) -> None:
+    recorder = Cassette(str(path), mode="record")
+    for entry in entries:
+        recorder._append(entry["kind"], entry["request"], entry["response"], entry["latency_seconds"])
+
+
+def _chat_response(content: str) -> Dict[str, Any]:
+    return {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]}
+
+
+def test_record_then_replay_offline(stub_server: Any, stub_config: Dict[str, Any], tmp_path: Path) -> None:
+    path = str(tmp_path / "cassette.jsonl")
+    recorded = generate_completion(_messages("forklifts"), dict(stub_config, cassette_mode="record", cassette_path=path))
+    assert not recorded.get("error")
+    upstream = stub_server.stats()["requests"][CHAT_PATH]
+
+    replay_config = dict(stub_config, cassette_mode="replay", cassette_path=path, api_key="")
+    replayed = generate_completion(_messages("forklifts"), replay_config)
+    assert replayed["content"] == recorded["content"]
+    assert stub_server.stats()["requests"][CHAT_PATH] == upstream
+
+    missed = generate_completion(_messages("cranes"), dict(replay_config, retries=3))
+    assert "No recorded" in missed["error"]
+    assert get_cassette(replay_config).stats()["misses"] == 1
+
+
+def test_exact_is_the_default_and_loose_matches_the_call_shape(tmp_path: Path) -> None:
+    path = tmp_path / "cassette.jsonl"
+    _write_cassette(
+        path,
+        [{"kind": "openai.chat", "request": _request("forklifts"), "response": _chat_response("A"), "latency_seconds": 0.1}],
+    )
+    exact = Cassette(str(path))
+    assert exact.match == "exact"
+    with pytest.raises(CassetteMissError):
+        exact.call("openai.chat", _request("cranes"), lambda: None)
+
+    loose = Cassette(str(path), match="loose")
+    assert loose.call("openai.chat", _request("cranes"), lambda: None).choices[0].message.content == "A"
+    with pytest.raises(CassetteMissError):
+        # A different model is a different call shape.
+        loose.call("openai.chat", dict(_request("cranes"), model="gpt-4o"), lambda: None)
+
+    assert get_cassette({"cassette_mode": "replay", "cassette_path": str(path)}).match == "exact"
+
+
+def test_repeated_requests_replay_in_order(tmp_path: Path) -> None:
+    path = tmp_path / "cassette.jsonl"
+    _write_cassette(
+        path,
+        [
+            {"kind": "openai.chat", "request": _request("forklifts"), "response": _chat_response(text), "latency_seconds": 0.0}
+            for text in ("first", "second")
+        ],
+    )
+    cassette = Cassette(str(path))
+    replies = [cassette.call("openai.chat", _request("forklifts"), lambda: None).choices[0].message.content for _ in range(3)]
+    assert replies == ["first", "second", "first"]
+
+
+def test_latency_modes(tmp_path: Path) -> None:
+    path = tmp_path / "cassette.jsonl"
+    _write_cassette(
+        path,
+        [{"kind": "openai.chat", "request": _request("forklifts"), "response": _chat_response("A"), "latency_seconds": 0.2}],
+    )
+    entry = json.loads(path.read_text().splitlines()[0])
+
+    assert Cassette(str(path), latency="none")._replay_latency(entry) == 0.0
+    assert Cassette(str(path), latency="recorded", latency_scale=0.5)._replay_latency(entry) == pytest.approx(0.1)
+    assert Cassette(str(path), latency="sampled")._replay_latency(entry) == pytest.approx(0.2)
+    first = Cassette(str(path), latency="synthetic", seed=3)
+    second = Cassette(str(path), latency="synthetic", seed=3)
+    assert [first._replay_latency(entry) for _ in range(5)] == [second._replay_latency(entry) for _ in range(5)]
+
+    started = time.perf_counter()
+    Cassette(str(path), latency="recorded").call("openai.chat", _request("forklifts"), lambda: None)
+    assert time.perf_counter() - started >= 0.2
+
+
+def test_replay_requires_an_existing_cassette(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError):
+        Cassette(str(tmp_path / "missing.jsonl"))
+    with pytest.raises(ValueError):
+        Cassette(str(tmp_path / "missing.jsonl"), mode="record", match="fuzzy")
+
+
+def test_streams_record_and_replay_sync_and_async(stub_server: Any, tmp_path: Path) -> None:
+    path = str(tmp_path / "cassette.jsonl")
+    request = _request("forklifts", stream=True)
+
+    async def record_async() -> List[str]:
+        client = Cassette(path, mode="record").async_openai_client(
+            AsyncOpenAI(api_key="stub", base_url=stub_server.openai_base_url)
+        )
+        stream = await client.chat.completions.create(**request)
+        return [chunk.choices[0].delta.content or "" async for chunk in stream if chunk.choices]
+
+    async def replay_async() -> List[str]:
+        stream = await Cassette(path).async_openai_client().chat.completions.create(**request)
+        return [chunk.choices[0].delta.content or "" async for chunk in stream if chunk.choices]
+
+    recorded = asyncio.run(record_async())
+    assert "".join(recorded)
+    upstream = stub_server.stats()["requests"][CHAT_PATH]
+
+    assert asyncio.run(replay_async()) == recorded
+    # Streams recorded by the async client replay through the sync one too.
+    sync_stream = Cassette(path).openai_client().chat.completions.create(**request)
+    assert [chunk.choices[0].delta.content or "" for chunk in sync_stream if chunk.choices] == recorded
+    assert stub_server.stats()["requests"][CHAT_PATH] == upstream
+
+    sync_recorder = Cassette(str(tmp_path / "sync.jsonl"), mode="record")
+    live = sync_recorder.openai_client(OpenAI(api_key="stub", base_url=stub_server.openai_base_url))
+    sync_recorded = [chunk.choices[0].delta.content or "" for chunk in live.chat.completions.create(**request) if chunk.choices]
+    assert sync_recorder.stats()["recorded"] == 1
+    assert "".join(sync_recorded)
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import uuid
+from typing import Any, Dict, List
+
+import pytest
+
+from generation.llm_client import agenerate_completion, coalescing_stats, generate_completion
+from generation.metrics import llm_coalesced_requests_total, llm_coalescing_in_flight, render_prometheus
+
+CHAT_PATH = "/v1/chat/completions"
+
+
+def _metric(metric: Any, **labels: str) -> float:
+    for sample in metric.snapshot():
+        if sample["labels"] == labels:
+            return sample["value"]
+    return 0.0
+
+
+def _upstream_calls(stub_server: Any) -> int:
+    return stub_server.stats()["requests"].get(CHAT_PATH, 0)
+
+
+@pytest.fixture
+def slow_stub(stub_server: Any) -> Any:
+    # Long enough that every concurrent caller joins before the leader's response lands.
+    stub_server.state.config["latency_ms"] = 300
+    return stub_server
+
+
+@pytest.fixture
+def config(slow_stub: Any, stub_config: Dict[str, Any]) -> Dict[str, Any]:
+    # A model name of its own keeps the metric series of each test separate.
+    return dict(stub_config, model=f"coalesce-{uuid.uuid4().hex[:8]}")
+
+
+def _messages() -> List[Dict[str, str]]:
+    return [{"role": "user", "content": "Summarize warehouse robotics adoption in one line."}]
+
+
+def _run_threads(configs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = [{}] * len(configs)
+    barrier = threading.Barrier(len(configs))
+
+    def worker(index: int) -> None:
+        barrier.wait()
+        results[index] = generate_completion(_messages(), configs[index])
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(len(configs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_identical_concurrent_requests_share_one_upstream_call(slow_stub: Any, config: Dict[str, Any]) -> None:
+    results = _run_threads([dict(config) for _ in range(6)])
+
+    assert _upstream_calls(slow_stub) == 1
+    assert len({result["content"] for result in results}) == 1
+    shared = [result for result in results if result["coalesced"]["shared"]]
+    assert len(shared) == 5
+    assert all(result["estimated_cost_usd"] == 0.0 for result in shared)
+
+    model = config["model"]
+    assert _metric(llm_coalesced_requests_total, model=model, role="leader") == 1
+    assert _metric(llm_coalesced_requests_total, model=model, role="waiter") == 5
+    assert _metric(llm_coalescing_in_flight, model=model, role="leader") == 0
+    assert _metric(llm_coalescing_in_flight, model=model, role="waiter") == 0
+    assert f'llm_coalesced_requests_total{{model="{model}",role="waiter"}} 5' in render_prometheus()
+    assert coalescing_stats()["in_flight"] == 0
+
+
+def test_different_api_keys_never_share(slow_stub: Any, config: Dict[str, Any]) -> None:
+    results = _run_threads([dict(config, api_key="key-a"), dict(config, api_key="key-b")])
+    assert _upstream_calls(slow_stub) == 2
+    assert not any(result["coalesced"]["shared"] for result in results)
+
+
+def test_coalescing_can_be_disabled(slow_stub: Any, config: Dict[str, Any]) -> None:
+    _run_threads([dict(config, coalesce_requests=False) for _ in range(3)])
+    assert _upstream_calls(slow_stub) == 3
+
+
+def test_async_callers_share_one_upstream_call(slow_stub: Any, config: Dict[str, Any]) -> None:
+    async def run() -> List[Dict[str, Any]]:
+        return await asyncio.gather(*[agenerate_completion(_messages(), dict(config)) for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert _upstream_calls(slow_stub) == 1
+    assert sum(result["coalesced"]["shared"] for result in results) == 4
+
+
+def test_cancelled_leader_still_delivers_to_waiters(slow_stub: Any, config: Dict[str, Any]) -> None:
+    async def run() -> List[Any]:
+        leader = asyncio.create_task(agenerate_completion(_messages(), dict(config)))
+        await asyncio.sleep(0.05)
+        waiters = [asyncio.create_task(agenerate_completion(_messages(), dict(config))) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(run())
+    assert _upstream_calls(slow_stub) == 1
+    assert all(result["content"] and not result.get("error") for result in results)
+    model = config["model"]
+    assert _metric(llm_coalescing_in_flight, model=model, role="leader") == 0
+    assert _metric(llm_coalescing_in_flight, model=model, role="waiter") == 0
+    assert coalescing_stats()["in_flight"] == 0
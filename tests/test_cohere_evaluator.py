@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from generation import cohere_evaluator
+from generation.cohere_evaluator import (
+    DEFAULT_COHERE_MODEL,
+    ModelAvailability,
+    aevaluate_candidates_with_cohere,
+    evaluate_candidates_with_cohere,
+    model_availability_stats,
+    stop_model_refresher,
+)
+
+CANDIDATES = [{"text": "Draft one about forklifts."}, {"text": "Draft two about forklifts."}]
+
+
+def _evaluate(config: Dict[str, Any]) -> Dict[str, Any]:
+    _, metadata = evaluate_candidates_with_cohere("Forklifts", "Educational", "Book calls", CANDIDATES, config)
+    return metadata
+
+
+def _chat_requests(stub_server: Any) -> int:
+    return stub_server.stats()["requests"].get("/v2/chat", 0)
+
+
+def _refreshers() -> List[threading.Thread]:
+    return [thread for thread in threading.enumerate() if thread.name == "cohere-model-refresh"]
+
+
+@pytest.fixture(autouse=True)
+def _stop_refreshers():
+    yield
+    stop_model_refresher()
+
+
+def test_order_keeps_an_available_primary_first() -> None:
+    availability = ModelAvailability()
+    availability.mark_success("model-b")
+    assert availability.order(["model-a", "model-b", "model-c"]) == (["model-a", "model-b", "model-c"], [])
+
+    availability.mark_unavailable("model-c")
+    assert availability.order(["model-a", "model-b", "model-c"]) == (["model-a", "model-b"], ["model-c"])
+
+
+def test_order_prefers_last_working_fallback_when_primary_is_down() -> None:
+    availability = ModelAvailability()
+    availability.mark_unavailable("model-a")
+    availability.mark_success("model-c")
+    assert availability.order(["model-a", "model-b", "model-c"]) == (["model-c", "model-b"], ["model-a"])
+    # Nothing left to try: walk the whole chain rather than fail outright.
+    availability.mark_unavailable("model-b")
+    availability.mark_unavailable("model-c")
+    assert availability.order(["model-a", "model-b", "model-c"]) == (["model-a", "model-b", "model-c"], [])
+
+
+def test_unavailable_marks_expire_after_ttl() -> None:
+    availability = ModelAvailability(ttl_seconds=0.05)
+    availability.mark_unavailable("model-a")
+    assert availability.unavailable_models() == ["model-a"]
+    time.sleep(0.06)
+    assert availability.unavailable_models() == []
+    assert availability.order(["model-a", "model-b"]) == (["model-a", "model-b"], [])
+
+
+def test_different_primary_models_keep_their_own_choice(stub_config: Dict[str, Any]) -> None:
+    first = dict(stub_config, cohere_model="command-r-08-2024")
+    second = dict(stub_config, cohere_model=DEFAULT_COHERE_MODEL)
+    for _ in range(2):
+        assert _evaluate(first)["model"] == "command-r-08-2024"
+        assert _evaluate(second)["model"] == DEFAULT_COHERE_MODEL
+
+
+def test_missing_primary_costs_one_404_per_ttl(stub_server: Any, stub_config: Dict[str, Any]) -> None:
+    stub_server.state.config["unknown_models"] = [DEFAULT_COHERE_MODEL]
+    config = dict(stub_config, cohere_availability_ttl_seconds=60)
+
+    metadata = _evaluate(config)
+    assert metadata["model"] == "command-r7b-12-2024"
+    assert stub_server.stats()["statuses"].get("404") == 1
+
+    metadata = _evaluate(config)
+    assert metadata["model"] == "command-r7b-12-2024"
+    assert metadata["skipped_unavailable"] == [DEFAULT_COHERE_MODEL]
+    assert stub_server.stats()["statuses"].get("404") == 1
+    assert _chat_requests(stub_server) == 3
+
+
+def test_refresher_clears_recovered_models_and_stops(stub_server: Any, stub_config: Dict[str, Any]) -> None:
+    stub_server.state.config["unknown_models"] = [DEFAULT_COHERE_MODEL]
+    config = dict(stub_config, cohere_availability_refresh_seconds=0.05)
+    try:
+        _evaluate(config)
+        assert len(_refreshers()) == 1
+        stub_server.state.config["unknown_models"] = []
+
+        deadline = time.monotonic() + 2.0
+        while model_availability_stats()[stub_config["cohere_base_url"]]["unavailable"]:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        assert _evaluate(config)["model"] == DEFAULT_COHERE_MODEL
+    finally:
+        stop_model_refresher(config)
+
+    deadline = time.monotonic() + 2.0
+    while _refreshers():
+        assert time.monotonic() < deadline, "refresher thread did not stop"
+        time.sleep(0.02)
+
+
+def test_sync_evaluations_share_one_pooled_connection(stub_server: Any, stub_config: Dict[str, Any]) -> None:
+    config = dict(stub_config, cohere_pool_size=4)
+    client = cohere_evaluator._get_http_client(config)
+    assert cohere_evaluator._get_http_client(dict(config)) is client
+    assert cohere_evaluator._get_http_client(dict(config, cohere_pool_size=5)) is not client
+
+    for _ in range(5):
+        assert _evaluate(config)["model"] == DEFAULT_COHERE_MODEL
+    assert _chat_requests(stub_server) == 5
+    assert stub_server.stats()["connections"] == 1
+
+
+def test_async_clients_are_per_event_loop(stub_server: Any, stub_config: Dict[str, Any]) -> None:
+    async def evaluate_twice() -> Tuple[Any, List[str]]:
+        models = []
+        for _ in range(2):
+            _, metadata = await aevaluate_candidates_with_cohere(
+                "Forklifts", "Educational", "Book calls", CANDIDATES, stub_config
+            )
+            models.append(metadata["model"])
+        return cohere_evaluator._get_async_http_client(stub_config), models
+
+    first_client, first_models = asyncio.run(evaluate_twice())
+    second_client, second_models = asyncio.run(evaluate_twice())
+    assert first_models == second_models == [DEFAULT_COHERE_MODEL] * 2
+    # A new loop never reuses a client whose connections belong to a closed loop.
+    assert second_client is not first_client
+    # Clients of closed loops are dropped rather than kept for the life of the process.
+    assert len(cohere_evaluator._ASYNC_HTTP_CLIENTS) == 1
+    assert stub_server.stats()["connections"] == 2
@@ -0,0 +1,332 @@
+import os
+import pickle
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+import src.document_processor as document_processor
+from src.document_processor import (
+    NO_CONTEXT_MESSAGE,
+    DocumentProcessor,
+    SearchCache,
+    chunk_markdown,
+    estimate_tokens,
+    tokenize,
+)
+
+MARKER: List[str] = []
+
+
+def _write(kb_dir: Path, relative_path: str, text: str) -> None:
+    path = kb_dir / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def _processor(kb_dir: Path, snapshot_path: str, **kwargs) -> DocumentProcessor:
+    return DocumentProcessor(snapshot_path=snapshot_path, verbose=False, knowledge_base_dir=str(kb_dir), **kwargs)
+
+
+def _ranking(processor: DocumentProcessor, query: str) -> Dict[tuple, float]:
+    # Chunk ids differ between a patched and a rebuilt index, so compare by content.
+    words = [word for word in tokenize(query) if len(word) > 3]
+    view = processor._view
+    return {
+        (view.chunks[chunk_id]["filename"], view.chunks[chunk_id]["content"]): round(score, 9)
+        for chunk_id, score in processor.rank(words, top_k=100)
+    }
+
+
+@pytest.fixture
+def kb_dir(tmp_path: Path) -> Path:
+    kb_dir = tmp_path / "knowledge_base"
+    _write(kb_dir, "primary/services.md", "# Services\n\nWorkflow automation audits for logistics operators.\n")
+    _write(kb_dir, "primary/bio.md", "# Bio\n\nConsultant focused on operations analytics and forecasting.\n")
+    _write(kb_dir, "secondary/trends.md", "# Trends\n\nWarehouse robotics adoption grew across logistics firms.\n")
+    return kb_dir
+
+
+@pytest.fixture
+def parse_counter(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    parsed: List[str] = []
+    original = document_processor.chunk_markdown
+
+    def counting_chunk_markdown(content: str, *args, **kwargs):
+        parsed.append(content)
+        return original(content, *args, **kwargs)
+
+    monkeypatch.setattr(document_processor, "chunk_markdown", counting_chunk_markdown)
+    return parsed
+
+
+@pytest.fixture
+def tokenize_counter(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    tokenized: List[str] = []
+    original = document_processor.tokenize
+
+    def counting_tokenize(text: str) -> List[str]:
+        tokenized.append(text)
+        return original(text)
+
+    monkeypatch.setattr(document_processor, "tokenize", counting_tokenize)
+    return tokenized
+
+
+def test_warm_load_reuses_snapshot_without_parsing(kb_dir: Path, tmp_path: Path, parse_counter: List[str]) -> None:
+    snapshot_path = str(tmp_path / "index.pkl")
+    cold = _processor(kb_dir, snapshot_path)
+    cold.load_all()
+    assert len(parse_counter) == 3
+    assert os.path.exists(snapshot_path)
+
+    parse_counter.clear()
+    warm = _processor(kb_dir, snapshot_path)
+    primary, secondary = warm.load_all()
+    assert parse_counter == []
+    assert len(primary) == 2 and len(secondary) == 1
+    assert _ranking(warm, "logistics workflow") == _ranking(cold, "logistics workflow")
+
+
+def test_load_all_patches_only_changed_files(kb_dir: Path, tmp_path: Path, parse_counter: List[str]) -> None:
+    snapshot_path = str(tmp_path / "index.pkl")
+    _processor(kb_dir, snapshot_path).load_all()
+
+    _write(kb_dir, "primary/services.md", "# Services\n\nInventory forecasting sprints for retail logistics teams.\n")
+    (kb_dir / "primary" / "bio.md").unlink()
+    _write(kb_dir, "secondary/nested/robots.md", "# Robots\n\nLogistics robotics pilots and forecasting costs.\n")
+
+    parse_counter.clear()
+    patched = _processor(kb_dir, snapshot_path)
+    primary, secondary = patched.load_all()
+    assert len(parse_counter) == 2
+    assert sorted(doc["filename"] for doc in primary + secondary) == [
+        "nested/robots.md",
+        "services.md",
+        "trends.md",
+    ]
+
+    rebuilt = _processor(kb_dir, "")
+    rebuilt.load_all()
+    for query in ("logistics forecasting", "operations analytics", "robotics pilots"):
+        assert _ranking(patched, query) == _ranking(rebuilt, query)
+
+
+def test_warm_load_tokenizes_only_changed_files(kb_dir: Path, tmp_path: Path, tokenize_counter: List[str]) -> None:
+    snapshot_path = str(tmp_path / "index.pkl")
+    _processor(kb_dir, snapshot_path).load_all()
+
+    tokenize_counter.clear()
+    _processor(kb_dir, snapshot_path).load_all()
+    assert tokenize_counter == []
+
+    _write(kb_dir, "primary/services.md", "# Services\n\nInventory forecasting sprints for retail logistics teams.\n")
+    _processor(kb_dir, snapshot_path).load_all()
+    # Only the edited file's old chunks (to remove) and new chunks (to add) are tokenized.
+    assert tokenize_counter
+    assert all("Workflow automation" in text or "Inventory forecasting" in text for text in tokenize_counter)
+
+
+def test_refresh_reports_changes(kb_dir: Path, tmp_path: Path) -> None:
+    processor = _processor(kb_dir, str(tmp_path / "index.pkl"))
+    processor.load_all()
+    assert processor.refresh() == {"added": [], "changed": [], "removed": []}
+
+    _write(kb_dir, "secondary/trends.md", "# Trends\n\nAutonomous forklifts replaced manual picking.\n")
+    _write(kb_dir, "primary/new.md", "# New\n\nFresh offer for forklift fleets.\n")
+    changes = processor.refresh()
+    assert changes["added"] == [str(kb_dir / "primary" / "new.md")]
+    assert changes["changed"] == [str(kb_dir / "secondary" / "trends.md")]
+    assert changes["removed"] == []
+    assert "forklift" in processor.search("forklift fleets")
+
+
+def test_snapshot_from_another_directory_is_ignored(kb_dir: Path, tmp_path: Path, parse_counter: List[str]) -> None:
+    snapshot_path = str(tmp_path / "index.pkl")
+    _processor(kb_dir, snapshot_path).load_all()
+
+    other_dir = tmp_path / "other_kb"
+    _write(other_dir, "primary/only.md", "# Only\n\nA completely different corpus.\n")
+    parse_counter.clear()
+    primary, secondary = _processor(other_dir, snapshot_path).load_all()
+    assert [doc["filename"] for doc in primary] == ["only.md"]
+    assert secondary == []
+    assert len(parse_counter) == 1
+
+
+def test_default_snapshot_path_is_per_knowledge_base(tmp_path: Path) -> None:
+    first = DocumentProcessor(verbose=False, knowledge_base_dir=str(tmp_path / "a"))
+    second = DocumentProcessor(verbose=False, knowledge_base_dir=str(tmp_path / "b"))
+    assert first.snapshot_path != second.snapshot_path
+    assert os.path.basename(first.snapshot_path).startswith("knowledge_base_index-")
+    assert DocumentProcessor(snapshot_path="", verbose=False).snapshot_path == ""
+
+
+def _mark() -> str:
+    MARKER.append("executed")
+    return "payload"
+
+
+class _Exploit:
+    def __reduce__(self):
+        return _mark, ()
+
+
+def test_tampered_snapshot_cannot_run_code(kb_dir: Path, tmp_path: Path) -> None:
+    snapshot_path = tmp_path / "index.pkl"
+    snapshot_path.write_bytes(pickle.dumps({"version": document_processor.SNAPSHOT_VERSION, "files": _Exploit()}))
+
+    processor = _processor(kb_dir, str(snapshot_path))
+    primary, secondary = processor.load_all()
+    assert MARKER == []
+    assert len(primary) == 2 and len(secondary) == 1
+    # The rejected file is replaced by a valid snapshot.
+    assert processor._load_snapshot() is not None
+
+
+def test_search_cache_evicts_least_recently_used() -> None:
+    cache = SearchCache(maxsize=2)
+    cache.put(("a",), "A")
+    cache.put(("b",), "B")
+    assert cache.get(("a",)) == "A"
+    cache.put(("c",), "C")
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == "A"
+    assert cache.get(("c",)) == "C"
+    assert cache.stats() == {"hits": 3, "misses": 1, "size": 2, "maxsize": 2}
+
+
+def test_search_cache_disabled_with_zero_size() -> None:
+    cache = SearchCache(maxsize=0)
+    cache.put(("a",), "A")
+    assert cache.get(("a",)) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_search_is_cached_until_the_index_changes(kb_dir: Path, tmp_path: Path) -> None:
+    processor = _processor(kb_dir, str(tmp_path / "index.pkl"))
+    processor.load_all()
+
+    first = processor.search("logistics workflow automation")
+    # Word order and repeats share the entry.
+    assert processor.search("automation workflow logistics logistics") == first
+    assert processor.search_cache.stats()["hits"] == 1
+
+    _write(kb_dir, "primary/services.md", "# Services\n\nLogistics workflow coaching for dispatch teams.\n")
+    processor.refresh()
+    assert processor.search_cache.stats()["size"] == 0
+    refreshed = processor.search("logistics workflow automation")
+    assert refreshed != first
+    assert "dispatch teams" in refreshed
+
+
+def test_build_context_never_exceeds_budget(kb_dir: Path, tmp_path: Path) -> None:
+    for index in range(12):
+        _write(
+            kb_dir,
+            f"secondary/report_{index}.md",
+            f"# Report {index}\n\n" + f"Logistics forecasting finding number {index} for warehouse teams. " * (index + 1),
+        )
+    processor = _processor(kb_dir, "")
+    processor.load_all()
+
+    for budget in (1, 5, 20, 40, 80, 160, 400, 2000):
+        context, stats = processor.build_context("logistics forecasting warehouse", token_budget=budget)
+        assert stats["tokens_used"] <= budget
+        assert stats["token_budget"] == budget
+        if stats["chunks_used"] == 0:
+            assert context in ("", NO_CONTEXT_MESSAGE)
+    _, stats = processor.build_context("logistics forecasting warehouse", token_budget=2000)
+    assert stats["chunks_used"] > 1
+
+
+def test_build_context_returns_empty_when_nothing_fits(kb_dir: Path) -> None:
+    processor = _processor(kb_dir, "")
+    processor.load_all()
+    context, stats = processor.build_context("logistics", token_budget=estimate_tokens(NO_CONTEXT_MESSAGE) - 1)
+    assert context == ""
+    assert stats["tokens_used"] == 0
+
+
+def test_build_context_skips_copied_passages(kb_dir: Path) -> None:
+    passage = (
+        "Mid-market logistics operators cut dispatch delays by a third after automating "
+        "carrier booking, route exceptions and proof-of-delivery follow ups."
+    )
+    _write(kb_dir, "primary/case_study.md", f"# Case study\n\n{passage}\n")
+    _write(kb_dir, "secondary/press.md", f"# Press\n\n{passage} Reported in the quarterly review.\n")
+    processor = _processor(kb_dir, "")
+    processor.load_all()
+
+    context, stats = processor.build_context("logistics dispatch delays carrier booking", token_budget=2000)
+    assert stats["duplicates_skipped"] == 1
+    assert context.count("carrier booking") == 1
+
+
+def test_chunk_markdown_keeps_sections_and_heading_trails() -> None:
+    content = (
+        "Intro line before any heading.\n\n"
+        "# Services\n\n"
+        "Workflow **automation** audits.\n\n"
+        "## Pricing\n\n"
+        "Fixed fee per audit.\n\n"
+        "---\n\n"
+        "Retainers on request.\n\n"
+        "### Discounts ###\n\n"
+        "Charities pay half.\n\n"
+        "## Delivery\n\n"
+        "Two-week sprints.\n"
+    )
+    chunks = chunk_markdown(content)
+    assert [(chunk["section"], chunk["content"]) for chunk in chunks] == [
+        ("", "Intro line before any heading."),
+        ("Services", "Workflow automation audits."),
+        ("Services > Pricing", "Fixed fee per audit.\n\nRetainers on request."),
+        ("Services > Pricing > Discounts", "Charities pay half."),
+        ("Services > Delivery", "Two-week sprints."),
+    ]
+    assert [chunk["chunk_index"] for chunk in chunks] == list(range(len(chunks)))
+
+
+def test_chunk_markdown_packs_and_splits_to_max_chars() -> None:
+    paragraphs = [f"Paragraph {index} about logistics forecasting." for index in range(6)]
+    chunks = chunk_markdown("# Notes\n\n" + "\n\n".join(paragraphs), max_chars=100)
+    assert len(chunks) == 3
+    assert all(len(chunk["content"]) <= 100 for chunk in chunks)
+    assert "\n\n".join(chunk["content"] for chunk in chunks) == "\n\n".join(paragraphs)
+
+    long_paragraph = " ".join(["forklift"] * 60)
+    pieces = chunk_markdown(long_paragraph, max_chars=100)
+    assert len(pieces) > 1
+    assert all(len(piece["content"]) <= 100 for piece in pieces)
+    assert " ".join(piece["content"] for piece in pieces) == long_paragraph
+    assert chunk_markdown("# Only a heading\n\n---\n") == []
+
+
+def test_ingestion_walks_nested_directories_in_parallel(tmp_path: Path) -> None:
+    kb_dir = tmp_path / "knowledge_base"
+    for index in range(25):
+        _write(kb_dir, f"primary/team_{index % 3}/notes/file_{index:02d}.md", f"# File {index}\n\nForklift note {index}.\n")
+    _write(kb_dir, "primary/ignored.txt", "not markdown")
+
+    processor = _processor(kb_dir, "", max_workers=2)
+    documents = list(processor.iter_markdown_files(str(kb_dir / "primary")))
+    assert sorted(doc["filename"] for doc in documents) == sorted(
+        os.path.join(f"team_{index % 3}", "notes", f"file_{index:02d}.md") for index in range(25)
+    )
+    assert all(doc["type"] == "primary" and doc["chunks"] for doc in documents)
+    assert sorted(timing["filename"] for timing in processor.load_timings) == sorted(doc["filename"] for doc in documents)
+    assert all(timing["seconds"] >= 0 for timing in processor.load_timings)
+
+
+def test_ingestion_skips_unreadable_files(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    kb_dir = tmp_path / "knowledge_base"
+    _write(kb_dir, "secondary/good.md", "# Good\n\nReadable forklift report.\n")
+    (kb_dir / "secondary" / "broken.md").write_bytes(b"\xff\xfe not utf-8 \xff")
+
+    processor = _processor(kb_dir, "")
+    primary, secondary = processor.load_all()
+    assert primary == []
+    assert [doc["filename"] for doc in secondary] == ["good.md"]
+    assert "Error loading broken.md" in capsys.readouterr().out
+    assert list(processor.iter_markdown_files(str(tmp_path / "missing"))) == []
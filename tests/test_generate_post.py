@@ -0,0 +1,96 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from benchmarks import stub_server as stub_module
+from generation.generate_post import ANGLE_STRATEGIES, agenerate_post, generate_post
+from generation.knowledge_base import doc_processor
+
+
+@pytest.fixture
+def retrievals(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    calls: List[str] = []
+
+    def fake_retrieve_context(query: str, config: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        calls.append(query)
+        return "## RELEVANT INFORMATION FROM KNOWLEDGE BASES:\n\nStub context.\n", {"tokens_used": 14, "mode": "lexical"}
+
+    monkeypatch.setattr(doc_processor, "retrieve_context", fake_retrieve_context)
+    return calls
+
+
+def test_generate_post_retrieves_context_once(stub_config: Dict[str, Any], retrievals: List[str]) -> None:
+    post, metadata = generate_post("Warehouse automation", "Educational", "Book discovery calls", dict(stub_config))
+    assert post
+    assert retrievals == ["Warehouse automation"]
+    assert metadata["rag"] == {"tokens_used": 14, "mode": "lexical"}
+
+
+def test_batched_generate_post_retrieves_context_once(stub_config: Dict[str, Any], retrievals: List[str]) -> None:
+    config = dict(stub_config, candidate_mode="batched")
+    generate_post("Warehouse automation", "Educational", "Book discovery calls", config)
+    assert retrievals == ["Warehouse automation"]
+
+
+def test_agenerate_post_retrieves_context_once(stub_config: Dict[str, Any], retrievals: List[str]) -> None:
+    _, metadata = asyncio.run(
+        agenerate_post("Warehouse automation", "Educational", "Book discovery calls", dict(stub_config))
+    )
+    assert retrievals == ["Warehouse automation"]
+    assert metadata["rag"]["tokens_used"] == 14
+
+
+@pytest.fixture
+def drop_angle(monkeypatch: pytest.MonkeyPatch) -> str:
+    dropped = ANGLE_STRATEGIES[1][0]
+    original = stub_module._chat_reply
+
+    def reply_without_angle(prompt: str) -> str:
+        reply = original(prompt)
+        if '{"drafts"' not in prompt:
+            return reply
+        payload = json.loads(reply)
+        payload["drafts"] = [draft for draft in payload["drafts"] if draft["angle"] != dropped]
+        return json.dumps(payload)
+
+    monkeypatch.setattr(stub_module, "_chat_reply", reply_without_angle)
+    return dropped
+
+
+def test_batched_mode_drafts_every_angle_in_one_request(stub_config: Dict[str, Any], retrievals: List[str]) -> None:
+    config = dict(stub_config, candidate_mode="batched")
+    _, metadata = generate_post("Warehouse automation", "Educational", "Book discovery calls", config)
+
+    tokens = metadata["candidate_generation"]["tokens"]
+    assert tokens["requests"] == 1
+    assert tokens["fallback_angles"] == []
+    assert tokens["prompt_tokens_saved_estimate"] == (
+        tokens["fanout_prompt_tokens_estimate"] - tokens["batched_prompt_tokens_estimate"]
+    )
+    assert tokens["prompt_tokens_saved_estimate"] > 0
+
+    # The selected draft is charged its share of the one request, not the whole batch.
+    assert metadata["llm"]["batched"]
+    assert 0 < metadata["llm"]["estimated_cost_usd"] < tokens["batch_estimated_cost_usd"]
+    shares = [candidate["llm"]["estimated_cost_usd"] for candidate in metadata["candidates"]]
+    assert sum(shares) == pytest.approx(tokens["batch_estimated_cost_usd"])
+    assert tokens["estimated_cost_usd"] == pytest.approx(tokens["batch_estimated_cost_usd"])
+
+
+def test_batched_mode_falls_back_for_missing_angles(
+    stub_config: Dict[str, Any], retrievals: List[str], drop_angle: str
+) -> None:
+    config = dict(stub_config, candidate_mode="batched")
+    _, metadata = generate_post("Warehouse automation", "Educational", "Book discovery calls", config)
+
+    assert metadata["candidate_generation"]["angles"] == [name for name, _ in ANGLE_STRATEGIES]
+    tokens = metadata["candidate_generation"]["tokens"]
+    assert tokens["fallback_angles"] == [drop_angle]
+    assert tokens["requests"] == 2
+    fallback = next(candidate for candidate in metadata["candidates"] if candidate["angle"] == drop_angle)
+    assert not fallback["llm"].get("batched")
+    assert tokens["estimated_cost_usd"] == pytest.approx(
+        tokens["batch_estimated_cost_usd"] + fallback["llm"]["estimated_cost_usd"]
+    )
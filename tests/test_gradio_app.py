@@ -0,0 +1,43 @@
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+gradio_app = pytest.importorskip("generation.gradio_app")
+
+CASSETTE_SETTINGS = {
+    "cassette_mode": "replay",
+    "cassette_path": "cassettes/demo.jsonl",
+    "cassette_match": "loose",
+    "cassette_latency": "none",
+}
+
+
+@pytest.fixture
+def cassette_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "replay")
+    monkeypatch.setenv("LLM_CASSETTE_PATH", "cassettes/demo.jsonl")
+    monkeypatch.setenv("LLM_CASSETTE_MATCH", "loose")
+    monkeypatch.setenv("LLM_CASSETTE_LATENCY", "none")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+
+def test_every_stage_config_gets_the_cassette_settings(cassette_env: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    pipeline_config = gradio_app._build_config("gpt-4o-mini", None, "command-a-03-2025", 0.7, 500, 2, 30.0)
+    assert {key: pipeline_config.get(key) for key in CASSETTE_SETTINGS} == CASSETTE_SETTINGS
+
+    pillar_configs: List[Dict[str, Any]] = []
+
+    def fake_generate_completion(messages: List[Dict[str, str]], config: Dict[str, Any]) -> Dict[str, Any]:
+        pillar_configs.append(config)
+        return {"content": json.dumps({"pillars": [{"name": "Operations", "priority": 1, "topics": ["Forklifts"]}]})}
+
+    monkeypatch.setattr(gradio_app, "generate_completion", fake_generate_completion)
+    monkeypatch.setattr(gradio_app, "_save_cached_pillars", lambda payload: None)
+    payload, _, _ = gradio_app.generate_content_pillars(
+        "SME operators", "gpt-4o-mini", None, 0.7, 500, 2, 30.0, force_regenerate=True
+    )
+
+    assert "error" not in payload
+    assert pillar_configs
+    assert {key: pillar_configs[0].get(key) for key in CASSETTE_SETTINGS} == CASSETTE_SETTINGS
@@ -0,0 +1,152 @@
+import json
+import os
+import urllib.request
+import uuid
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from benchmarks import stub_server as stub_module
+from generation.llm_client import generate_completion
+from generation.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    dump_metrics_json,
+    llm_cache_requests_total,
+    llm_cost_usd_total,
+    llm_errors_total,
+    llm_request_latency_seconds,
+    llm_requests_total,
+    llm_retries_total,
+    llm_tokens_total,
+    observe_llm_call,
+    render_prometheus,
+    start_metrics_server,
+)
+from generation.post_assets import generate_post_image
+
+
+def _model() -> str:
+    # Metric series are process-wide per label set; keep tests independent.
+    return f"metrics-{uuid.uuid4().hex[:8]}"
+
+
+def _value(metric: Any, **labels: str) -> float:
+    for sample in metric.snapshot():
+        if sample["labels"] == labels:
+            return sample.get("value", sample.get("count"))
+    return 0.0
+
+
+def test_counter_gauge_and_histogram_render() -> None:
+    counter = Counter("test_total", "Test counter", ("kind",))
+    counter.inc(kind='a"b')
+    counter.inc(2, kind='a"b')
+    assert counter.render() == [
+        "# HELP test_total Test counter",
+        "# TYPE test_total counter",
+        'test_total{kind="a\\"b"} 3',
+    ]
+
+    gauge = Gauge("test_in_flight", "Test gauge", ("role",))
+    gauge.inc(role="leader")
+    gauge.dec(role="leader")
+    assert gauge.snapshot() == [{"labels": {"role": "leader"}, "value": 0.0}]
+    assert "# TYPE test_in_flight gauge" in gauge.render()
+
+    histogram = Histogram("test_seconds", "Test histogram", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, stage="draft")
+    lines = histogram.render()
+    assert 'test_seconds_bucket{stage="draft",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="draft",le="1"} 3' in lines
+    assert 'test_seconds_bucket{stage="draft",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{stage="draft"} 4' in lines
+    (sample,) = histogram.snapshot()
+    assert sample["count"] == 4
+    assert sample["sum"] == pytest.approx(6.05)
+    assert sample["p50"] == pytest.approx(0.5)
+
+
+def test_observe_llm_call_classifies_outcomes() -> None:
+    model = _model()
+    labels = {"provider": "openai", "model": model, "stage": "draft"}
+    config = {"model": model, "stage": "draft"}
+
+    observe_llm_call(
+        {
+            "model": model,
+            "usage": {"prompt_tokens": 100, "completion_tokens": 40},
+            "estimated_cost_usd": 0.002,
+            "attempts": 3,
+            "cache": {"enabled": True, "hit": False},
+        },
+        config,
+        0.4,
+    )
+    observe_llm_call({"model": model, "cache": {"enabled": True, "hit": True}}, config, 0.001)
+    observe_llm_call({"model": model, "coalesced": {"shared": True}}, config, 0.2)
+    observe_llm_call({"model": model, "error": "boom", "error_kind": "APIStatusError", "attempts": 2}, config, 1.0)
+
+    for outcome in ("success", "cache_hit", "coalesced", "error"):
+        assert _value(llm_requests_total, outcome=outcome, **labels) == 1
+    assert _value(llm_request_latency_seconds, **labels) == 4
+    assert _value(llm_tokens_total, kind="prompt", **labels) == 100
+    assert _value(llm_tokens_total, kind="completion", **labels) == 40
+    assert _value(llm_retries_total, **labels) == 3
+    assert _value(llm_cost_usd_total, **labels) == pytest.approx(0.002)
+    assert _value(llm_cache_requests_total, result="hit", **labels) == 1
+    assert _value(llm_cache_requests_total, result="miss", **labels) == 1
+    assert _value(llm_errors_total, kind="APIStatusError", **labels) == 1
+
+
+def test_completions_are_exported_as_prometheus_and_json(stub_config: Dict[str, Any], tmp_path: Path) -> None:
+    model = _model()
+    messages = [{"role": "user", "content": "Write one sentence about forklifts."}]
+    result = generate_completion(messages, dict(stub_config, model=model, stage="hashtags"))
+    assert not result.get("error")
+
+    text = render_prometheus()
+    assert f'llm_requests_total{{provider="openai",model="{model}",stage="hashtags",outcome="success"}} 1' in text
+
+    path = tmp_path / "metrics.json"
+    dump_metrics_json(str(path))
+    snapshot = json.loads(path.read_text(encoding="utf-8"))
+    requests = [
+        sample for sample in snapshot["llm_requests_total"] if sample["labels"].get("model") == model
+    ]
+    assert requests == [
+        {"labels": {"provider": "openai", "model": model, "stage": "hashtags", "outcome": "success"}, "value": 1.0}
+    ]
+
+    server = start_metrics_server(0)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{base}/metrics") as response:
+            assert model in response.read().decode("utf-8")
+        with urllib.request.urlopen(f"{base}/metrics.json") as response:
+            assert "llm_requests_total" in json.loads(response.read())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_image_without_data_is_recorded_as_an_error(
+    stub_config: Dict[str, Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    labels = {"provider": "openai", "model": _model(), "stage": "image"}
+    config = dict(stub_config, image_model=labels["model"])
+
+    image_path, metadata = generate_post_image("Post body.", "Forklifts", config)
+    assert image_path and os.path.exists(image_path)
+    os.unlink(image_path)
+    assert _value(llm_requests_total, outcome="success", **labels) == 1
+
+    monkeypatch.setattr(stub_module, "STUB_IMAGE_B64", "")
+    image_path, metadata = generate_post_image("Post body.", "Forklifts", config)
+    assert image_path is None
+    assert metadata["error"] == "Image response missing b64_json"
+    assert _value(llm_requests_total, outcome="error", **labels) == 1
+    assert _value(llm_errors_total, kind="MissingImageData", **labels) == 1
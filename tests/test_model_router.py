@@ -0,0 +1,124 @@
+import uuid
+from typing import Any, Dict, List
+
+import pytest
+
+from generation import model_router
+from generation.llm_client import generate_completion
+from generation.model_router import (
+    DEFAULT_ROUTING_POLICY,
+    load_routing_policy,
+    model_router_stats,
+    record_outcome,
+    route_stage,
+    select_model,
+)
+
+
+def _models(count: int) -> List[str]:
+    # Router statistics are process-wide per model name; keep tests independent.
+    return [f"router-{uuid.uuid4().hex[:8]}" for _ in range(count)]
+
+
+def _config(models: List[str], **stage_policy: Any) -> Dict[str, Any]:
+    return {
+        "model": "gpt-4o-mini",
+        "model_routing": {
+            "min_success_rate": 0.8,
+            "min_samples": 3,
+            "probe_after_seconds": 60.0,
+            "stages": {"brand_check": dict(stage_policy, models=models)},
+        },
+    }
+
+
+def test_unrouted_stages_keep_the_user_model() -> None:
+    config = {"model": "gpt-4o", "model_routing": DEFAULT_ROUTING_POLICY}
+    routed = route_stage("draft", config)
+    assert routed["model"] == "gpt-4o"
+    assert routed["stage"] == "draft"
+    assert routed["fallback_models"] == []
+
+    plain = route_stage("brand_check", {"model": "gpt-4o"})
+    assert plain == {"model": "gpt-4o", "stage": "brand_check"}
+
+
+def test_ewma_success_rate_demotes_a_failing_model() -> None:
+    primary, backup = _models(2)
+    config = _config([primary, backup])
+    for _ in range(3):
+        record_outcome(primary, success=True, latency_seconds=0.1)
+    assert select_model("brand_check", config)[0] == primary
+
+    # 1.0 -> 0.8 -> 0.64: two failures in a row are enough to fall under 0.8.
+    record_outcome(primary, success=False, latency_seconds=0.1)
+    assert select_model("brand_check", config)[0] == primary
+    record_outcome(primary, success=False, latency_seconds=0.1)
+    model, decision = select_model("brand_check", config)
+    assert model == backup
+    assert decision["rejected"][primary].startswith("success rate 0.64")
+
+    routed = route_stage("brand_check", config)
+    assert routed["model"] == backup
+    assert routed["fallback_models"] == []
+
+
+def test_p95_latency_over_target_is_rejected() -> None:
+    slow, fast = _models(2)
+    config = _config([slow, fast], latency_target_seconds=1.0)
+    for latency in [0.2] * 19 + [5.0]:
+        record_outcome(slow, success=True, latency_seconds=latency)
+    # One slow call in 20 is the 5% tail: p95 is still 0.2s.
+    assert model_router_stats()["models"][slow]["p95_latency_seconds"] == pytest.approx(0.2)
+    assert select_model("brand_check", config)[0] == slow
+
+    record_outcome(slow, success=True, latency_seconds=5.0)
+    model, decision = select_model("brand_check", config)
+    assert model == fast
+    assert "p95 latency 5.00s" in decision["rejected"][slow]
+
+
+def test_cost_ceiling_and_all_rejected_fallback() -> None:
+    cheap, pricey = _models(2)
+    config = _config([pricey, cheap], max_cost_usd=0.01, expected_prompt_tokens=1000)
+    config["max_tokens"] = 0
+    config["pricing"] = {pricey: {"input": 20.0, "output": 0.0}, cheap: {"input": 0.1, "output": 0.0}}
+    model, decision = select_model("brand_check", config)
+    assert model == cheap
+    assert pricey in decision["rejected"]
+
+    # With every candidate rejected the healthiest one still gets the call.
+    for _ in range(3):
+        record_outcome(cheap, success=False, latency_seconds=0.1)
+    assert select_model("brand_check", config)[0] == pricey
+
+
+def test_idle_rejected_model_is_probed_again(monkeypatch: pytest.MonkeyPatch) -> None:
+    primary, backup = _models(2)
+    config = _config([primary, backup])
+    for _ in range(3):
+        record_outcome(primary, success=False, latency_seconds=0.1)
+    assert select_model("brand_check", config)[0] == backup
+
+    later = model_router.time.monotonic() + 61.0
+    monkeypatch.setattr(model_router.time, "monotonic", lambda: later)
+    assert select_model("brand_check", config)[0] == primary
+
+
+def test_completions_feed_the_router(stub_config: Dict[str, Any]) -> None:
+    (model,) = _models(1)
+    messages = [{"role": "user", "content": "Write one sentence about forklifts."}]
+    result = generate_completion(messages, dict(stub_config, model=model))
+    assert not result.get("error")
+    stats = model_router_stats()["models"][model]
+    assert stats["calls"] == 1 and stats["failures"] == 0
+    assert stats["p95_latency_seconds"] > 0
+
+
+def test_load_routing_policy(tmp_path: Any) -> None:
+    assert load_routing_policy("") is None
+    assert load_routing_policy("off") is None
+    assert load_routing_policy("default") is DEFAULT_ROUTING_POLICY
+    path = tmp_path / "policy.json"
+    path.write_text('{"stages": {"hashtags": {"models": ["gpt-4.1-nano"]}}}', encoding="utf-8")
+    assert load_routing_policy(str(path))["stages"]["hashtags"]["models"] == ["gpt-4.1-nano"]
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import generation
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _loaded_after(statement: str) -> str:
+    code = f"import sys\n{statement}\nprint(' '.join(sorted(sys.modules)))"
+    return subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    ).stdout.split()
+
+
+def test_light_submodules_do_not_import_the_providers() -> None:
+    loaded = _loaded_after("import generation.feedback_loop")
+    assert "openai" not in loaded
+    assert "generation.pipeline" not in loaded
+
+
+def test_package_exports_resolve_on_first_use() -> None:
+    from generation import run_pipeline
+    from generation.pipeline import run_pipeline as pipeline_run_pipeline
+
+    from generation.generate_post import agenerate_post
+
+    assert run_pipeline is pipeline_run_pipeline
+    # Loading the generate_post submodule must not hide the generate_post function.
+    assert callable(generation.generate_post)
+    assert generation.agenerate_post is agenerate_post
+    assert "agenerate_post" in dir(generation)
+    try:
+        generation.not_an_export
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("unknown attributes must raise AttributeError")
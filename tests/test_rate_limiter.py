@@ -0,0 +1,110 @@
+import asyncio
+import uuid
+
+import pytest
+
+from generation.rate_limiter import RateLimiter, TokenBucket, get_rate_limiter
+
+
+def _model() -> str:
+    # Limiters are process-wide per model name; keep tests independent.
+    return f"test-model-{uuid.uuid4().hex[:8]}"
+
+
+def test_token_bucket_queues_reservations_in_order() -> None:
+    bucket = TokenBucket(capacity=2, refill_per_second=1.0)
+    now = bucket.updated_at
+    assert bucket.reserve(1, now) == 0.0
+    assert bucket.reserve(1, now) == 0.0
+    # Later callers wait behind the debt of earlier ones instead of racing for refills.
+    assert bucket.reserve(1, now) == pytest.approx(1.0)
+    assert bucket.reserve(1, now) == pytest.approx(2.0)
+    # Refill pays the debt down over time.
+    assert bucket.reserve(1, now + 2.0) == pytest.approx(1.0)
+
+
+def test_token_bucket_caps_oversized_requests() -> None:
+    bucket = TokenBucket(capacity=10, refill_per_second=5.0)
+    now = bucket.updated_at
+    assert bucket.reserve(1000, now) == 0.0
+    assert bucket.reserve(5, now) == pytest.approx(1.0)
+
+
+def test_rate_limiter_delays_past_rpm() -> None:
+    limiter = RateLimiter(_model(), rpm=60)
+    waits = [limiter.reserve(0) for _ in range(62)]
+    assert waits[:60] == [0.0] * 60
+    assert waits[60] == pytest.approx(1.0, abs=0.05)
+    assert waits[61] == pytest.approx(2.0, abs=0.05)
+    stats = limiter.stats()
+    assert stats["admitted"] == 62
+    assert stats["delayed"] == 2
+
+
+def test_record_usage_refunds_overestimates() -> None:
+    limiter = RateLimiter(_model(), tpm=600)
+    assert limiter.reserve(600) == 0.0
+    assert limiter.reserve(100) > 0
+    # Both requests used 100 tokens instead of the reserved amounts.
+    limiter.record_usage(600, 100)
+    limiter.record_usage(100, 100)
+    assert limiter.reserve(100) == 0.0
+
+
+def test_aacquire_waits_on_the_event_loop() -> None:
+    limiter = RateLimiter(_model(), rpm=600)
+    for _ in range(600):
+        limiter.reserve(0)
+
+    async def acquire_twice() -> list:
+        return await asyncio.gather(limiter.aacquire(0), limiter.aacquire(0))
+
+    waits = asyncio.run(acquire_twice())
+    assert waits == [pytest.approx(0.1, abs=0.05), pytest.approx(0.2, abs=0.05)]
+
+
+def test_get_rate_limiter_resolves_budgets_per_model() -> None:
+    chat_model = _model()
+    image_model = _model()
+    config = {
+        "model": chat_model,
+        "rate_limit_rpm": 100,
+        "rate_limits": {image_model: {"rpm": 5}},
+    }
+    assert get_rate_limiter(_model(), config) is None
+    limiter = get_rate_limiter(chat_model, config)
+    assert limiter is not None and limiter.rpm == 100 and limiter.tpm is None
+    assert get_rate_limiter(chat_model, config) is limiter
+    assert get_rate_limiter(image_model, config).rpm == 5
+
+    changed = get_rate_limiter(chat_model, dict(config, rate_limit_rpm=200))
+    assert changed is limiter and changed.rpm == 200
+
+
+def test_changing_limits_keeps_bucket_state() -> None:
+    model = _model()
+    config = {"model": model, "rate_limit_rpm": 60}
+    limiter = get_rate_limiter(model, config)
+    for _ in range(60):
+        limiter.reserve(0)
+
+    # A higher limit must not hand out a fresh, full bucket to a model that just spent its budget.
+    raised = get_rate_limiter(model, dict(config, rate_limit_rpm=120))
+    assert raised is limiter
+    assert raised.reserve(0) == pytest.approx(0.5, abs=0.05)
+    assert raised.stats()["admitted"] == 61
+
+    lowered = get_rate_limiter(model, dict(config, rate_limit_rpm=30, rate_limit_tpm=600))
+    assert lowered.tpm == 600
+    assert lowered.reserve(0) == pytest.approx(4.0, abs=0.1)
+    # A newly configured token budget starts full; the request queue still applies.
+    assert lowered.reserve(600) == pytest.approx(6.0, abs=0.1)
+
+
+def test_token_bucket_resize_caps_saved_tokens() -> None:
+    bucket = TokenBucket(capacity=10, refill_per_second=1.0)
+    now = bucket.updated_at
+    bucket.resize(4, 2.0, now)
+    assert bucket.tokens == 4
+    assert bucket.reserve(3, now) == 0.0
+    assert bucket.reserve(3, now) == pytest.approx(1.0)
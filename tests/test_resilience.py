@@ -0,0 +1,198 @@
+import asyncio
+import email.utils
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+import httpx
+import openai
+import pytest
+
+from generation.llm_client import generate_completion
+from generation.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    acall_with_retries,
+    backoff_delay,
+    call_with_retries,
+    get_circuit_breaker,
+    is_connection_error,
+    is_retryable,
+    retry_after_seconds,
+)
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int, headers: Optional[Dict[str, str]] = None) -> None:
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def _chained(outer: Exception, inner: BaseException) -> Exception:
+    try:
+        raise outer from inner
+    except Exception as exc:
+        return exc
+
+
+def _endpoint() -> str:
+    # Breakers are process-wide per (endpoint, model); keep tests independent.
+    return f"test://{uuid.uuid4().hex[:8]}"
+
+
+@pytest.mark.parametrize(
+    "exc, expected",
+    [
+        (_StatusError(429), True),
+        (_StatusError(503), True),
+        (_StatusError(400), False),
+        (_StatusError(401), False),
+        (ConnectionResetError(), True),
+        (TimeoutError(), True),
+        (ValueError("bad prompt"), False),
+        (CircuitOpenError("open"), False),
+    ],
+)
+def test_is_retryable(exc: BaseException, expected: bool) -> None:
+    assert is_retryable(exc) is expected
+
+
+def test_is_connection_error_walks_the_cause_chain() -> None:
+    request = httpx.Request("POST", "http://localhost/v1/chat/completions")
+    assert is_connection_error(ConnectionResetError())
+    assert is_connection_error(_chained(openai.APIConnectionError(request=request), ConnectionResetError()))
+    assert not is_connection_error(openai.APITimeoutError(request=request))
+    assert not is_connection_error(_chained(RuntimeError("wrapped"), TimeoutError()))
+    assert not is_connection_error(_StatusError(502))
+    assert not is_connection_error(ValueError("bad prompt"))
+
+
+def test_retry_after_seconds_reads_all_header_forms() -> None:
+    assert retry_after_seconds(_StatusError(429, {"retry-after-ms": "1500"})) == pytest.approx(1.5)
+    assert retry_after_seconds(_StatusError(429, {"retry-after": "3"})) == pytest.approx(3.0)
+    http_date = email.utils.formatdate(time.time() + 10, usegmt=True)
+    assert retry_after_seconds(_StatusError(429, {"retry-after": http_date})) == pytest.approx(10.0, abs=1.5)
+    assert retry_after_seconds(_StatusError(429)) is None
+    assert retry_after_seconds(ValueError()) is None
+
+
+def test_backoff_delay_bounds() -> None:
+    for attempt in range(1, 8):
+        assert 0.0 <= backoff_delay(attempt, base_seconds=0.5, max_seconds=4.0) <= min(4.0, 0.5 * 2 ** (attempt - 1))
+    assert backoff_delay(1, base_seconds=0.1, retry_after=2.0) >= 2.0
+    assert backoff_delay(1, base_seconds=0.1, max_seconds=1.0, retry_after=60.0) == pytest.approx(1.0)
+
+
+def test_breaker_opens_half_opens_and_closes() -> None:
+    breaker = CircuitBreaker("test", threshold=2, reset_seconds=0.05)
+    breaker.record_failure(_StatusError(500))
+    assert breaker.allow()
+    breaker.record_failure(_StatusError(500))
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()  # the single half-open probe
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_failure(_StatusError(503))
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0, "rejected": 2}
+
+
+def test_breaker_ignores_fatal_and_connection_errors() -> None:
+    breaker = CircuitBreaker("test", threshold=1)
+    breaker.record_failure(_StatusError(400))
+    breaker.record_failure(ConnectionResetError())
+    assert breaker.state == "closed"
+
+    counting = CircuitBreaker("test", threshold=1, count_connection_errors=True)
+    counting.record_failure(ConnectionResetError())
+    assert counting.state == "open"
+
+
+def test_breakers_are_keyed_by_endpoint_and_model() -> None:
+    endpoint = _endpoint()
+    config = {"circuit_breaker_threshold": 1}
+    slow = get_circuit_breaker(endpoint, config, model="slow-model")
+    assert get_circuit_breaker(endpoint, config, model="slow-model") is slow
+    other = get_circuit_breaker(endpoint, config, model="other-model")
+    slow.record_failure(_StatusError(503))
+    assert not slow.allow()
+    assert other.allow()
+    assert slow.name == f"{endpoint} [slow-model]"
+
+
+def test_call_with_retries_retries_transient_errors() -> None:
+    attempts = []
+
+    def flaky(attempt: int) -> str:
+        attempts.append(attempt)
+        if attempt < 3:
+            raise _StatusError(503)
+        return "ok"
+
+    config = {"retry_backoff_seconds": 0.001}
+    assert call_with_retries(flaky, _endpoint(), config, retries=3, label="test") == "ok"
+    assert attempts == [1, 2, 3]
+
+
+def test_call_with_retries_stops_on_fatal_errors() -> None:
+    def fatal(attempt: int) -> str:
+        raise _StatusError(401)
+
+    with pytest.raises(_StatusError) as raised:
+        call_with_retries(fatal, _endpoint(), {"retry_backoff_seconds": 0.001}, retries=5, label="test")
+    assert raised.value.attempts == 1
+
+
+def test_open_breaker_fails_fast() -> None:
+    endpoint = _endpoint()
+    config = {"retry_backoff_seconds": 0.001, "circuit_breaker_threshold": 2}
+    calls = []
+
+    def down(attempt: int) -> str:
+        calls.append(attempt)
+        raise _StatusError(503)
+
+    with pytest.raises(_StatusError):
+        call_with_retries(down, endpoint, config, retries=2, label="test", model="m")
+    with pytest.raises(CircuitOpenError) as raised:
+        call_with_retries(down, endpoint, config, retries=2, label="test", model="m")
+    assert raised.value.attempts == 0
+    assert len(calls) == 2
+
+
+def test_acall_with_retries() -> None:
+    async def flaky(attempt: int) -> int:
+        if attempt == 1:
+            raise ConnectionResetError()
+        return attempt
+
+    config = {"retry_backoff_seconds": 0.001}
+    assert asyncio.run(acall_with_retries(flaky, _endpoint(), config, retries=2, label="test")) == 2
+
+
+def test_failing_model_does_not_trip_other_models(stub_server: Any, stub_config: Dict[str, Any]) -> None:
+    config = dict(stub_config, retries=2, circuit_breaker_threshold=2)
+    messages = [{"role": "user", "content": "Write one sentence about forklifts."}]
+
+    stub_server.state.config["error_rate"] = 1.0
+    failed = generate_completion(messages, dict(config, model="gpt-4o"))
+    assert failed["error"]
+    stub_server.state.config["error_rate"] = 0.0
+
+    upstream_before = stub_server.stats()["requests"]
+    fast_fail = generate_completion(messages, dict(config, model="gpt-4o"))
+    assert fast_fail["error_kind"] == "circuit_open"
+    assert stub_server.stats()["requests"] == upstream_before
+
+    ok = generate_completion(messages, dict(config, model="gpt-4o-mini"))
+    assert not ok.get("error")
@@ -0,0 +1,52 @@
+import json
+from pathlib import Path
+
+from benchmarks.retrieval_benchmark import _latency_summary, _parse_sizes, benchmark_size, generate_corpus, main
+
+
+def test_generate_corpus_is_deterministic(tmp_path: Path) -> None:
+    first = generate_corpus(tmp_path / "a", 5, seed=3, vocabulary_size=200)
+    second = generate_corpus(tmp_path / "b", 5, seed=3, vocabulary_size=200)
+    assert first["bytes"] == second["bytes"]
+    first_files = sorted(path.relative_to(tmp_path / "a") for path in (tmp_path / "a").rglob("*.md"))
+    assert len(first_files) == 5
+    assert first_files[0].parts[0] == "primary"
+    for relative in first_files:
+        assert (tmp_path / "a" / relative).read_text() == (tmp_path / "b" / relative).read_text()
+
+
+def test_benchmark_size_reports_every_mode(tmp_path: Path) -> None:
+    result = benchmark_size(
+        num_docs=20,
+        workdir=tmp_path,
+        modes=["lexical", "dense", "hybrid"],
+        num_queries=5,
+        seed=7,
+        trace_memory=True,
+        keep_corpus=False,
+    )
+    assert result["documents"] == 20
+    assert result["chunks"] > 20
+    assert result["snapshot_bytes"] > 0
+    assert result["peak_load_memory_bytes"] > 0
+    assert result["modes"]["lexical"]["query_latency"]["count"] == 5
+    for mode in ("dense", "hybrid"):
+        # Vector modes need numpy; without it they are reported as unavailable, not dropped.
+        mode_result = result["modes"][mode]
+        assert mode_result.get("error", "").startswith("unavailable") or mode_result["query_latency"]["count"] == 5
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_main_writes_json_report(tmp_path: Path) -> None:
+    output = tmp_path / "report.json"
+    main(["--sizes", "10", "--modes", "lexical", "--queries", "3", "--no-trace-memory", "--output", str(output)])
+    report = json.loads(output.read_text())
+    assert report["parameters"]["sizes"] == [10]
+    assert report["results"][0]["modes"]["lexical"]["query_latency"]["count"] == 3
+
+
+def test_helpers() -> None:
+    assert _parse_sizes("100,1_000") == [100, 1000]
+    summary = _latency_summary([0.001, 0.002, 0.003, 0.004])
+    assert summary["count"] == 4
+    assert summary["p50_ms"] <= summary["p95_ms"] <= summary["max_ms"]
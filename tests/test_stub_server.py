@@ -0,0 +1,114 @@
+import concurrent.futures
+import http.client
+import json
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+
+from benchmarks.stub_server import STUB_POST, StubServer, _build_arg_parser
+
+CHAT_PATH = "/v1/chat/completions"
+
+
+@pytest.fixture
+def make_server():
+    servers: List[StubServer] = []
+
+    def start(**config: Any) -> StubServer:
+        server = StubServer(dict({"latency_ms": 1, "latency_jitter_ms": 0}, **config)).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def _chat(server: StubServer, content: str, **extra: Any) -> httpx.Response:
+    body = dict({"model": "gpt-4o-mini", "messages": [{"role": "user", "content": content}]}, **extra)
+    return httpx.post(f"{server.url}{CHAT_PATH}", json=body, timeout=5)
+
+
+def test_replies_fit_each_pipeline_prompt(make_server) -> None:
+    server = make_server()
+    plain = _chat(server, "Write a post.").json()
+    assert plain["choices"][0]["message"]["content"] == STUB_POST
+    assert plain["usage"]["total_tokens"] == plain["usage"]["prompt_tokens"] + plain["usage"]["completion_tokens"]
+
+    batched_prompt = 'Angles:\n- "contrarian": push back\n- "story": tell one\n\n{"drafts": [...]}'
+    drafts = json.loads(_chat(server, batched_prompt).json()["choices"][0]["message"]["content"])["drafts"]
+    assert [draft["angle"] for draft in drafts] == ["contrarian", "story"]
+    hashtags = json.loads(_chat(server, 'Return {"hashtags": []}').json()["choices"][0]["message"]["content"])
+    assert len(hashtags["hashtags"]) == 5
+
+
+def test_injected_faults(make_server) -> None:
+    limited = make_server(rate_limit_rate=1.0, retry_after_seconds=2.5)
+    response = _chat(limited, "Write a post.")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "2.5"
+
+    failing = make_server(error_rate=1.0)
+    assert _chat(failing, "Write a post.").status_code == 500
+
+    budgeted = make_server(rpm=2)
+    assert [_chat(budgeted, "Write a post.").status_code for _ in range(3)] == [200, 200, 429]
+    assert budgeted.stats()["statuses"] == {"200": 2, "429": 1}
+
+
+def test_streams_chunks_then_usage(make_server) -> None:
+    server = make_server(stream_chunks=4)
+    body = {
+        "model": "gpt-4o-mini",
+        "messages": [{"role": "user", "content": "Write a post."}],
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+    with httpx.stream("POST", f"{server.url}{CHAT_PATH}", json=body, timeout=5) as response:
+        assert response.headers["content-type"] == "text/event-stream"
+        events = [line[len("data: ") :] for line in response.iter_lines() if line.startswith("data: ")]
+
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    text = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks if chunk["choices"])
+    assert text == STUB_POST
+    assert sum(1 for chunk in chunks if chunk["choices"] and chunk["choices"][0]["delta"].get("content")) == 4
+    assert chunks[-1]["choices"] == [] and chunks[-1]["usage"]["completion_tokens"] > 0
+
+
+def test_stats_and_errors(make_server) -> None:
+    server = make_server(unknown_models=["command-x"])
+    assert httpx.post(f"{server.url}/v1/unknown", json={}, timeout=5).status_code == 404
+    invalid = httpx.post(f"{server.url}{CHAT_PATH}", content=b"{not json", timeout=5)
+    assert invalid.status_code == 400
+    assert httpx.get(f"{server.url}/v1/models/command-x", timeout=5).status_code == 404
+    assert httpx.get(f"{server.url}/v1/models/command-a-03-2025", timeout=5).json()["endpoints"] == ["chat"]
+
+    stats: Dict[str, Any] = httpx.get(f"{server.url}/stats", timeout=5).json()
+    assert stats["statuses"] == {"404": 2, "400": 1, "200": 1}
+    assert stats["config"]["unknown_models"] == ["command-x"]
+
+
+def test_bursts_of_new_connections_are_queued(make_server) -> None:
+    server = make_server(latency_ms=50, request_queue_size=256)
+    assert server._server.request_queue_size == 256
+
+    body = json.dumps({"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Hi"}]})
+
+    def call(_: int) -> int:
+        # A fresh connection per request, as a client without pooling would do.
+        connection = http.client.HTTPConnection(server.host, server.port, timeout=10)
+        try:
+            connection.request("POST", CHAT_PATH, body=body, headers={"Content-Type": "application/json"})
+            return connection.getresponse().status
+        finally:
+            connection.close()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=64) as executor:
+        statuses = list(executor.map(call, range(128)))
+    assert statuses == [200] * 128
+    stats = server.stats()
+    assert stats["connections"] == 128
+    assert stats["peak_in_flight"] > 1
+    assert _build_arg_parser().parse_args([]).request_queue_size == 1024
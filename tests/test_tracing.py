@@ -0,0 +1,122 @@
+import asyncio
+import concurrent.futures
+import json
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import pytest
+
+from generation.generate_post import ANGLE_STRATEGIES, generate_post
+from generation.knowledge_base import doc_processor
+from generation.tracing import Span, Trace, bind_context, current_span, record_span, span, start_trace
+
+MS = 1_000_000
+
+
+def _finished(trace: Trace, name: str, parent: Any, start_ms: int, end_ms: int) -> Span:
+    finished = Span(name, trace, parent.span_id if parent else None, start_ns=start_ms * MS)
+    finished.finish(end_ms * MS)
+    return finished
+
+
+def test_spans_nest_and_record_errors() -> None:
+    with span("outside") as noop:
+        noop.set_attribute("ignored", True)
+    assert current_span() is None
+
+    with start_trace("request", topic="forklifts") as trace:
+        with span("stage.draft", model="gpt-4o-mini") as draft:
+            draft.set_attributes(tokens=12, skipped=None)
+        with pytest.raises(ValueError):
+            with span("stage.refine"):
+                raise ValueError("bad draft")
+        record_span("llm.stream", start_ns=draft.start_ns, error="connection reset")
+    assert current_span() is None
+
+    spans = {s["name"]: s for s in trace.to_dict()["spans"]}
+    root = spans["request"]
+    assert root["parent_id"] is None and root["attributes"] == {"topic": "forklifts"}
+    assert spans["stage.draft"]["parent_id"] == root["span_id"]
+    assert spans["stage.draft"]["attributes"] == {"model": "gpt-4o-mini", "tokens": 12}
+    assert spans["stage.refine"]["status"] == "error"
+    assert spans["stage.refine"]["error"] == "bad draft"
+    assert spans["llm.stream"]["error"] == "connection reset"
+
+
+def test_critical_path_skips_faster_parallel_siblings() -> None:
+    trace = Trace("request")
+    root = Span("request", trace, None, start_ns=0)
+    retrieve = _finished(trace, "retrieve", root, 0, 10)
+    _finished(trace, "draft.fast", root, 10, 40)
+    slow = _finished(trace, "draft.slow", root, 10, 90)
+    _finished(trace, "llm.chat", slow, 15, 85)
+    _finished(trace, "select", root, 90, 100)
+    root.finish(100 * MS)
+
+    path = [(step["name"], step["depth"]) for step in trace.critical_path()]
+    assert path == [("request", 0), ("retrieve", 1), ("draft.slow", 1), ("llm.chat", 2), ("select", 1)]
+    assert retrieve.duration_ms == 10
+
+
+def test_context_crosses_thread_pools_and_tasks() -> None:
+    def worker() -> Any:
+        with span("thread.work") as work:
+            return getattr(work, "parent_id", None)
+
+    async def task() -> Any:
+        with span("task.work") as work:
+            return getattr(work, "parent_id", None)
+
+    with start_trace("request") as trace:
+        root_id = current_span().span_id
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            bound = executor.submit(bind_context(worker)).result()
+            unbound = executor.submit(worker).result()
+        assert asyncio.run(task()) == root_id
+    assert bound == root_id
+    # Without bind_context the worker thread sees no trace at all.
+    assert unbound is None
+    assert sorted(s.name for s in trace.spans) == ["request", "task.work", "thread.work"]
+
+
+def test_export_json_and_otlp(tmp_path: Path) -> None:
+    with start_trace("request") as trace:
+        with span("llm.chat", provider="openai", attempts=2, cost_usd=0.01, cache_hit=False, tags=["a"]):
+            pass
+
+    document = json.loads(trace.export(str(tmp_path / "trace.json")).read_text(encoding="utf-8"))
+    assert document["trace_id"] == trace.trace_id
+    assert document["span_count"] == 2
+
+    otlp = json.loads(trace.export(str(tmp_path / "nested" / "trace.otlp.json"), fmt="otlp").read_text())
+    (scope,) = otlp["resourceSpans"][0]["scopeSpans"]
+    spans = {s["name"]: s for s in scope["spans"]}
+    chat = spans["llm.chat"]
+    assert chat["kind"] == 3 and spans["request"]["kind"] == 1
+    assert chat["parentSpanId"] == spans["request"]["spanId"]
+    assert {a["key"]: a["value"] for a in chat["attributes"]} == {
+        "provider": {"stringValue": "openai"},
+        "attempts": {"intValue": "2"},
+        "cost_usd": {"doubleValue": 0.01},
+        "cache_hit": {"boolValue": False},
+        "tags": {"stringValue": '["a"]'},
+    }
+    with pytest.raises(ValueError):
+        trace.export(str(tmp_path / "trace.xml"), fmt="xml")
+
+
+def test_generate_post_traces_every_angle(stub_config: Dict[str, Any], monkeypatch: pytest.MonkeyPatch) -> None:
+    def fake_retrieve_context(query: str, config: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        return "Stub context.", {"tokens_used": 3, "mode": "lexical"}
+
+    monkeypatch.setattr(doc_processor, "retrieve_context", fake_retrieve_context)
+    with start_trace("request") as trace:
+        generate_post("Warehouse automation", "Educational", "Book discovery calls", dict(stub_config))
+
+    by_id = {s.span_id: s for s in trace.spans}
+    angles = [s for s in trace.spans if s.name == "draft.angle"]
+    assert sorted(s.attributes["angle"] for s in angles) == sorted(name for name, _ in ANGLE_STRATEGIES)
+    chats = [s for s in trace.spans if s.name == "llm.chat"]
+    assert {by_id[s.parent_id].name for s in chats} == {"draft.angle"}
+    assert all(s.attributes.get("prompt_tokens") for s in chats)
+    assert any(s.name == "candidate_selection" for s in trace.spans)